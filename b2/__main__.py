@@ -8,6 +8,6 @@
 #
 ######################################################################
 
-from .console_tool import main
+from ._cli.entry_point import main
 
 main()
@@ -0,0 +1,120 @@
+######################################################################
+#
+# File: b2/_cli/adaptive_concurrency.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Concurrency of operations adjusted to the back-pressure of the server, like TCP congestion control.
+
+The limit of operations in flight grows while they are healthy (doubling every "round" of
+operations at first, then by one per round: additive increase) and is halved when the server
+throttles them, or when they take much longer than before (multiplicative decrease).  b2sdk
+retries throttled requests by itself, sleeping between the tries, so throttling shows up as
+latency, too.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class AimdConcurrency:
+    """
+    Limit of concurrent operations with additive increase and multiplicative decrease.
+
+    Every operation is started by ``acquire`` (which waits while the limit is reached) and
+    ended by ``release``, with the time from ``clock`` when it started.  Only operations
+    started after the last decrease count towards the next one, so a burst of throttled
+    operations which were started together halves the limit once.
+
+    THREAD SAFE.
+    """
+
+    # weight of the latest latency in the moving average
+    LATENCY_SMOOTHING = 0.2
+
+    def __init__(
+        self,
+        maximum: int,
+        initial: int = 1,
+        minimum: int = 1,
+        decrease_factor: float = 0.5,
+        latency_factor: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease_factor = decrease_factor
+        # latency (average) this many times the lowest one seen means congestion
+        self.latency_factor = latency_factor
+        self.clock = clock
+        self.peak = self.limit = max(minimum, min(initial, maximum))
+        self.decreases = 0
+        self._window = float(self.limit)
+        self._slow_start = True
+        self._in_flight = 0
+        self._latency: Optional[float] = None
+        self._base_latency: Optional[float] = None
+        self._last_decrease = clock()
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """
+        Wait until an operation can be started within the limit.
+        """
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, started: float, throttled: bool = False) -> None:
+        """
+        Record the end of an operation started at ``started`` (by ``clock``), which was
+        ``throttled`` by the server, or not.
+        """
+        now = self.clock()
+        with self._condition:
+            self._in_flight -= 1
+            if started >= self._last_decrease:
+                self._update(now - started, throttled, now)
+            self._condition.notify_all()
+
+    def cancel(self) -> None:
+        """
+        Record the end of an operation which was not made after all, without measuring it.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def _update(self, latency: float, throttled: bool, now: float) -> None:
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += self.LATENCY_SMOOTHING * (latency - self._latency)
+        if self._base_latency is None or self._latency < self._base_latency:
+            self._base_latency = self._latency
+
+        congested = throttled or self._latency > self.latency_factor * self._base_latency
+        if congested and not throttled and self._window <= self.minimum:
+            # there is nothing to back off from, so this is the latency of the server now
+            self._base_latency = self._latency
+            congested = False
+
+        if congested:
+            self._window = max(self.minimum, self._window * self.decrease_factor)
+            self._slow_start = False
+            self._last_decrease = now
+            # the latency of operations started with the new limit is measured anew
+            self._latency = None
+            self.decreases += 1
+        elif self._slow_start:
+            self._window = min(self.maximum, self._window + 1)
+        else:
+            self._window = min(self.maximum, self._window + 1 / self._window)
+        self.limit = int(self._window)
+        self.peak = max(self.peak, self.limit)
@@ -7,41 +7,51 @@
 # License https://www.backblaze.com/using_b2_code.html
 #
 ######################################################################
-from functools import wraps
-from itertools import islice
 
-from b2sdk.api import B2Api
+# Completers are also used by the completion fast path (see `autocomplete_cache`), so b2sdk
+# is imported only once a completer actually has to call the API.
+#
+# Results are cached on disk per profile (see `completion_cache`), so that repeated TABs
+# don't call the API at all.  Once cached completions get older than the TTL, they are still
+# returned, but a refresh is started in a background process.
+import json
+import logging
+import subprocess
+import sys
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 
-from b2._cli.b2api import _get_b2api_for_profile
+from b2._cli.completion_cache import CompletionCache, get_completion_cache_ttl
 from b2._cli.const import LIST_FILE_NAMES_MAX_LIMIT
 
+if TYPE_CHECKING:
+    from b2sdk.api import B2Api
+
+logger = logging.getLogger(__name__)
 
-def _with_api(func):
-    """Decorator to inject B2Api instance into argcompleter function."""
+# functions listing completions, by name, so that a background refresh can find them
+_LISTERS: Dict[str, Callable[..., List[str]]] = {}
 
-    @wraps(func)
-    def wrapper(prefix, parsed_args, **kwargs):
-        api = _get_b2api_for_profile(parsed_args.profile)
-        return func(prefix=prefix, parsed_args=parsed_args, api=api, **kwargs)
 
-    return wrapper
+def _lister(func):
+    """Decorator to register a function listing completions with the given B2Api instance."""
+    _LISTERS[func.__name__] = func
+    return func
 
 
-@_with_api
-def bucket_name_completer(api: B2Api, **kwargs):
+@_lister
+def _list_bucket_names(api: 'B2Api') -> List[str]:
     return [bucket.name for bucket in api.list_buckets(use_cache=True)]
 
 
-@_with_api
-def file_name_completer(api: B2Api, parsed_args, **kwargs):
+@_lister
+def _list_file_names(api: 'B2Api', bucket_name: str, folder_name: str) -> List[str]:
     """
-    Completes file names in a bucket.
-
     To limit delay & cost only lists files returned from by single call to b2_list_file_names
     """
-    bucket = api.get_bucket_by_name(parsed_args.bucketName)
+    bucket = api.get_bucket_by_name(bucket_name)
     file_versions = bucket.ls(
-        getattr(parsed_args, 'folderName', None) or '',
+        folder_name,
         latest_only=True,
         recursive=False,
         fetch_count=LIST_FILE_NAMES_MAX_LIMIT,
@@ -50,3 +60,72 @@ def file_name_completer(api: B2Api, parsed_args, **kwargs):
         folder_name or file_version.file_name
         for file_version, folder_name in islice(file_versions, LIST_FILE_NAMES_MAX_LIMIT)
     ]
+
+
+def _list(profile: Optional[str], key: List[str]) -> List[str]:
+    from b2._cli.b2api import _get_b2api_for_profile
+
+    lister_name, *args = key
+    return _LISTERS[lister_name](_get_b2api_for_profile(profile), *args)
+
+
+def _refresh(profile: Optional[str], key: List[str]) -> List[str]:
+    values = _list(profile, key)
+    CompletionCache(profile).set(key, values)
+    return values
+
+
+def _refresh_in_background(cache: CompletionCache, key: List[str]) -> None:
+    if not cache.claim_refresh(key):
+        return
+    if getattr(sys, 'frozen', False):
+        # a frozen binary cannot run this module, so the refresh has to be done right away
+        _refresh(cache.profile, key)
+        return
+    refresh_args = json.dumps([cache.profile, key])
+    subprocess.Popen(
+        [sys.executable, '-m', __name__, refresh_args],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _cached_list(profile: Optional[str], key: List[str]) -> List[str]:
+    ttl = get_completion_cache_ttl()
+    if not ttl:
+        return _list(profile, key)
+    cache = CompletionCache(profile)
+    cached = cache.get(key)
+    if cached is None:
+        return _refresh(profile, key)
+    age, values = cached
+    if age >= ttl:
+        try:
+            _refresh_in_background(cache, key)
+        except Exception:
+            logger.exception('cannot refresh completions of %r', key)
+    return values
+
+
+def bucket_name_completer(prefix, parsed_args, **kwargs):
+    return _cached_list(parsed_args.profile, [_list_bucket_names.__name__])
+
+
+def file_name_completer(prefix, parsed_args, **kwargs):
+    """
+    Completes file names in a bucket.
+    """
+    folder_name = getattr(parsed_args, 'folderName', None) or ''
+    if isinstance(folder_name, list):  # `ls` and `rm` take many patterns
+        folder_name = folder_name[-1]
+    return _cached_list(
+        parsed_args.profile,
+        [_list_file_names.__name__, parsed_args.bucketName, folder_name],
+    )
+
+
+if __name__ == '__main__':
+    # background refresh started by `_refresh_in_background`
+    _refresh(*json.loads(sys.argv[1]))
@@ -0,0 +1,224 @@
+######################################################################
+#
+# File: b2/_cli/autocomplete_cache.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Shell completion answered from a precomputed table of commands and their arguments.
+
+Building the real parser requires importing the whole command-line tool (and b2sdk), which
+is too slow to do on every TAB press.  Instead, the first completion (with a given installation
+of the tool) stores a description of all the commands in a JSON table and the following ones
+recreate a lightweight parser from it.  Only completers of argument values (e.g. bucket names)
+are still dynamic.
+
+The table is keyed by the version and by the modification times and sizes of the modules
+defining the commands (or of the executable, if frozen), so that changes of commands under
+the same version (e.g. in development installs) are not answered from a stale table.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from b2._cli import argcompleters
+from b2._cli.cache import get_cache_dir, write_atomically
+from b2.version import VERSION
+
+logger = logging.getLogger(__name__)
+
+TABLE_FORMAT_VERSION = 2
+
+# modules defining the commands and their arguments
+_COMMAND_MODULES = [
+    Path(__file__).parent.parent / 'console_tool.py',
+    Path(__file__).parent.parent / 'arg_parser.py',
+    Path(__file__).parent / 'argcompleters.py',
+]
+
+# argparse actions which can be stored in the table, by the ``action`` keyword of ``add_argument``
+_ACTION_KINDS = {
+    argparse._StoreAction: 'store',
+    argparse._StoreTrueAction: 'store_true',
+    argparse._StoreFalseAction: 'store_false',
+    argparse._AppendAction: 'append',
+    argparse._CountAction: 'count',
+}
+
+
+def _get_installation_fingerprint() -> str:
+    if getattr(sys, 'frozen', False):
+        paths = [Path(sys.executable)]
+    else:
+        paths = _COMMAND_MODULES
+    digest = hashlib.sha1(VERSION.encode())
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size}'.encode())
+    return digest.hexdigest()[:16]
+
+
+def _get_table_path() -> Optional[Path]:
+    cache_dir = get_cache_dir('autocomplete')
+    if cache_dir is None:
+        return None
+    return cache_dir / f'commands-{VERSION}-{_get_installation_fingerprint()}.json'
+
+
+def _get_subparsers_action(parser: argparse.ArgumentParser) -> argparse._SubParsersAction:
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return action
+    raise ValueError('parser has no subcommands')
+
+
+def _describe_action(action: argparse.Action) -> dict:
+    kind = _ACTION_KINDS.get(type(action))
+    if kind is None:
+        raise ValueError(f'cannot store action {action!r} in the completion table')
+    completer = getattr(action, 'completer', None)
+    return {
+        'option_strings': action.option_strings,
+        'dest': action.dest,
+        'kind': kind,
+        'nargs': action.nargs,
+        'choices': None if action.choices is None else [str(choice) for choice in action.choices],
+        'required': action.required,
+        'default': action.default,
+        'help': action.help,
+        'completer': completer and completer.__name__,
+    }
+
+
+def build_completion_table(parser: argparse.ArgumentParser) -> dict:
+    """
+    Describe commands of the full parser, their aliases and arguments in a JSON-serializable way.
+    """
+    commands = {}
+    names_by_parser = {}
+    for name, subparser in _get_subparsers_action(parser).choices.items():
+        # argparse maps both the name and the aliases of a command to the same parser
+        if id(subparser) in names_by_parser:
+            commands[names_by_parser[id(subparser)]]['aliases'].append(name)
+            continue
+        names_by_parser[id(subparser)] = name
+        actions = [
+            action for action in subparser._actions if not isinstance(action, argparse._HelpAction)
+        ]
+        commands[name] = {
+            'aliases': [],
+            'arguments': [_describe_action(action) for action in actions],
+            'mutually_exclusive_groups':
+                [
+                    {
+                        'required': group.required,
+                        'dests': [action.dest for action in group._group_actions],
+                    } for group in subparser._mutually_exclusive_groups
+                ],
+        }
+    return {'format': TABLE_FORMAT_VERSION, 'commands': commands}
+
+
+def save_completion_table(parser: argparse.ArgumentParser) -> None:
+    """
+    Store the completion table of the full parser, so that next completions can skip building it.
+    """
+    table_path = _get_table_path()
+    if table_path is None:
+        return
+    try:
+        table = json.dumps(build_completion_table(parser))
+    except ValueError:
+        logger.exception('cannot build completion table')
+        return
+    try:
+        if table_path.read_text(encoding='utf-8') == table:
+            return
+    except OSError:
+        pass
+    write_atomically(table_path, table)
+    # tables of other installations are stale
+    for stale_table_path in table_path.parent.glob('commands-*.json'):
+        if stale_table_path != table_path:
+            try:
+                stale_table_path.unlink()
+            except OSError:
+                pass
+
+
+def _add_argument(container, argument: dict) -> None:
+    kwargs = {}
+    if argument['option_strings']:
+        args = argument['option_strings']
+        kwargs['dest'] = argument['dest']
+        kwargs['required'] = argument['required']
+    else:
+        args = [argument['dest']]
+    if argument['kind'] in ('store', 'append'):
+        kwargs['nargs'] = argument['nargs']
+        kwargs['choices'] = argument['choices']
+    kwargs['action'] = argument['kind']
+    kwargs['default'] = argument['default']
+    kwargs['help'] = argument['help']
+
+    action = container.add_argument(*args, **kwargs)
+    if argument['completer'] is not None:
+        action.completer = getattr(argcompleters, argument['completer'])
+
+
+def parser_from_completion_table(table: dict, prog: str) -> argparse.ArgumentParser:
+    """
+    Recreate a parser, good enough for completing, from a completion table.
+    """
+    parser = argparse.ArgumentParser(prog=prog)
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    for name, command in table['commands'].items():
+        subparser = subparsers.add_parser(name, aliases=command['aliases'])
+        grouped_dests = {}
+        for group in command['mutually_exclusive_groups']:
+            mutually_exclusive_group = subparser.add_mutually_exclusive_group(
+                required=group['required']
+            )
+            grouped_dests.update((dest, mutually_exclusive_group) for dest in group['dests'])
+        for argument in command['arguments']:
+            _add_argument(grouped_dests.get(argument['dest'], subparser), argument)
+    return parser
+
+
+def autocomplete_from_cache() -> None:
+    """
+    Answer the shell completion request from the completion table, if one has already been stored.
+
+    On success this never returns (``argcomplete`` exits the process).  If there is no usable
+    table, it returns and the completion has to be answered by the full command-line tool.
+    """
+    table_path = _get_table_path()
+    if table_path is None:
+        return
+    try:
+        table = json.loads(table_path.read_text(encoding='utf-8'))
+        if table.get('format') != TABLE_FORMAT_VERSION:
+            return
+        parser = parser_from_completion_table(table, prog=os.path.basename(sys.argv[0]))
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        logger.exception('cannot use completion table %s', table_path)
+        return
+
+    import argcomplete
+
+    argcomplete.autocomplete(parser)
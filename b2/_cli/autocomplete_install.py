@@ -16,7 +16,6 @@ from pathlib import Path
 from shlex import quote
 from typing import List
 
-import argcomplete
 from class_registry import ClassRegistry, RegistryKeyError
 
 logger = logging.getLogger(__name__)
@@ -75,6 +74,8 @@ class ShellAutocompleteInstaller:
 
     def get_shellcode(self) -> str:
         """Get autocomplete shellcode for the given program."""
+        import argcomplete
+
         return argcomplete.shellcode([self.prog], shell=self.shell_exec)
 
     def get_script_path(self) -> Path:
@@ -0,0 +1,96 @@
+######################################################################
+#
+# File: b2/_cli/buffered_output.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Buffering of long outputs (e.g. listings of millions of files).
+
+Writing every line to ``sys.stdout`` separately costs more than formatting it, so lines are
+collected and written in blocks.  When the output is a terminal, every line is still flushed
+as soon as it is complete, so a person watching it sees the same as without buffering.
+"""
+
+import os
+from typing import Optional, TextIO
+
+from b2._cli.const import B2_OUTPUT_BUFFERING_ENV_VAR
+
+LINE_BUFFERING = 'line'
+BLOCK_BUFFERING = 'block'
+AUTO_BUFFERING = 'auto'
+BUFFERING_POLICIES = (AUTO_BUFFERING, LINE_BUFFERING, BLOCK_BUFFERING)
+
+# characters written to the stream at once by the block buffering
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+
+def get_buffering_policy(stream: TextIO, policy: Optional[str] = None) -> str:
+    """
+    Return the buffering policy (line or block) of output written to the stream.
+
+    The policy is the given one, or the one from ``B2_OUTPUT_BUFFERING`` env var; ``auto``
+    (the default) means line buffering for terminals and block buffering for everything else.
+    """
+    if policy is None:
+        policy = os.environ.get(B2_OUTPUT_BUFFERING_ENV_VAR) or AUTO_BUFFERING
+    if policy not in BUFFERING_POLICIES:
+        raise ValueError(
+            f'{B2_OUTPUT_BUFFERING_ENV_VAR} should be one of {", ".join(BUFFERING_POLICIES)}, '
+            f'not {policy!r}'
+        )
+    if policy != AUTO_BUFFERING:
+        return policy
+    try:
+        is_terminal = stream.isatty()
+    except (AttributeError, ValueError):  # not a file, or a closed one
+        is_terminal = False
+    return LINE_BUFFERING if is_terminal else BLOCK_BUFFERING
+
+
+class BufferedOutput:
+    """
+    Text stream collecting what is written to another one and writing it in blocks.
+
+    Text which cannot be encoded by the stream is rejected by ``write`` (with
+    ``UnicodeEncodeError``, like the stream would), not by a later ``flush``, so that the
+    caller can still handle it.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        policy: Optional[str] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ):
+        self.stream = stream
+        self.policy = get_buffering_policy(stream, policy)
+        self.block_size = block_size
+        self.encoding = getattr(stream, 'encoding', None)
+        self.errors = getattr(stream, 'errors', None) or 'strict'
+        self._chunks = []
+        self._buffered = 0
+
+    def write(self, text: str) -> int:
+        if self.encoding is not None and not text.isascii():
+            text.encode(self.encoding, self.errors)
+        self._chunks.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.block_size or (self.policy == LINE_BUFFERING and '\n' in text):
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self._chunks:
+            chunks = self._chunks
+            self._chunks = []
+            self._buffered = 0
+            self.stream.write(''.join(chunks))
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
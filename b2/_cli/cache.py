@@ -0,0 +1,70 @@
+######################################################################
+#
+# File: b2/_cli/cache.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Helpers for data which the command-line interface keeps on disk between runs only to be faster.
+
+Everything stored here can be removed at any time, so failures to read or write are not errors.
+"""
+
+import os
+import tempfile
+from contextlib import suppress
+from pathlib import Path
+from typing import Optional
+
+from b2._cli.const import B2_CACHE_DIR_ENV_VAR, XDG_CACHE_HOME_ENV_VAR
+
+
+def get_cache_path(name: str) -> Path:
+    """
+    Return the location of a cache directory for the given kind of data, without creating it.
+
+    The location is ``B2_CACHE_DIR`` env var's value, if set, otherwise
+    ``XDG_CACHE_HOME/b2`` or ``~/.cache/b2``.
+    """
+    base_dir = os.environ.get(B2_CACHE_DIR_ENV_VAR)
+    if base_dir is None:
+        cache_home = os.environ.get(XDG_CACHE_HOME_ENV_VAR) or os.path.join('~', '.cache')
+        base_dir = os.path.join(os.path.expanduser(cache_home), 'b2')
+    return Path(base_dir) / name
+
+
+def get_cache_dir(name: str) -> Optional[Path]:
+    """
+    Return (and create, if needed) a cache directory for the given kind of data
+    (see ``get_cache_path``).  Returns ``None`` if the directory cannot be created.
+    """
+    cache_dir = get_cache_path(name)
+    try:
+        cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return cache_dir
+
+
+def write_atomically(path: Path, content: str) -> bool:
+    """
+    Write text to the file in a way that concurrent readers never see it partially written.
+
+    :return: ``True`` if the file was written
+    """
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(temp_path, path)
+    except OSError:
+        with suppress(OSError):
+            os.unlink(temp_path)
+        return False
+    return True
@@ -0,0 +1,99 @@
+######################################################################
+#
+# File: b2/_cli/completion_cache.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+On-disk cache of values suggested by the shell completion (bucket names, file names).
+"""
+
+import hashlib
+import json
+import os
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from b2._cli.cache import get_cache_dir, write_atomically
+from b2._cli.const import B2_COMPLETION_CACHE_TTL_ENV_VAR, DEFAULT_COMPLETION_CACHE_TTL
+
+
+def get_completion_cache_ttl() -> float:
+    """
+    Return for how many seconds cached completions are considered fresh; 0 disables the cache.
+    """
+    try:
+        return max(
+            float(os.environ.get(B2_COMPLETION_CACHE_TTL_ENV_VAR, DEFAULT_COMPLETION_CACHE_TTL)),
+            0.0,
+        )
+    except ValueError:
+        return DEFAULT_COMPLETION_CACHE_TTL
+
+
+class CompletionCache:
+    """
+    Completions of a single profile, keyed by a list of strings (e.g. completer, bucket and folder).
+    """
+
+    # a refresh which hasn't finished within this time is considered dead
+    REFRESH_TIMEOUT = 60
+
+    def __init__(self, profile: Optional[str]):
+        # The account used by a profile-less invocation depends on this env var, not just the profile.
+        identity = json.dumps([profile, os.environ.get('B2_ACCOUNT_INFO')])
+        self.profile = profile
+        identity_digest = hashlib.sha256(identity.encode()).hexdigest()[:16]
+        self.cache_dir = get_cache_dir(os.path.join('completion', identity_digest))
+
+    def _get_path(self, key: List[str], suffix: str = '.json') -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+        return self.cache_dir / (digest + suffix)
+
+    def get(self, key: List[str]) -> Optional[Tuple[float, List[str]]]:
+        """
+        Return age (in seconds) and the cached completions, or ``None`` if there are none.
+        """
+        path = self._get_path(key)
+        if path is None:
+            return None
+        try:
+            entry = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != key:
+            return None
+        return max(time.time() - entry['timestamp'], 0.0), entry['values']
+
+    def set(self, key: List[str], values: List[str]) -> None:
+        path = self._get_path(key)
+        if path is None:
+            return
+        write_atomically(path, json.dumps({'key': key, 'timestamp': time.time(), 'values': values}))
+        with suppress(OSError):
+            self._get_path(key, '.refreshing').unlink()
+
+    def claim_refresh(self, key: List[str]) -> bool:
+        """
+        Mark the entry as being refreshed.
+
+        :return: ``False`` if another process is already refreshing it
+        """
+        marker = self._get_path(key, '.refreshing')
+        if marker is None:
+            return False
+        with suppress(OSError):
+            if time.time() - marker.stat().st_mtime < self.REFRESH_TIMEOUT:
+                return False
+        try:
+            marker.touch()
+        except OSError:
+            return False
+        return True
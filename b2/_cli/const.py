@@ -22,3 +22,17 @@ B2_SOURCE_SSE_C_KEY_B64_ENV_VAR = 'B2_SOURCE_SSE_C_KEY_B64'
 # Constants used in the B2 API
 CREATE_BUCKET_TYPES = ('allPublic', 'allPrivate')
 LIST_FILE_NAMES_MAX_LIMIT = 10000  # https://www.backblaze.com/b2/docs/b2_list_file_names.html
+
+# Optional Env variables to control where cached data (e.g. rendered help) is kept
+B2_CACHE_DIR_ENV_VAR = 'B2_CACHE_DIR'
+XDG_CACHE_HOME_ENV_VAR = 'XDG_CACHE_HOME'
+
+# Optional Env variable to set for how many seconds completions of bucket and file names are cached
+B2_COMPLETION_CACHE_TTL_ENV_VAR = 'B2_COMPLETION_CACHE_TTL'
+DEFAULT_COMPLETION_CACHE_TTL = 60
+
+# Optional Env variable to set the path of the socket of `b2 daemon`
+B2_DAEMON_SOCKET_ENV_VAR = 'B2_DAEMON_SOCKET'
+
+# Optional Env variable to set how long outputs (e.g. listings) are buffered: `line`, `block` or `auto`
+B2_OUTPUT_BUFFERING_ENV_VAR = 'B2_OUTPUT_BUFFERING'
@@ -0,0 +1,389 @@
+######################################################################
+#
+# File: b2/_cli/daemon.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Running commands in a long-lived ``b2 daemon`` process.
+
+Starting the tool, loading b2sdk and account info, and opening new connections to B2 takes
+much longer than most of the commands themselves.  A daemon keeps all of that warm and the
+``b2`` executable only forwards its invocation to it, over a Unix socket:
+
+* the client sends a request frame (argv, working directory, environment and its
+  installation) together with its stdin, stdout and stderr file descriptors (``SCM_RIGHTS``),
+  so the command reads and writes them directly - output, terminal detection and piping stay
+  the same as when running in-process,
+* the daemon runs the command and replies with a frame with its exit status - or with a frame
+  asking the client to run it in-process instead (e.g. commands prompting for input, or
+  a client of another installation, which the daemon's code may not be compatible with),
+* a byte sent by the client while waiting for the reply interrupts the command (Ctrl+C).
+
+This module is imported by the ``b2`` executable on every run, so it must only use the
+standard library.
+"""
+
+import array
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import threading
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import Callable, List, Optional, TextIO
+
+from b2._cli.cache import get_cache_path
+from b2._cli.const import B2_DAEMON_SOCKET_ENV_VAR
+from b2.version import VERSION
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = 2
+
+_FRAME_HEADER = struct.Struct('!I')
+_MAX_FRAME_SIZE = 16 * 1024 * 1024
+_STANDARD_FDS = (0, 1, 2)
+_INTERRUPT = b'i'
+# seconds to wait for the request of a client which is refused
+_REFUSAL_TIMEOUT = 5
+
+# Runs a command (argv, stdin, stdout, stderr) and returns its exit status.
+CommandRunner = Callable[[List[str], TextIO, TextIO, TextIO], int]
+
+
+class DaemonProtocolError(Exception):
+    pass
+
+
+class RunInClient(Exception):
+    """
+    Raised by a command runner when the command has to be run by the client, in-process.
+    """
+
+
+def get_daemon_socket_path() -> Path:
+    """
+    Return the path of the daemon's socket.  Nothing is created, since it is looked up
+    on every run of the ``b2`` executable; the daemon creates the directory.
+    """
+    if os.environ.get(B2_DAEMON_SOCKET_ENV_VAR):
+        return Path(os.environ[B2_DAEMON_SOCKET_ENV_VAR])
+    return get_cache_path('daemon') / 'daemon.sock'
+
+
+def _get_installation() -> dict:
+    """
+    Return what identifies the code which runs commands: the version and location of the tool,
+    and the interpreter.
+    """
+    return {
+        'version': VERSION,
+        'package': os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'python': sys.executable,
+    }
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise DaemonProtocolError('connection closed')
+        data += chunk
+    return data
+
+
+def _send_frame(sock: socket.socket, message: dict, fds: List[int] = ()) -> None:
+    payload = json.dumps(message).encode()
+    data = _FRAME_HEADER.pack(len(payload)) + payload
+    ancillary = []
+    if fds:
+        ancillary = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))]
+    sent = sock.sendmsg([data], ancillary)
+    if sent < len(data):
+        sock.sendall(data[sent:])
+
+
+def _recv_frame(sock: socket.socket, max_fds: int = 0):
+    """
+    Receive a frame (and file descriptors sent with it).
+
+    :return: a tuple of the message and a list of file descriptors
+    """
+    fds = array.array('i')
+    ancillary_size = socket.CMSG_LEN(max_fds * fds.itemsize) if max_fds else 0
+    header, ancillary, _, _ = sock.recvmsg(_FRAME_HEADER.size, ancillary_size)
+    for level, type_, data in ancillary:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+    try:
+        if not header:
+            raise DaemonProtocolError('connection closed')
+        header += _recv_exactly(sock, _FRAME_HEADER.size - len(header))
+        size, = _FRAME_HEADER.unpack(header)
+        if size > _MAX_FRAME_SIZE:
+            raise DaemonProtocolError(f'frame too large: {size}')
+        message = json.loads(_recv_exactly(sock, size))
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+    return message, list(fds)
+
+
+def _describe_stream(stream: Optional[TextIO]) -> dict:
+    return {
+        'encoding': getattr(stream, 'encoding', None),
+        'errors': getattr(stream, 'errors', None),
+    }
+
+
+def _open_stream(fd: int, mode: str, description: dict) -> TextIO:
+    # same encoding as the client's stream, so that the output is byte-for-byte the same
+    return open(fd, mode, encoding=description['encoding'], errors=description['errors'])
+
+
+def run_in_daemon(argv: List[str]) -> Optional[int]:
+    """
+    Run the command in the daemon, if one is running.
+
+    :return: exit status of the command, or ``None`` if it has to be run in-process
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    socket_path = get_daemon_socket_path()
+    request = {
+        'version': PROTOCOL_VERSION,
+        'installation': _get_installation(),
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+        'streams': [_describe_stream(stream) for stream in (sys.stdin, sys.stdout, sys.stderr)],
+    }
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(str(socket_path))
+            _send_frame(sock, request, fds=_STANDARD_FDS)
+        except OSError:
+            # no daemon (or a stale socket of a dead one)
+            return None
+        while True:
+            try:
+                reply, _ = _recv_frame(sock)
+                break
+            except KeyboardInterrupt:
+                sock.sendall(_INTERRUPT)
+            except (OSError, DaemonProtocolError, ValueError) as e:
+                # the command might have been (partially) run already, so it cannot be retried
+                print(f'ERROR: lost connection to b2 daemon: {e}', file=sys.stderr)
+                return 1
+        if reply.get('fallback'):
+            return None
+        return reply['exit']
+    finally:
+        sock.close()
+
+
+@contextmanager
+def _client_context(cwd: str, env: dict, stdin: TextIO, stdout: TextIO, stderr: TextIO):
+    """
+    Make the process look like the client's for the duration of a command.
+    """
+    saved_cwd = os.getcwd()
+    saved_env = dict(os.environ)
+    saved_streams = sys.stdin, sys.stdout, sys.stderr
+    saved_root_handlers = logging.root.handlers[:]
+    saved_root_level = logging.root.level
+    os.chdir(cwd)
+    os.environ.clear()
+    os.environ.update(env)
+    sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+    try:
+        yield
+    finally:
+        # commands may set up logging handlers (--verbose, --debugLogs), which must not leak
+        # to the next commands
+        for handler in logging.root.handlers:
+            if handler not in saved_root_handlers:
+                handler.close()
+        logging.root.handlers[:] = saved_root_handlers
+        logging.root.setLevel(saved_root_level)
+        sys.stdin, sys.stdout, sys.stderr = saved_streams
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+
+
+class DaemonServer:
+    """
+    Serves commands sent by ``b2`` executables over a Unix socket.
+
+    Commands are run one at a time, in the main thread, since they change process-wide state
+    (working directory, environment, signal handlers, standard streams).  Clients connecting
+    while a command is running are asked to run their commands in-process, rather than wait
+    for it.
+    """
+
+    def __init__(
+        self, socket_path: Path, run_command: CommandRunner, idle_timeout: Optional[float] = None
+    ):
+        self.socket_path = socket_path
+        self.run_command = run_command
+        self.idle_timeout = idle_timeout
+        self._interrupted_by_client = False
+        self._server_socket = None
+
+    def bind(self) -> None:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(self.socket_path))
+            except OSError:
+                pass
+            else:
+                raise DaemonProtocolError(f'b2 daemon is already running at {self.socket_path}')
+        with suppress(FileNotFoundError):
+            self.socket_path.unlink()  # stale socket of a dead daemon
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(str(self.socket_path))
+        finally:
+            os.umask(old_umask)
+        server.listen(socket.SOMAXCONN)
+        server.settimeout(self.idle_timeout or None)
+        self._server_socket = server
+
+    def serve_forever(self) -> None:
+        """
+        Serve until interrupted, or idle for longer than ``idle_timeout``.
+        """
+        if self._server_socket is None:
+            self.bind()
+        server = self._server_socket
+        try:
+            while True:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    logger.info('b2 daemon idle for %s seconds, exiting', self.idle_timeout)
+                    return
+                with connection, self._refusing_other_clients(server):
+                    connection.settimeout(None)
+                    self._interrupted_by_client = False
+                    try:
+                        self.handle(connection)
+                    except (OSError, DaemonProtocolError, ValueError):
+                        logger.exception('b2 daemon cannot handle request')
+                    except KeyboardInterrupt:
+                        # a late interrupt from the client must not stop the daemon
+                        if not self._interrupted_by_client:
+                            raise
+        finally:
+            server.close()
+            with suppress(FileNotFoundError):
+                self.socket_path.unlink()
+
+    @contextmanager
+    def _refusing_other_clients(self, server: socket.socket):
+        wakeup_reader, wakeup_writer = socket.socketpair()
+        refuser = threading.Thread(
+            target=self._refuse_clients, args=(server, wakeup_reader), daemon=True
+        )
+        refuser.start()
+        try:
+            yield
+        finally:
+            wakeup_writer.send(b'\0')
+            refuser.join()
+            wakeup_reader.close()
+            wakeup_writer.close()
+
+    def _refuse_clients(self, server: socket.socket, wakeup_reader: socket.socket) -> None:
+        while True:
+            readable, _, _ = select.select([server, wakeup_reader], [], [])
+            if wakeup_reader in readable:
+                return
+            try:
+                connection, _ = server.accept()
+            except (BlockingIOError, socket.timeout):
+                continue
+            with connection:
+                connection.settimeout(_REFUSAL_TIMEOUT)
+                try:
+                    _, fds = _recv_frame(connection, max_fds=len(_STANDARD_FDS))
+                    for fd in fds:
+                        os.close(fd)
+                    _send_frame(connection, {'fallback': True})
+                except (OSError, DaemonProtocolError, ValueError):
+                    logger.exception('b2 daemon cannot refuse request')
+
+    def handle(self, connection: socket.socket) -> None:
+        request, fds = _recv_frame(connection, max_fds=len(_STANDARD_FDS))
+        if len(fds) != len(_STANDARD_FDS):
+            for fd in fds:
+                os.close(fd)
+            raise DaemonProtocolError(f'expected {len(_STANDARD_FDS)} descriptors, got {fds}')
+        if request.get('version') != PROTOCOL_VERSION or \
+                request.get('installation') != _get_installation():
+            for fd in fds:
+                os.close(fd)
+            _send_frame(connection, {'fallback': True})
+            return
+        stdin, stdout, stderr = (
+            _open_stream(fd, mode, description)
+            for fd, mode, description in zip(fds, 'rww', request['streams'])
+        )
+        with stdin, stdout, stderr:
+            try:
+                reply = {'exit': self._run(request, connection, stdin, stdout, stderr)}
+            except RunInClient:
+                reply = {'fallback': True}
+            stdout.flush()
+            stderr.flush()
+        _send_frame(connection, reply)
+
+    def _run(self, request, connection, stdin, stdout, stderr) -> int:
+        interrupter = threading.Thread(
+            target=self._forward_interrupts, args=(connection,), daemon=True
+        )
+        interrupter.start()
+        try:
+            with _client_context(request['cwd'], request['env'], stdin, stdout, stderr):
+                try:
+                    return self.run_command(request['argv'], stdin, stdout, stderr)
+                except SystemExit as e:  # e.g. argparse errors and --help
+                    if e.code is None or isinstance(e.code, int):
+                        return e.code or 0
+                    print(e.code, file=stderr)
+                    return 1
+                except RunInClient:
+                    raise
+                except KeyboardInterrupt:  # interrupted before the command could handle it
+                    print('\nInterrupted.  Shutting down...\n', file=stderr)
+                    return 1
+                except Exception as e:
+                    logger.exception('b2 daemon command failed')
+                    print(f'ERROR: {e!r}', file=stderr)
+                    return 1
+        finally:
+            # stop watching the connection, so that the interrupter does not fire later
+            with suppress(OSError):
+                connection.shutdown(socket.SHUT_RD)
+            interrupter.join()
+
+    def _forward_interrupts(self, connection: socket.socket) -> None:
+        with suppress(OSError):
+            while connection.recv(1) == _INTERRUPT:
+                self._interrupted_by_client = True
+                os.kill(os.getpid(), signal.SIGINT)
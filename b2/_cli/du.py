@@ -0,0 +1,102 @@
+######################################################################
+#
+# File: b2/_cli/du.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Rollups of file counts and sizes per folder ("prefix"), for ``b2 du``.
+
+A listing of file versions comes in the order of names, so the versions in a folder are listed
+one after another.  The rollup of a folder is therefore complete (and can be printed) as soon as
+the listing leaves the folder, and only the rollups of the folders of the current file have to
+be kept, whatever the size of the bucket is.
+"""
+
+import dataclasses
+from typing import Iterable, Iterator, List, Tuple
+
+from b2sdk.v2 import FileVersion
+
+
+@dataclasses.dataclass
+class Usage:
+    """
+    Usage of storage by file versions in a folder.
+    """
+
+    # files which are not hidden, i.e. their latest version is an upload
+    file_count: int = 0
+    # uploaded versions of files, including hidden and old ones
+    version_count: int = 0
+    hide_marker_count: int = 0
+    # bytes of all uploaded versions
+    total_size: int = 0
+
+    def add(self, other: 'Usage') -> None:
+        self.file_count += other.file_count
+        self.version_count += other.version_count
+        self.hide_marker_count += other.hide_marker_count
+        self.total_size += other.total_size
+
+    def as_dict(self) -> dict:
+        return {
+            'fileCount': self.file_count,
+            'versionCount': self.version_count,
+            'hideMarkerCount': self.hide_marker_count,
+            'totalSize': self.total_size,
+        }
+
+
+def _get_folders(file_name: str, prefix: str, depth: int) -> List[str]:
+    # folders of the file, below the prefix, up to the depth
+    parts = file_name[len(prefix):].split('/')[:-1][:depth]
+    return [prefix + ''.join(part + '/' for part in parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def summarize_usage(
+    file_versions: Iterable[FileVersion],
+    prefix: str = '',
+    depth: int = 1,
+) -> Iterator[Tuple[str, Usage]]:
+    """
+    Yield ``(folder, usage)`` tuples of the prefix and of all folders in it, up to ``depth`` levels
+    below it; every folder comes after the folders in it, so the prefix (the total) comes last.
+
+    :param file_versions: all versions of the files with names starting with the prefix, in the
+                          order of B2 listings (by names, the newest version of a file first)
+    """
+    # the prefix and the folders (in it) of the last listed file, with their usage so far
+    stack = [(prefix, Usage())]
+    previous_file_name = None
+    for file_version in file_versions:
+        file_name = file_version.file_name
+        folders = _get_folders(file_name, prefix, depth)
+        while len(stack) > 1 and (
+            len(stack) - 1 > len(folders) or stack[-1][0] != folders[len(stack) - 2]
+        ):
+            folder, usage = stack.pop()
+            stack[-1][1].add(usage)
+            yield folder, usage
+        stack.extend((folder, Usage()) for folder in folders[len(stack) - 1:])
+
+        usage = stack[-1][1]
+        if file_version.action == 'upload':
+            usage.version_count += 1
+            usage.total_size += file_version.size
+            if file_name != previous_file_name:
+                usage.file_count += 1
+            previous_file_name = file_name
+        elif file_version.action == 'hide':
+            usage.hide_marker_count += 1
+            previous_file_name = file_name
+        # unfinished large files are not counted, and do not hide the uploaded versions
+
+    while stack:
+        folder, usage = stack.pop()
+        if stack:
+            stack[-1][1].add(usage)
+        yield folder, usage
@@ -0,0 +1,41 @@
+# PYTHON_ARGCOMPLETE_OK
+######################################################################
+#
+# File: b2/_cli/entry_point.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+The ``b2`` executable.
+
+Requests which can be answered without loading the whole command-line tool (completion from
+the cached table, commands forwarded to a running ``b2 daemon``) are handled here, before
+``b2.console_tool`` (and b2sdk) are imported.
+"""
+
+import os
+import sys
+
+
+def main():
+    if '_ARGCOMPLETE' in os.environ:
+        from b2._cli.autocomplete_cache import autocomplete_from_cache
+
+        autocomplete_from_cache()
+    else:
+        from b2._cli.daemon import run_in_daemon
+
+        exit_status = run_in_daemon(sys.argv)
+        if exit_status is not None:
+            sys.exit(exit_status)
+
+    from b2.console_tool import main as console_tool_main
+
+    console_tool_main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+######################################################################
+#
+# File: b2/_cli/file_name_filter.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Selection of file names by many wildcard patterns and regular expressions at once.
+
+All wildcard patterns are compiled into a single regular expression (and so are the include and
+the exclude regular expressions), so one listing of the longest literal prefix shared by the
+patterns can be filtered in a single pass, instead of listing the bucket once per pattern.
+"""
+
+import fnmatch
+import re
+from typing import Iterable, Optional, Pattern
+
+_WILDCARD_CHARACTERS = '*?['
+_REGEX_SPECIAL_CHARACTERS = set('.^$*+?{}[]()|\\')
+# quantifiers which make the preceding character optional
+_OPTIONAL_QUANTIFIERS = set('*?{')
+
+
+def _compile_any(regexes: Iterable[str]) -> Optional[Pattern]:
+    regexes = list(regexes)
+    if not regexes:
+        return None
+    return re.compile('|'.join(f'(?:{regex})' for regex in regexes))
+
+
+def _common_prefix(prefixes) -> str:
+    prefixes = list(prefixes)
+    if not prefixes:
+        return ''
+    shortest, longest = min(prefixes), max(prefixes)
+    length = 0
+    while length < len(shortest) and shortest[length] == longest[length]:
+        length += 1
+    return shortest[:length]
+
+
+def get_pattern_literal_prefix(pattern: str) -> str:
+    """
+    Return the text of a wildcard pattern before its first wildcard.
+    """
+    indexes = [
+        pattern.index(character) for character in _WILDCARD_CHARACTERS if character in pattern
+    ]
+    return pattern[:min(indexes, default=len(pattern))]
+
+
+def get_regex_literal_prefix(regex: str) -> str:
+    """
+    Return the literal text which every name matched by ``re.match(regex, name)`` starts with
+    (possibly less than that, but never more).
+    """
+    if '|' in regex:
+        return ''  # an alternative may start with anything
+    prefix = []
+    index = 0
+    if regex.startswith('^'):
+        index = 1
+    while index < len(regex):
+        character = regex[index]
+        if character == '\\':
+            if index + 1 == len(regex) or regex[index + 1].isalnum():
+                break  # a character class or a special sequence, like "\d" or "\A"
+            character = regex[index + 1]
+            index += 2
+        elif character in _REGEX_SPECIAL_CHARACTERS:
+            break
+        else:
+            index += 1
+        if index < len(regex) and regex[index] in _OPTIONAL_QUANTIFIERS:
+            break
+        prefix.append(character)
+        if index < len(regex) and regex[index] == '+':
+            break
+    return ''.join(prefix)
+
+
+class FileNameFilter:
+    """
+    Selects file names which start with ``prefix``, match any of the wildcard ``patterns`` (if
+    there are any), any of the ``include_regexes`` (if there are any) and none of the
+    ``exclude_regexes``.
+
+    Wildcard patterns match whole names, like ``fnmatch.fnmatchcase``, and regular expressions
+    match the beginning of names, like ``re.match`` (and ``--excludeRegex`` of ``sync``).
+
+    :raises re.error: if a regular expression is not valid
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[str] = (),
+        include_regexes: Iterable[str] = (),
+        exclude_regexes: Iterable[str] = (),
+        prefix: str = '',
+    ):
+        self.prefix = prefix
+        self.patterns = list(patterns)
+        self.include_regexes = list(include_regexes)
+        self.exclude_regexes = list(exclude_regexes)
+        self._pattern_re = _compile_any(fnmatch.translate(pattern) for pattern in self.patterns)
+        self._include_re = _compile_any(self.include_regexes)
+        self._exclude_re = _compile_any(self.exclude_regexes)
+
+    @property
+    def listing_prefix(self) -> str:
+        """
+        The longest prefix which all selected names start with, as far as it can be told from
+        the literal beginnings of the patterns and the include regular expressions.
+        """
+        prefixes = [self.prefix]
+        if self.patterns:
+            prefixes.append(_common_prefix(map(get_pattern_literal_prefix, self.patterns)))
+        if self.include_regexes:
+            prefixes.append(_common_prefix(map(get_regex_literal_prefix, self.include_regexes)))
+        # names have to start with all of the prefixes, so the longest one is enough
+        return max(prefixes, key=len)
+
+    def matches(self, file_name: str) -> bool:
+        if not file_name.startswith(self.prefix):
+            return False
+        if self._pattern_re is not None and not self._pattern_re.match(file_name):
+            return False
+        if self._include_re is not None and not self._include_re.match(file_name):
+            return False
+        return self._exclude_re is None or not self._exclude_re.match(file_name)
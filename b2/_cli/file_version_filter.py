@@ -0,0 +1,79 @@
+######################################################################
+#
+# File: b2/_cli/file_version_filter.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Selection of listed file versions by their size, age, action and content type.
+
+The listing is filtered as it streams, so versions which are not selected are never formatted
+(by ``ls``) or submitted for removal (by ``rm``).
+"""
+
+import fnmatch
+import re
+from typing import Iterable, Optional
+
+from b2sdk.v2 import FileVersion
+
+FILE_VERSION_ACTIONS = ('upload', 'hide', 'start')
+
+
+class FileVersionFilter:
+    """
+    Selects file versions with size between ``min_size`` and ``max_size`` (inclusive),
+    older than ``older_than_millis`` and newer than ``newer_than_millis`` (at ``now_millis``),
+    with any of the ``actions`` and any of the ``content_types`` (wildcard patterns, like
+    ``image/*``), if there are any.
+
+    The age of a version is the time since its upload, or, with ``by_mod_time``, since
+    the modification of the source file (``src_last_modified_millis`` file info, if it is set).
+    """
+
+    def __init__(
+        self,
+        now_millis: int,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        older_than_millis: Optional[int] = None,
+        newer_than_millis: Optional[int] = None,
+        by_mod_time: bool = False,
+        actions: Iterable[str] = (),
+        content_types: Iterable[str] = (),
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        # versions have to be uploaded (or modified) before and after these times
+        self.time_before = None if older_than_millis is None else now_millis - older_than_millis
+        self.time_after = None if newer_than_millis is None else now_millis - newer_than_millis
+        self.by_mod_time = by_mod_time
+        self.actions = frozenset(actions)
+        self.content_types = list(content_types)
+        self._content_type_re = re.compile(
+            '|'.join(fnmatch.translate(content_type) for content_type in self.content_types)
+        ) if self.content_types else None
+
+    def matches(self, file_version: FileVersion) -> bool:
+        if self.actions and file_version.action not in self.actions:
+            return False
+        size = file_version.size or 0
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.time_before is not None or self.time_after is not None:
+            if self.by_mod_time:
+                time_millis = file_version.mod_time_millis
+            else:
+                time_millis = file_version.upload_timestamp
+            if self.time_before is not None and time_millis >= self.time_before:
+                return False
+            if self.time_after is not None and time_millis <= self.time_after:
+                return False
+        if self._content_type_re is not None:
+            return self._content_type_re.match(file_version.content_type or '') is not None
+        return True
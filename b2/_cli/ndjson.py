@@ -0,0 +1,89 @@
+######################################################################
+#
+# File: b2/_cli/ndjson.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Newline-delimited JSON (NDJSON) output: one compact JSON object per line.
+
+Unlike ``--json`` output, which is a single document, every record can be consumed (e.g. by
+``jq`` or a log shipper) as soon as it is printed, so records are not indented, keys are not
+sorted and the stream is flushed after each of them.
+"""
+
+import json
+import re
+from typing import Optional
+
+from b2sdk.v2 import SyncReport
+
+from b2.json_encoder import B2CliJsonEncoder
+
+_SEPARATORS = (',', ':')
+
+# verbs of sync actions, as printed by b2sdk, and their names in the records
+_SYNC_ACTIONS = {
+    'upload': 'upload',
+    'hide': 'hide',
+    'dnload': 'download',
+    'copy': 'copy',
+    'delete': 'delete',
+}
+# deletions of B2 files are printed with a note, e.g. "delete a.txt (old version)"
+_DELETE_NOTE_RE = re.compile(r'(?P<name>.*) (?P<note>\((?:old version|hide marker)\))?')
+
+
+def dumps_record(record) -> str:
+    return json.dumps(record, separators=_SEPARATORS, cls=B2CliJsonEncoder)
+
+
+def sync_action_record(message: str) -> Optional[dict]:
+    """
+    Turn a line printed by b2sdk for a sync action into a record, or return ``None`` if it does
+    not describe an action.
+    """
+    verb, _, name = message.partition(' ')
+    if verb not in _SYNC_ACTIONS:
+        return None
+    name = name.lstrip(' ')  # hide actions are aligned with the other verbs
+    record = {'action': _SYNC_ACTIONS[verb], 'fileName': name}
+    if verb == 'delete':
+        match = _DELETE_NOTE_RE.fullmatch(name)
+        if match:
+            record['fileName'] = match.group('name')
+            if match.group('note'):
+                record['note'] = match.group('note')[1:-1]
+    return record
+
+
+class NdjsonSyncReport(SyncReport):
+    """
+    Sync report printing an NDJSON record for every action (and error, or warning) instead of
+    lines for humans.  Progress is never shown, since it would break the stream of records.
+    """
+
+    def __init__(self, stdout):
+        super().__init__(stdout, no_progress=True)
+
+    def print_completion(self, message):
+        record = sync_action_record(message)
+        with self.lock:
+            self._print_record(record if record is not None else {'message': message})
+
+    def error(self, message):
+        with self.lock:
+            self._print_record({'error': message})
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            for warning in self.warnings:
+                self._print_record({'warning': warning})
+
+    def _print_record(self, record):
+        self.stdout.write(dumps_record(record) + '\n')
+        self.stdout.flush()
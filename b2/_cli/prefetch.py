@@ -0,0 +1,84 @@
+######################################################################
+#
+# File: b2/_cli/prefetch.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Iteration over a listing which a thread keeps fetching ahead of the consumer.
+
+A consumer which does its own slow work between the items of a listing (like ``rm``, which
+waits for a free removal slot) would otherwise wait for a whole list round-trip whenever it
+needs the next page.  With the listing fetched ahead into a bounded buffer, the next items are
+usually there already, and memory still holds at most ``max_items`` of them.
+"""
+
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+# seconds between checks of whether the consumer stopped, while the buffer is full
+_STOP_CHECK_INTERVAL = 0.1
+
+
+class _End:
+    pass
+
+
+class _Error:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(iterable: Iterable[T], max_items: int) -> Iterator[T]:
+    """
+    Yield the items of the iterable, which a thread takes from it ahead of the consumer,
+    buffering at most ``max_items`` of them.
+
+    An error raised by the iterable is raised to the consumer once it gets to it.  When the
+    consumer stops (i.e. the returned generator is closed), the thread stops, too, and closes
+    the iterable (if it is a generator, so that its clean-up runs).
+    """
+    buffer = queue.Queue(maxsize=max_items)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=_STOP_CHECK_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_End())
+        except Exception as error:
+            put(_Error(error))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name='listing-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if isinstance(item, _End):
+                return
+            if isinstance(item, _Error):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,50 @@
+######################################################################
+#
+# File: b2/_cli/prune.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Selection of old file versions to remove, for ``b2 prune-versions``.
+
+A listing of all versions comes in the order of names, with the versions of a file one after
+another (the newest first), so the versions to remove are selected in a single pass, keeping
+only the versions of one file at a time.
+"""
+
+import itertools
+from typing import Iterable, Iterator
+
+from b2sdk.v2 import FileVersion
+
+
+def select_versions_to_prune(
+    file_versions: Iterable[FileVersion],
+    keep_versions: int = 1,
+    purge_hidden: bool = False,
+) -> Iterator[FileVersion]:
+    """
+    Yield the versions of files which are not among the newest ``keep_versions`` versions
+    (uploads or hide markers) of their files, or, with ``purge_hidden``, all versions of
+    hidden files (files whose newest version is a hide marker).
+
+    Unfinished large files are left alone.  The hide marker of a hidden file comes after
+    the other versions of the file, so that it can be removed after them (and kept if any of
+    them is not removed), and the file does not become visible again.
+
+    :param file_versions: all versions of files, in the order of B2 listings
+    """
+    versions_of_files = itertools.groupby(
+        (file_version for file_version in file_versions if file_version.action != 'start'),
+        key=lambda file_version: file_version.file_name,
+    )
+    for _, versions in versions_of_files:
+        newest = next(versions)
+        if purge_hidden and newest.action == 'hide':
+            yield from versions
+            yield newest
+            continue
+        yield from itertools.islice(versions, keep_versions - 1, None)
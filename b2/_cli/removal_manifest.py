@@ -0,0 +1,59 @@
+######################################################################
+#
+# File: b2/_cli/removal_manifest.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Manifest of file versions to delete, for ``b2 delete-file-versions``.
+
+A manifest has one file version per line, as ``fileId,fileName`` or just ``fileId``.  File IDs
+have no commas, so everything after the first comma is the name, even if it has commas, too.
+The manifest is read as it goes, so a manifest of millions of versions is never held in memory.
+"""
+
+from typing import Iterable, Iterator, Optional
+
+
+class ManifestError(ValueError):
+    pass
+
+
+class ManifestEntry:
+    """
+    File version listed in a manifest: its ID and, if it is given, its name.
+    """
+
+    __slots__ = ('id_', 'file_name')
+
+    def __init__(self, id_: str, file_name: Optional[str] = None):
+        self.id_ = id_
+        self.file_name = file_name
+
+    def __eq__(self, other):
+        return (self.id_, self.file_name) == (other.id_, other.file_name)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.id_!r}, {self.file_name!r})'
+
+
+def read_removal_manifest(lines: Iterable[str]) -> Iterator[ManifestEntry]:
+    """
+    Yield the file versions listed in the lines of a manifest, skipping empty lines
+    and lines starting with ``#``.
+
+    :raises ManifestError: if a line has no file ID
+    """
+    for line_number, line in enumerate(lines, start=1):
+        # file names may start or end with spaces, so only the line break is removed
+        line = line.rstrip('\r\n')
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        file_id, comma, file_name = line.partition(',')
+        file_id = file_id.strip()
+        if not file_id:
+            raise ManifestError(f'line {line_number} of the manifest has no file ID')
+        yield ManifestEntry(file_id, file_name if comma and file_name else None)
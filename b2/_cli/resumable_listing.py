@@ -0,0 +1,124 @@
+######################################################################
+#
+# File: b2/_cli/resumable_listing.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Listings which start where a previous one stopped, and the positions to continue them from.
+
+A listing comes in the order of names (and, for versions of a file, from the newest one), so
+the name (and the ID) of the last processed file version is enough to continue it: the next
+listing starts from that name in B2, and whatever it lists up to that version is skipped.
+"""
+
+import shlex
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from b2sdk.v2 import FileVersion
+
+ListingEntry = Tuple[FileVersion, Optional[str]]
+
+
+def get_entry_name(entry: ListingEntry) -> str:
+    """
+    Return the name of a listing entry, i.e. the name of the folder or of the file.
+    """
+    file_version, folder_name = entry
+    return folder_name or file_version.file_name
+
+
+def skip_to_start(
+    listing: Iterable[ListingEntry],
+    start_file_name: Optional[str] = None,
+    start_after: Optional[str] = None,
+    start_after_file_id: Optional[str] = None,
+    start_after_upload_timestamp: Optional[int] = None,
+) -> Iterator[ListingEntry]:
+    """
+    Yield the entries of the listing starting with the name ``start_file_name``, or the ones
+    after the name ``start_after`` (or, if ``start_after_file_id`` is given, the ones after
+    that version of the file).
+
+    The version may be gone (e.g. removed after the previous listing stopped at it), so with
+    its ``start_after_upload_timestamp``, the versions of the file uploaded before it are
+    yielded even if the version itself is not listed.
+
+    The listing may start anywhere before, e.g. at the given name in B2.
+    """
+    listing = iter(listing)
+    if start_file_name is None and start_after is None:
+        yield from listing
+        return
+    for entry in listing:
+        name = get_entry_name(entry)
+        if start_file_name is not None:
+            if name >= start_file_name:
+                yield entry
+                break
+        elif name > start_after:
+            yield entry
+            break
+        elif name == start_after and start_after_file_id is not None and entry[1] is None:
+            if entry[0].id_ == start_after_file_id:
+                break  # older versions of the file come next
+            if (
+                start_after_upload_timestamp is not None and
+                entry[0].upload_timestamp < start_after_upload_timestamp
+            ):
+                yield entry  # the version is gone, and this one was uploaded before it
+                break
+    yield from listing
+
+
+class ListingPosition:
+    """
+    Keeps track of how far a consumer got in a listing given to it by ``limit``.
+    """
+
+    def __init__(self):
+        # the last entry which the consumer is done with
+        self.last: Optional[ListingEntry] = None
+        # whether the listing was cut by the limit before its end
+        self.more = False
+
+    def limit(
+        self,
+        listing: Iterable[ListingEntry],
+        max_results: Optional[int] = None,
+    ) -> Iterator[ListingEntry]:
+        """
+        Yield at most ``max_results`` entries of the listing.
+        """
+        count = 0
+        for entry in listing:
+            if max_results is not None and count >= max_results:
+                self.more = True
+                return
+            yield entry
+            # the consumer asks for the next entry, so it is done with this one
+            self.last = entry
+            count += 1
+
+    def get_continuation_args(self, with_file_id: bool) -> Optional[List[str]]:
+        """
+        Return the options which make the same command continue after the last entry,
+        or ``None`` if the consumer is not done with any.
+
+        :param with_file_id: whether the listing has all versions of files, so the next one
+                             should start after the last version instead of the last file
+        """
+        if self.last is None:
+            return None
+        file_version, folder_name = self.last
+        args = ['--startAfter', get_entry_name(self.last)]
+        if with_file_id and folder_name is None:
+            args += ['--startAfterFileId', file_version.id_]
+        return args
+
+
+def format_continuation(args: List[str]) -> str:
+    return 'To continue, run the command again with: ' + ' '.join(map(shlex.quote, args))
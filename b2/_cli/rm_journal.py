@@ -0,0 +1,157 @@
+######################################################################
+#
+# File: b2/_cli/rm_journal.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Journal of ``rm``, which lets a killed run be resumed without listing the bucket from the start.
+
+The journal is a file of JSON records, one per line, appended as the removal goes:
+
+* the command (the bucket and the selection of files), so that a journal is not resumed by
+  another command, and the time it was started at, which the ages of file versions selected by
+  the command are measured from, so that the selection does not change when it is resumed,
+* ``submitted`` and ``removed`` file versions, written (but not synced) at once, so they
+  survive the process being killed,
+* checkpoints: the options continuing the listing after everything submitted before, written
+  every few seconds and synced to the disk.
+
+Resuming continues the listing from the last checkpoint and skips the file versions recorded
+after it: without ``--versions``, the files which were submitted (their latest versions may be
+gone, so listing them again would remove the previous versions), and with ``--versions``, the
+versions which were removed or not found.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+from b2sdk.v2 import FileVersion
+
+# seconds between synced checkpoints
+DEFAULT_CHECKPOINT_INTERVAL = 5.0
+
+
+class JournalError(Exception):
+    pass
+
+
+class RemovalJournal:
+    """
+    Journal of a single ``rm`` command.  THREAD SAFE.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        command: dict,
+        versions: bool,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        started_millis: Optional[int] = None,
+    ):
+        self.path = path
+        self.command = command
+        self.versions = versions
+        self.checkpoint_interval = checkpoint_interval
+        # the time in milliseconds which the command was first run at
+        self.started_millis = int(time.time() * 1000) if started_millis is None else started_millis
+        # the options continuing the listing, from the last checkpoint of the journal
+        self.checkpoint: Optional[List[str]] = None
+        # names of submitted files (without --versions) or IDs of removed versions
+        # recorded after the checkpoint
+        self._done = set()
+        self._lock = threading.Lock()
+        self._file = None
+        self._last_checkpoint_time = time.monotonic()
+
+    @classmethod
+    def open(
+        cls,
+        path: str,
+        command: dict,
+        versions: bool,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        started_millis: Optional[int] = None,
+    ) -> 'RemovalJournal':
+        """
+        Open the journal at the path, reading what was recorded in it, or create it
+        (with ``started_millis``, or the current time, as the time the command was started at).
+
+        :raises JournalError: if the journal is of another command, or it cannot be read
+        """
+        journal = cls(path, command, versions, checkpoint_interval, started_millis)
+        exists = os.path.exists(path)
+        if exists:
+            journal._read()
+        journal._file = open(path, 'a', encoding='utf-8')
+        if not exists:
+            record = {'command': command, 'startedMillis': journal.started_millis}
+            journal._append(record, sync=True)
+        return journal
+
+    def _read(self) -> None:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError as error:
+            raise JournalError(f'cannot read journal {self.path}: {error}')
+        if lines and not lines[-1].endswith('\n'):
+            lines.pop()  # the record was being written when the command was killed
+        try:
+            records = [json.loads(line) for line in lines]
+        except ValueError:
+            raise JournalError(f'{self.path} is not a journal of rm')
+        if not records or records[0].get('command') != self.command:
+            raise JournalError(f'{self.path} is a journal of another rm command')
+        self.started_millis = records[0].get('startedMillis', self.started_millis)
+        for record in records[1:]:
+            if 'checkpoint' in record:
+                self.checkpoint = record['checkpoint']
+                self._done.clear()
+            elif 'submitted' in record and not self.versions:
+                self._done.add(record['submitted'])
+            elif 'removed' in record and self.versions:
+                self._done.add(record['removed'])
+
+    def is_done(self, file_version: FileVersion) -> bool:
+        """
+        Tell whether the file version should be skipped, as it was taken care of before.
+        """
+        key = file_version.id_ if self.versions else file_version.file_name
+        return key in self._done
+
+    def record_submitted(self, file_version: FileVersion) -> None:
+        self._append({'submitted': file_version.file_name, 'fileId': file_version.id_})
+
+    def record_removed(self, file_version: FileVersion) -> None:
+        self._append({'removed': file_version.id_, 'fileName': file_version.file_name})
+
+    def is_checkpoint_due(self) -> bool:
+        return time.monotonic() - self._last_checkpoint_time >= self.checkpoint_interval
+
+    def record_checkpoint(self, continuation_args: List[str]) -> None:
+        self._last_checkpoint_time = time.monotonic()
+        self._append({'checkpoint': continuation_args}, sync=True)
+
+    def _append(self, record: dict, sync: bool = False) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self) -> None:
+        self.close()
+        os.remove(self.path)
@@ -0,0 +1,529 @@
+######################################################################
+#
+# File: b2/_cli/sharded_listing.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Recursive listing of a bucket with many concurrent cursors.
+
+``Bucket.ls`` lists the files one page after another, so listing a bucket with millions of
+files takes millions of sequential round-trips divided by the page size.  ``ShardedLister``
+splits the name space into shards at "folder" boundaries and at split points sampled from
+the names, and lists the shards concurrently:
+
+* a shard lists the names with its prefix (up to the end of its range, if it has one) page by
+  page; files and folders which are complete within a page are used as they are, but a folder
+  which continues beyond the page becomes a new shard (with the folder as its prefix) and the
+  shard skips past the folder's names,
+* a shard which continues beyond a page of files (e.g. in a bucket without folders) while
+  there are fewer shards than threads is split into ranges, at names made of the characters of
+  the page, e.g. after a page of ``file000000`` to ``file000999``, ``file002``, ``file003``...
+  (a range after the names which fit in a page, and so on), and the last range splits further
+  once it continues beyond its own first page,
+* shards are lists of file versions and (in place of the folders) their child shards, so
+  walking them depth-first gives all the file versions in the order of B2 (i.e. the same as
+  ``Bucket.ls``), while a caller who does not need the order can take any of the listed ones,
+* workers always fetch a page of the shard whose cursor is the earliest in the name space
+  (among the shards which have not buffered enough yet), so the shard needed next is never
+  starved,
+* all the shards together buffer at most ``MAX_BUFFERED_PAGES`` pages per thread (plus the
+  pages being fetched), so memory is bounded however many shards are split off; once they
+  do, only the shard which the caller waits for is fetched.
+"""
+
+import collections
+import fnmatch
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from b2sdk.v2 import Bucket, FileVersion
+
+DEFAULT_FETCH_COUNT = 1000
+# how many pages a shard (and all the shards, per thread) can buffer before
+# they wait for them to be taken
+MAX_BUFFERED_PAGES = 2
+
+_WILDCARD_CHARACTERS = '*?['
+
+
+def get_listing_prefix(folder_to_list: str, with_wildcard: bool) -> str:
+    """
+    Return the prefix of the names which ``Bucket.ls`` would list.
+    """
+    if with_wildcard:
+        wildcard_indexes = [
+            folder_to_list.index(character)
+            for character in _WILDCARD_CHARACTERS if character in folder_to_list
+        ]
+        if not wildcard_indexes:
+            return folder_to_list  # an exact file name, e.g. "a/b.txt"
+        head = folder_to_list[:min(wildcard_indexes)]
+        return head[:head.rfind('/') + 1]
+    if folder_to_list and not folder_to_list.endswith('/'):
+        return folder_to_list + '/'
+    return folder_to_list
+
+
+def _folder_end(folder: str) -> str:
+    # the first name after all the names in the folder ("/" is followed by "0")
+    return folder[:-1] + '0'
+
+
+def _common_prefix_length(name: str, other_name: str) -> int:
+    length = 0
+    for character, other_character in zip(name, other_name):
+        if character != other_character:
+            break
+        length += 1
+    return length
+
+
+def sample_split_points(
+    prefix: str,
+    page_file_names: List[str],
+    next_file_name: str,
+    end_file_name: Optional[str],
+    count: int,
+) -> List[str]:
+    """
+    Return up to ``count`` names between ``next_file_name`` and ``end_file_name`` (if given) to
+    split the rest of a range at, in ascending order.
+
+    The names of the page before ``next_file_name`` vary from some position on, so ranges
+    of names which differ from ``next_file_name`` one position before it are about as big as
+    a page, and so on: split points are ``next_file_name`` cut at these positions, with the
+    characters of the page following the cut, from the smallest ranges to the biggest ones.
+    """
+    alphabet = sorted(set(''.join(name[len(prefix):] for name in page_file_names)))
+    varying_from = _common_prefix_length(page_file_names[0], page_file_names[-1])
+    position = min(max(varying_from - 1, len(prefix)), len(next_file_name) - 1)
+    split_points = []
+    while position >= len(prefix) and len(split_points) < count:
+        for character in alphabet:
+            if character <= next_file_name[position]:
+                continue
+            split_point = next_file_name[:position] + character
+            if end_file_name is not None and split_point >= end_file_name:
+                return split_points
+            split_points.append(split_point)
+            if len(split_points) == count:
+                break
+        position -= 1
+    return split_points
+
+
+class _Shard:
+    def __init__(self, prefix: str, end_file_name: Optional[str] = None):
+        self.prefix = prefix
+        self.start_file_name = prefix
+        self.start_file_id = None
+        # the first name after the range of the shard, if it is a part of its prefix's names
+        self.end_file_name = end_file_name
+        # file versions and child shards, in the order of names
+        self.entries = collections.deque()
+        self.busy = False
+        self.done = False
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.prefix!r}>'
+
+
+class ShardedLister:
+    """
+    Lists file versions of a bucket recursively, like ``Bucket.ls(..., recursive=True)``,
+    with ``threads`` concurrent cursors.
+    """
+
+    def __init__(
+        self,
+        bucket: Bucket,
+        threads: int,
+        ordered: bool = True,
+        fetch_count: int = DEFAULT_FETCH_COUNT,
+    ):
+        self.bucket = bucket
+        self.threads = threads
+        self.ordered = ordered
+        self.fetch_count = fetch_count
+        self._condition = threading.Condition()
+        self._shards: List[_Shard] = []  # shards which have entries or will have more
+        # file versions in the entries of all the shards
+        self._buffered = 0
+        self._max_buffered = MAX_BUFFERED_PAGES * max(threads, 1) * fetch_count
+        # shard which the caller of an ordered listing waits for
+        self._needed: Optional[_Shard] = None
+        self._error = None
+        self._closed = False
+
+    def ls(
+        self,
+        folder_to_list: str = '',
+        latest_only: bool = True,
+        with_wildcard: bool = False,
+        start_file_name: Optional[str] = None,
+        start_file_id: Optional[str] = None,
+    ) -> Iterator[Tuple[FileVersion, None]]:
+        """
+        Yield ``(file_version, None)`` tuples, like ``Bucket.ls`` does with ``recursive=True``,
+        starting at ``start_file_name`` (and ``start_file_id``), if given.
+
+        The lister can only be used once.
+        """
+        listing = self.ls_prefix(
+            get_listing_prefix(folder_to_list, with_wildcard),
+            latest_only,
+            start_file_name,
+            start_file_id,
+        )
+        for file_version, folder_name in listing:
+            if not with_wildcard or fnmatch.fnmatchcase(file_version.file_name, folder_to_list):
+                yield file_version, folder_name
+
+    def ls_prefix(
+        self,
+        prefix: str = '',
+        latest_only: bool = True,
+        start_file_name: Optional[str] = None,
+        start_file_id: Optional[str] = None,
+    ) -> Iterator[Tuple[FileVersion, None]]:
+        """
+        Yield ``(file_version, None)`` tuples of all files with names starting with ``prefix``,
+        which (unlike the ``folder_to_list`` of ``ls``) does not have to be a folder, starting
+        at ``start_file_name`` (and ``start_file_id``, of a version of that file), if given.
+
+        The lister can only be used once.
+        """
+        root = _Shard(prefix)
+        if start_file_name is not None and start_file_name > prefix:
+            root.start_file_name = start_file_name
+            root.start_file_id = start_file_id
+        self._shards.append(root)
+        self._start_workers(latest_only)
+        try:
+            taken = self._take_ordered(root) if self.ordered else self._take_any()
+            for file_version in taken:
+                yield file_version, None
+        finally:
+            self._stop_workers()
+
+    def _start_workers(self, latest_only: bool) -> None:
+        for _ in range(self.threads):
+            threading.Thread(target=self._work, args=(latest_only,), daemon=True).start()
+
+    def _stop_workers(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _take_ordered(self, root: _Shard) -> Iterator[FileVersion]:
+        stack = [root]
+        while stack:
+            shard = stack[-1]
+            with self._condition:
+                if not shard.entries and not shard.done:
+                    self._needed = shard
+                    self._condition.notify_all()
+                    while not shard.entries and not shard.done:
+                        self._wait()
+                    self._needed = None
+                if not shard.entries:
+                    stack.pop()
+                    self._shards.remove(shard)
+                    continue
+                entry = shard.entries.popleft()
+                if not isinstance(entry, _Shard):
+                    self._buffered -= 1
+                self._condition.notify_all()
+            if isinstance(entry, _Shard):
+                stack.append(entry)
+            else:
+                yield entry
+
+    def _take_any(self) -> Iterator[FileVersion]:
+        while True:
+            with self._condition:
+                while True:
+                    # children were added to the shards when they were found
+                    self._shards = [
+                        shard for shard in self._shards if shard.entries or not shard.done
+                    ]
+                    if not self._shards:
+                        return
+                    shard = next((shard for shard in self._shards if shard.entries), None)
+                    if shard is not None:
+                        break
+                    self._wait()
+                file_versions = [entry for entry in shard.entries if not isinstance(entry, _Shard)]
+                shard.entries.clear()
+                self._buffered -= len(file_versions)
+                self._condition.notify_all()
+            yield from file_versions
+
+    def _wait(self):
+        if self._error is not None:
+            raise self._error
+        self._condition.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _work(self, latest_only: bool):
+        while True:
+            with self._condition:
+                shard = None
+                while shard is None:
+                    if self._closed or self._error is not None:
+                        return
+                    if all(listed.done for listed in self._shards):
+                        return
+                    shard = self._next_shard()
+                    if shard is None:
+                        self._condition.wait()
+                shard.busy = True
+            try:
+                response = self._fetch_page(shard, latest_only)
+                file_factory = self.bucket.api.file_version_factory
+                file_versions = [
+                    file_factory.from_api_response(entry) for entry in response['files']
+                ]
+            except Exception as error:
+                with self._condition:
+                    self._error = error
+                    self._condition.notify_all()
+                return
+            next_file_name = response.get('nextFileName')
+            next_file_id = response.get('nextFileId')
+            if shard.end_file_name is not None:
+                # the listing goes on past the range, into the next shard's names
+                file_versions = [
+                    file_version for file_version in file_versions
+                    if file_version.file_name < shard.end_file_name
+                ]
+                if next_file_name is not None and next_file_name >= shard.end_file_name:
+                    next_file_name = next_file_id = None
+            with self._condition:
+                self._add_page(shard, file_versions, next_file_name, next_file_id)
+                shard.busy = False
+                self._condition.notify_all()
+
+    def _next_shard(self) -> Optional[_Shard]:
+        max_buffered = MAX_BUFFERED_PAGES * self.fetch_count
+        ready = [
+            shard for shard in self._shards
+            if not shard.busy and not shard.done and len(shard.entries) < max_buffered
+        ]
+        if self._buffered >= self._max_buffered:
+            # the buffers are taken only as far as the caller gets, so the shard it waits for
+            # is fetched anyway (in an unordered listing, the caller takes any entries)
+            ready = [shard for shard in ready if shard is self._needed]
+        return min(ready, key=lambda shard: shard.start_file_name, default=None)
+
+    def _should_split(self) -> bool:
+        if self.threads < 2:
+            return False
+        return sum(not shard.done for shard in self._shards) <= self.threads
+
+    def _fetch_page(self, shard: _Shard, latest_only: bool) -> dict:
+        session = self.bucket.api.session
+        if latest_only:
+            return session.list_file_names(
+                self.bucket.id_, shard.start_file_name, self.fetch_count, shard.prefix
+            )
+        return session.list_file_versions(
+            self.bucket.id_,
+            shard.start_file_name,
+            shard.start_file_id,
+            self.fetch_count,
+            shard.prefix,
+        )
+
+    def _add_page(
+        self,
+        shard: _Shard,
+        file_versions: List[FileVersion],
+        next_file_name: Optional[str],
+        next_file_id: Optional[str],
+    ) -> None:
+        """
+        Add file versions of a page to the shard, splitting off a folder which continues on
+        the next page (or the rest of the shard's range, if there are few shards), and move
+        the shard's cursor.
+        """
+        groups = []  # (name of the file or folder, file versions)
+        for file_version in file_versions:
+            relative_name = file_version.file_name[len(shard.prefix):]
+            if '/' in relative_name:
+                group_name = shard.prefix + relative_name.split('/')[0] + '/'
+            else:
+                group_name = file_version.file_name
+            if groups and groups[-1][0] == group_name:
+                groups[-1][1].append(file_version)
+            else:
+                groups.append((group_name, [file_version]))
+
+        if next_file_name is not None and not next_file_name.startswith(shard.prefix):
+            next_file_name = None
+        split_folder = None
+        if next_file_name is not None and groups and next_file_name.startswith(groups[-1][0]):
+            if groups[-1][0].endswith('/'):
+                split_folder, split_file_versions = groups.pop()
+        split_points = []
+        if split_folder is None and next_file_name is not None and file_versions and \
+                self._should_split():
+            split_points = sample_split_points(
+                shard.prefix,
+                [file_version.file_name for file_version in file_versions],
+                next_file_name,
+                shard.end_file_name,
+                self.threads,
+            )
+
+        self._buffered += len(file_versions)
+        for _, group_file_versions in groups:
+            shard.entries.extend(group_file_versions)
+        if split_folder is not None:
+            # the folder continues on the next page, so it becomes a shard of its own,
+            # starting with what has been listed already
+            child = _Shard(split_folder, shard.end_file_name)
+            child.entries.extend(split_file_versions)
+            child.start_file_name = next_file_name
+            child.start_file_id = next_file_id
+            shard.entries.append(child)
+            self._shards.append(child)
+            shard.start_file_name = _folder_end(split_folder)
+            shard.start_file_id = None
+            if shard.end_file_name is not None and shard.start_file_name >= shard.end_file_name:
+                shard.done = True
+        elif split_points:
+            # the rest of the shard's names are split into ranges, listed by shards of their own
+            ends = split_points + [shard.end_file_name]
+            starts = [next_file_name] + split_points
+            for index, (start, end) in enumerate(zip(starts, ends)):
+                child = _Shard(shard.prefix, end)
+                child.start_file_name = start
+                if index == 0:
+                    child.start_file_id = next_file_id
+                shard.entries.append(child)
+                self._shards.append(child)
+            shard.done = True
+        elif next_file_name is not None:
+            shard.start_file_name = next_file_name
+            shard.start_file_id = next_file_id
+        else:
+            shard.done = True
+
+
+class ShardedSizeCounter(ShardedLister):
+    """
+    Counts all versions of files in a bucket and their total size, listing shards of the bucket
+    concurrently, like ``ShardedLister``.
+
+    File versions are counted as soon as their page is listed, so at any moment the counts are
+    those of everything before the cursors of the shards which are not done yet.  ``get_state``
+    returns both, and a counter created with such a ``state`` (e.g. of an interrupted run)
+    continues from it.
+
+    :raises ValueError: if the state is not a valid state of counting the bucket
+    """
+
+    def __init__(
+        self,
+        bucket: Bucket,
+        threads: int,
+        state: Optional[dict] = None,
+        fetch_count: int = DEFAULT_FETCH_COUNT,
+    ):
+        super().__init__(bucket, threads, ordered=False, fetch_count=fetch_count)
+        self.file_count = 0
+        self.total_size = 0
+        if state is None:
+            self._shards.append(_Shard(''))
+        else:
+            self._set_state(state)
+
+    def count(
+        self,
+        on_progress: Optional[Callable[[dict], None]] = None,
+        progress_interval: float = 1.0,
+    ) -> Tuple[int, int]:
+        """
+        Count file versions, calling ``on_progress`` with the state every ``progress_interval``
+        seconds, and return the number of file versions and their total size.
+
+        The counter can only be used once.
+        """
+        self._start_workers(latest_only=False)
+        try:
+            reported_at = time.monotonic()
+            while True:
+                with self._condition:
+                    if self._error is not None:
+                        raise self._error
+                    if all(shard.done for shard in self._shards):
+                        break
+                    self._condition.wait(progress_interval)
+                    state = None
+                    if on_progress is not None and \
+                            time.monotonic() - reported_at >= progress_interval:
+                        state = self.get_state()
+                # outside of the lock, not to stop the workers
+                if state is not None:
+                    reported_at = time.monotonic()
+                    on_progress(state)
+        finally:
+            self._stop_workers()
+        return self.file_count, self.total_size
+
+    def get_state(self) -> dict:
+        with self._condition:
+            shards = [
+                {
+                    'prefix': shard.prefix,
+                    'startFileName': shard.start_file_name,
+                    'startFileId': shard.start_file_id,
+                    'endFileName': shard.end_file_name,
+                } for shard in self._shards if not shard.done
+            ]
+            return {
+                'bucketId': self.bucket.id_,
+                'fileCount': self.file_count,
+                'totalSize': self.total_size,
+                'shards': shards,
+            }
+
+    def _set_state(self, state: dict) -> None:
+        try:
+            if state['bucketId'] != self.bucket.id_:
+                raise ValueError('the state is of another bucket')
+            self.file_count = state['fileCount']
+            self.total_size = state['totalSize']
+            for shard_state in state['shards']:
+                shard = _Shard(shard_state['prefix'], shard_state.get('endFileName'))
+                shard.start_file_name = shard_state['startFileName']
+                shard.start_file_id = shard_state['startFileId']
+                self._shards.append(shard)
+        except (KeyError, TypeError) as error:
+            raise ValueError(f'invalid state: {error!r}')
+
+    def _add_page(
+        self,
+        shard: _Shard,
+        file_versions: List[FileVersion],
+        next_file_name: Optional[str],
+        next_file_id: Optional[str],
+    ) -> None:
+        self.file_count += len(file_versions)
+        self.total_size += sum(file_version.size or 0 for file_version in file_versions)
+        super()._add_page(shard, file_versions, next_file_name, next_file_id)
+        # the versions are counted, so neither the shard nor its new child keeps them
+        for entry in shard.entries:
+            if isinstance(entry, _Shard):
+                entry.entries.clear()
+        shard.entries.clear()
+        self._buffered -= len(file_versions)
+        if shard.done:
+            self._shards.remove(shard)
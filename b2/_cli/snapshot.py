@@ -0,0 +1,320 @@
+######################################################################
+#
+# File: b2/_cli/snapshot.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Local snapshots of bucket listings, stored in SQLite databases.
+
+A snapshot keeps the name, id, size, SHA1 checksum, upload timestamp and action of every
+version of every file in a bucket, so that audits can list a bucket (as ``Bucket.ls`` would)
+without listing it in B2 again.
+"""
+
+import fnmatch
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+from b2sdk.v2 import FileVersion
+
+from b2._cli.cache import get_cache_dir
+from b2._cli.sharded_listing import get_listing_prefix
+
+SCHEMA_VERSION = 1
+# number of file versions inserted in one statement
+_BATCH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS file_versions (
+    file_id TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    content_sha1 TEXT,
+    upload_timestamp INTEGER NOT NULL,
+    action TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS file_versions_by_name
+    ON file_versions (file_name, upload_timestamp DESC, file_id DESC);
+"""
+
+_COLUMNS = 'file_id, file_name, size, content_sha1, upload_timestamp, action'
+_NOT_STORED = {'isClientAuthorizedToRead': False, 'value': None}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def get_default_snapshot_path(bucket_name: str) -> Optional[Path]:
+    snapshot_dir = get_cache_dir('snapshots')
+    if snapshot_dir is None:
+        return None
+    return snapshot_dir / f'{bucket_name}.sqlite'
+
+
+def _prefix_end(prefix: str) -> Optional[str]:
+    # the first name after all the names with the prefix
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class BucketSnapshot:
+    """
+    Snapshot of a bucket listing, in a SQLite database.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    @classmethod
+    def create_or_open(
+        cls,
+        path: Path,
+        account_id: str,
+        bucket_id: str,
+        bucket_name: str,
+    ) -> 'BucketSnapshot':
+        snapshot = cls(sqlite3.connect(str(path)))
+        try:
+            with snapshot.connection:
+                snapshot.connection.executescript(_SCHEMA)
+            stored_bucket_id = snapshot.get_meta('bucket_id')
+            if stored_bucket_id is None:
+                snapshot.set_meta(
+                    schema_version=SCHEMA_VERSION,
+                    account_id=account_id,
+                    bucket_id=bucket_id,
+                )
+            elif stored_bucket_id != bucket_id:
+                raise SnapshotError(f'{path} is a snapshot of another bucket')
+            snapshot._check_schema_version(path)
+            snapshot.set_meta(bucket_name=bucket_name)
+        except BaseException:
+            snapshot.close()
+            raise
+        return snapshot
+
+    @classmethod
+    def open(cls, path: Path) -> 'BucketSnapshot':
+        if not path.exists():
+            raise SnapshotError(f'snapshot {path} does not exist')
+        snapshot = cls(sqlite3.connect(str(path)))
+        try:
+            snapshot._check_schema_version(path)
+        except (SnapshotError, sqlite3.DatabaseError):
+            snapshot.close()
+            raise
+        return snapshot
+
+    def _check_schema_version(self, path: Path) -> None:
+        if self.get_meta('schema_version') != SCHEMA_VERSION:
+            raise SnapshotError(f'{path} is not a snapshot made by this version of the tool')
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_meta(self, key: str):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row and row[0]
+
+    def set_meta(self, **values) -> None:
+        with self.connection:
+            self._set_meta(values)
+
+    def _set_meta(self, values: dict) -> None:
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', values.items()
+        )
+
+    def count(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM file_versions').fetchone()[0]
+
+    def get_upload_timestamp(self, file_id: str) -> Optional[int]:
+        """
+        Return the upload timestamp of the file version, or ``None`` if it is not in the snapshot.
+        """
+        row = self.connection.execute(
+            'SELECT upload_timestamp FROM file_versions WHERE file_id = ?', (file_id,)
+        ).fetchone()
+        return row and row[0]
+
+    def refresh(self, file_versions: Iterable[FileVersion], prefix: str = '') -> dict:
+        """
+        Replace the stored versions of files with the given prefix with the listed ones.
+
+        :return: a summary of the changes
+        """
+        watermark = self.get_meta('watermark')
+        prefix_end = _prefix_end(prefix)
+        name_condition = 'file_name >= ?' + ('' if prefix_end is None else ' AND file_name < ?')
+        name_bounds = (prefix,) if prefix_end is None else (prefix, prefix_end)
+        connection = self.connection
+        with connection:
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS listed (file_id TEXT PRIMARY KEY)')
+            connection.execute('DELETE FROM listed')
+            count_before = self.count()
+            listed = 0
+            new_since_watermark = 0
+            batch = []
+            for file_version in file_versions:
+                listed += 1
+                if watermark is None or file_version.upload_timestamp > watermark:
+                    new_since_watermark += 1
+                batch.append(
+                    (
+                        file_version.id_,
+                        file_version.file_name,
+                        file_version.size or 0,
+                        file_version.content_sha1,
+                        file_version.upload_timestamp,
+                        file_version.action,
+                    )
+                )
+                if len(batch) == _BATCH_SIZE:
+                    self._store(batch)
+                    batch = []
+            self._store(batch)
+            removed = connection.execute(
+                f'DELETE FROM file_versions WHERE {name_condition} '
+                'AND file_id NOT IN (SELECT file_id FROM listed)',
+                name_bounds,
+            ).rowcount
+            count_after = self.count()
+            latest = connection.execute('SELECT MAX(upload_timestamp) FROM file_versions')
+            self._set_meta(
+                {
+                    'watermark': latest.fetchone()[0],
+                    'refreshed': int(time.time() * 1000),
+                }
+            )
+        return {
+            'fileVersions': count_after,
+            'listed': listed,
+            'added': count_after - count_before + removed,
+            'removed': removed,
+            'newSinceWatermark': new_since_watermark,
+            'watermark': self.get_meta('watermark'),
+        }
+
+    def _store(self, batch) -> None:
+        # versions are immutable, but large files which were being uploaded get finished;
+        # not an upsert (ON CONFLICT), which needs SQLite 3.24, as all columns are replaced anyway
+        self.connection.executemany(
+            f'INSERT OR REPLACE INTO file_versions ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)',
+            batch,
+        )
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO listed (file_id) VALUES (?)', [(row[0],) for row in batch]
+        )
+
+    def ls(
+        self,
+        file_version_factory,
+        folder_to_list: str = '',
+        latest_only: bool = True,
+        recursive: bool = False,
+        with_wildcard: bool = False,
+    ) -> Iterator[Tuple[FileVersion, Optional[str]]]:
+        """
+        Yield ``(file_version, folder_name)`` tuples, the same as ``Bucket.ls`` would have
+        when the snapshot was made.
+        """
+        if with_wildcard and not recursive:
+            raise ValueError('with_wildcard requires recursive to be turned on as well')
+        return self._ls(
+            file_version_factory,
+            get_listing_prefix(folder_to_list, with_wildcard),
+            latest_only,
+            recursive,
+            folder_to_list if with_wildcard else None,
+        )
+
+    def ls_prefix(
+        self,
+        file_version_factory,
+        prefix: str = '',
+        latest_only: bool = True,
+    ) -> Iterator[Tuple[FileVersion, None]]:
+        """
+        Yield ``(file_version, None)`` tuples of all files with names starting with ``prefix``,
+        which does not have to be a folder.
+        """
+        return self._ls(file_version_factory, prefix, latest_only, True, None)
+
+    def _ls(
+        self,
+        file_version_factory,
+        prefix: str,
+        latest_only: bool,
+        recursive: bool,
+        pattern: Optional[str],
+    ) -> Iterator[Tuple[FileVersion, Optional[str]]]:
+        account_id = self.get_meta('account_id')
+        bucket_id = self.get_meta('bucket_id')
+        prefix_end = _prefix_end(prefix)
+        start_file_name = prefix
+        while start_file_name is not None:
+            rows = self._rows(start_file_name, prefix_end)
+            start_file_name = None
+            previous_file_name = None
+            for row in rows:
+                file_id, file_name, size, content_sha1, upload_timestamp, action = row
+                if latest_only:
+                    # only the latest version of each file, if it is not hidden;
+                    # unfinished large files are not versions of the file yet
+                    if action == 'start' or file_name == previous_file_name:
+                        continue
+                    previous_file_name = file_name
+                    if action != 'upload':
+                        continue
+                if pattern is not None and not fnmatch.fnmatchcase(file_name, pattern):
+                    continue
+                file_version = file_version_factory.from_api_response(
+                    {
+                        'accountId': account_id,
+                        'bucketId': bucket_id,
+                        'fileId': file_id,
+                        'fileName': file_name,
+                        'size': size,
+                        'contentSha1': content_sha1,
+                        'uploadTimestamp': upload_timestamp,
+                        'action': action,
+                        # not stored in snapshots
+                        'fileRetention': _NOT_STORED,
+                        'legalHold': _NOT_STORED,
+                    }
+                )
+                after_prefix = file_name[len(prefix):]
+                if '/' in after_prefix and not recursive:
+                    # a folder, which is listed once; continue after its names
+                    folder_name = prefix + after_prefix.split('/')[0] + '/'
+                    yield file_version, folder_name
+                    start_file_name = _prefix_end(folder_name)
+                    break
+                yield file_version, None
+
+    def _rows(self, start_file_name: str, end_file_name: Optional[str]):
+        query = f'SELECT {_COLUMNS} FROM file_versions WHERE file_name >= ?'
+        parameters = [start_file_name]
+        if end_file_name is not None:
+            query += ' AND file_name < ?'
+            parameters.append(end_file_name)
+        query += ' ORDER BY file_name, upload_timestamp DESC, file_id DESC'
+        return self.connection.execute(query, parameters)
@@ -0,0 +1,55 @@
+######################################################################
+#
+# File: b2/_cli/unfinished_large_files.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Listing of unfinished large files as file versions.
+
+``Bucket.list_unfinished_large_files`` yields ``UnfinishedLargeFile`` objects, which drop
+the upload timestamp of the files, so they cannot be selected by age.  The files are listed
+here as file versions with the ``start`` action, like the ones listed with all versions of
+files, which have everything ``FileVersionFilter`` needs.
+"""
+
+from typing import Iterator, Optional
+
+from b2sdk.v2 import Bucket, FileVersion
+
+# max files in a response of b2_list_unfinished_large_files
+MAX_BATCH_SIZE = 100
+
+
+def list_unfinished_large_files(
+    bucket: Bucket,
+    prefix: Optional[str] = None,
+    batch_size: int = MAX_BATCH_SIZE,
+) -> Iterator[FileVersion]:
+    """
+    Yield the unfinished large files of the bucket (with names starting with ``prefix``,
+    if given).
+    """
+    session = bucket.api.session
+    file_version_factory = bucket.api.file_version_factory
+    start_file_id = None
+    while True:
+        response = session.list_unfinished_large_files(
+            bucket.id_, start_file_id, batch_size, prefix
+        )
+        for file_dict in response['files']:
+            # as in listings of file versions, unfinished files have no size nor checksum
+            yield file_version_factory.from_api_response(
+                {
+                    'action': 'start',
+                    'contentLength': 0,
+                    'contentSha1': 'none',
+                    **file_dict,
+                }
+            )
+        start_file_id = response.get('nextFileId')
+        if start_file_id is None:
+            return
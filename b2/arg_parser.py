@@ -9,16 +9,17 @@
 ######################################################################
 
 import argparse
+import hashlib
 import locale
 import re
+import shutil
 import sys
 import textwrap
 
-import arrow
 from b2sdk.v2 import RetentionPeriod
-from rst2ansi import rst2ansi
 
-_arrow_version = tuple(int(p) for p in arrow.__version__.split("."))
+from b2._cli.cache import get_cache_dir, write_atomically
+from b2.version import VERSION
 
 
 class RawTextHelpFormatter(argparse.RawTextHelpFormatter):
@@ -72,10 +73,7 @@ class ArgumentParser(argparse.ArgumentParser):
             if self._for_docs:
                 self._description = textwrap.dedent(self._raw_description)
             else:
-                encoding = self._get_encoding()
-                self._description = rst2ansi(
-                    self._raw_description.encode(encoding), output_encoding=encoding
-                )
+                self._description = render_help_text(self._raw_description, self._get_encoding())
 
         return self._description
 
@@ -105,6 +103,32 @@ class ArgumentParser(argparse.ArgumentParser):
         return 'ascii'
 
 
+def render_help_text(text, encoding):
+    """
+    Render reStructuredText of a help message for the terminal.
+
+    Rendering requires docutils, which is slow to import, so rendered texts are cached on disk
+    per version of this tool, terminal encoding and width.
+    """
+    width = shutil.get_terminal_size((80, 20)).columns
+    cache_key = '\0'.join((VERSION, encoding, str(width), text))
+    cache_file = None
+    cache_dir = get_cache_dir('help')
+    if cache_dir is not None:
+        cache_file = cache_dir / hashlib.sha256(cache_key.encode('utf-8')).hexdigest()
+        try:
+            return cache_file.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    from rst2ansi import rst2ansi
+
+    rendered = rst2ansi(text.encode(encoding), output_encoding=encoding)
+    if cache_file is not None:
+        write_atomically(cache_file, rendered)
+    return rendered
+
+
 def parse_comma_separated_list(s):
     """
     Parse comma-separated list.
@@ -116,6 +140,9 @@ def parse_millis_from_float_timestamp(s):
     """
     Parse timestamp, e.g. 1367900664 or 1367900664.152
     """
+    import arrow
+
+    _arrow_version = tuple(int(p) for p in arrow.__version__.split("."))
     parsed = arrow.get(float(s))
     if _arrow_version < (1, 0, 0):
         return int(parsed.format("XSSS"))
@@ -140,6 +167,53 @@ def parse_range(s):
     return bytes_range
 
 
+_SIZE_UNITS = {
+    '': 1,
+    'B': 1,
+    'KB': 1000,
+    'MB': 1000**2,
+    'GB': 1000**3,
+    'TB': 1000**4,
+    'KIB': 1024,
+    'MIB': 1024**2,
+    'GIB': 1024**3,
+    'TIB': 1024**4,
+}
+
+_DURATION_UNITS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+}
+
+
+def parse_size(s):
+    """
+    Parse size in bytes, e.g. 1024, 10KB (10000 bytes) or 10KiB (10240 bytes)
+    """
+    m = re.match(r'^(?P<number>\d+)\s*(?P<unit>[a-z]*)$', s.strip(), re.IGNORECASE)
+    if not m or m.group('unit').upper() not in _SIZE_UNITS:
+        raise argparse.ArgumentTypeError(
+            'size must be a number of bytes, optionally followed by a unit '
+            '(KB, MB, GB, TB, KiB, MiB, GiB or TiB)'
+        )
+    return int(m.group('number')) * _SIZE_UNITS[m.group('unit').upper()]
+
+
+def parse_duration_millis(s):
+    """
+    Parse duration into milliseconds, e.g. 90s, 30m, 12h, 7d or 2w
+    """
+    m = re.match(r'^(?P<number>\d+)(?P<unit>[smhdw])$', s.strip())
+    if not m:
+        raise argparse.ArgumentTypeError(
+            'duration must be a number followed by a unit: s, m, h, d or w, e.g. 30d'
+        )
+    return int(m.group('number')) * _DURATION_UNITS[m.group('unit')]
+
+
 def parse_default_retention_period(s):
     unit_part = '(' + ')|('.join(RetentionPeriod.KNOWN_UNITS) + ')'
     m = re.match(r'^(?P<duration>\d+) (?P<unit>%s)$' % (unit_part), s)
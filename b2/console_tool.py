@@ -12,6 +12,7 @@
 
 import argparse
 import base64
+import collections
 import csv
 import dataclasses
 import datetime
@@ -21,27 +22,25 @@ import io
 import json
 import locale
 import logging
-import logging.config
 import os
 import pathlib
 import platform
 import queue
 import re
+import shlex
 import signal
 import sys
+import textwrap
 import threading
 import time
 import unicodedata
-from abc import ABCMeta, abstractclassmethod
-from concurrent.futures import Executor, Future, ThreadPoolExecutor
-from contextlib import suppress
+from abc import ABCMeta, abstractclassmethod, abstractmethod
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager, redirect_stderr, redirect_stdout, suppress
 from enum import Enum
 from typing import Any, Dict, List, Optional, Tuple
 
-import argcomplete
 import b2sdk
-import requests
-import rst2ansi
 from b2sdk.v2 import (
     ALL_CAPABILITIES,
     B2_ACCOUNT_INFO_DEFAULT_FILE,
@@ -81,6 +80,7 @@ from b2sdk.v2 import (
     SyncReport,
     UploadMode,
     current_time_millis,
+    format_and_scale_number,
     get_included_sources,
     make_progress_listener,
     parse_sync_folder,
@@ -92,46 +92,61 @@ from b2sdk.v2.exception import (
     FileNotPresent,
     MissingAccountData,
     NotADirectory,
+    ServiceError,
+    TooManyRequests,
     UnableToCreateDirectory,
 )
 from b2sdk.version import VERSION as b2sdk_version
 from class_registry import ClassRegistry
-from tabulate import tabulate
 
+from b2._cli.adaptive_concurrency import AimdConcurrency
 from b2._cli.argcompleters import bucket_name_completer, file_name_completer
+from b2._cli.autocomplete_cache import save_completion_table
 from b2._cli.autocomplete_install import (
     SUPPORTED_SHELLS,
     AutocompleteInstallError,
     autocomplete_install,
 )
 from b2._cli.b2api import _get_b2api_for_profile
+from b2._cli.buffered_output import BufferedOutput
 from b2._cli.const import (
     B2_APPLICATION_KEY_ENV_VAR,
     B2_APPLICATION_KEY_ID_ENV_VAR,
+    B2_DAEMON_SOCKET_ENV_VAR,
     B2_DESTINATION_SSE_C_KEY_B64_ENV_VAR,
     B2_DESTINATION_SSE_C_KEY_ID_ENV_VAR,
     B2_ENVIRONMENT_ENV_VAR,
+    B2_OUTPUT_BUFFERING_ENV_VAR,
     B2_SOURCE_SSE_C_KEY_B64_ENV_VAR,
     B2_USER_AGENT_APPEND_ENV_VAR,
     CREATE_BUCKET_TYPES,
 )
+from b2._cli.daemon import DaemonProtocolError, DaemonServer, RunInClient, get_daemon_socket_path
+from b2._cli.du import summarize_usage
+from b2._cli.file_name_filter import FileNameFilter
+from b2._cli.file_version_filter import FILE_VERSION_ACTIONS, FileVersionFilter
+from b2._cli.ndjson import NdjsonSyncReport, dumps_record
+from b2._cli.prefetch import prefetch
+from b2._cli.prune import select_versions_to_prune
+from b2._cli.removal_manifest import ManifestEntry, ManifestError, read_removal_manifest
+from b2._cli.resumable_listing import ListingPosition, format_continuation, skip_to_start
+from b2._cli.rm_journal import JournalError, RemovalJournal
+from b2._cli.sharded_listing import ShardedLister, ShardedSizeCounter, get_listing_prefix
 from b2._cli.shell import detect_shell
+from b2._cli.snapshot import BucketSnapshot, SnapshotError, get_default_snapshot_path
+from b2._cli.unfinished_large_files import list_unfinished_large_files
 from b2.arg_parser import (
     ArgumentParser,
     parse_comma_separated_list,
     parse_default_retention_period,
+    parse_duration_millis,
     parse_millis_from_float_timestamp,
     parse_range,
+    parse_size,
 )
 from b2.json_encoder import B2CliJsonEncoder
 from b2.version import VERSION
 
-piplicenses = None
-prettytable = None
-with suppress(ImportError):
-    import piplicenses
-    import prettytable
-
 logger = logging.getLogger(__name__)
 
 SEPARATOR = '=' * 40
@@ -163,6 +178,8 @@ DOC_STRING_DATA = dict(
     B2_APPLICATION_KEY_ENV_VAR=B2_APPLICATION_KEY_ENV_VAR,
     B2_USER_AGENT_APPEND_ENV_VAR=B2_USER_AGENT_APPEND_ENV_VAR,
     B2_ENVIRONMENT_ENV_VAR=B2_ENVIRONMENT_ENV_VAR,
+    B2_DAEMON_SOCKET_ENV_VAR=B2_DAEMON_SOCKET_ENV_VAR,
+    B2_OUTPUT_BUFFERING_ENV_VAR=B2_OUTPUT_BUFFERING_ENV_VAR,
     B2_DESTINATION_SSE_C_KEY_B64_ENV_VAR=B2_DESTINATION_SSE_C_KEY_B64_ENV_VAR,
     B2_DESTINATION_SSE_C_KEY_ID_ENV_VAR=B2_DESTINATION_SSE_C_KEY_ID_ENV_VAR,
     B2_SOURCE_SSE_C_KEY_B64_ENV_VAR=B2_SOURCE_SSE_C_KEY_B64_ENV_VAR,
@@ -216,6 +233,29 @@ def apply_or_none(fcn, value):
         return fcn(value)
 
 
+def get_snapshot_path(bucket_name, snapshot_file):
+    """
+    Return the path of the given snapshot file, or of the default snapshot file of the bucket.
+    """
+    if snapshot_file is not None:
+        return pathlib.Path(snapshot_file)
+    snapshot_path = get_default_snapshot_path(bucket_name)
+    if snapshot_path is None:
+        raise CommandError('cannot create the cache directory, please use --snapshotFile')
+    return snapshot_path
+
+
+@functools.lru_cache(maxsize=1024)
+def format_upload_time(upload_seconds: int) -> Tuple[str, str]:
+    """
+    Return the date and the time of an upload timestamp (in seconds), as shown by ``ls --long``.
+
+    Files listed together are often uploaded within the same second, so the strings are cached.
+    """
+    dt = datetime.datetime.utcfromtimestamp(upload_seconds)
+    return dt.strftime('%Y-%m-%d'), dt.strftime('%H:%M:%S')
+
+
 class DescriptionGetter:
     def __init__(self, described_cls):
         self.described_cls = described_cls
@@ -513,6 +553,371 @@ class UploadModeMixin(Described):
         return UploadMode.FULL
 
 
+class NdjsonMixin(Described):
+    """
+    The ``--ndjson`` option produces newline-delimited JSON: one compact JSON object
+    per line, printed as soon as it is available, for streaming into other tools.
+    """
+
+    @classmethod
+    def _setup_parser(cls, parser):
+        parser.add_argument('--ndjson', action='store_true')
+        super()._setup_parser(parser)  # noqa
+
+
+class RmProgressReport(ProgressReport):
+    """
+    Progress of removals, with their concurrency, if it is adaptive.
+    """
+
+    concurrency: Optional[AimdConcurrency] = None
+
+    def _update_progress(self):
+        if self.closed or self.no_progress:
+            return
+
+        now = time.time()
+        if now - self._last_update_time < self.UPDATE_INTERVAL:
+            return
+
+        self._last_update_time = now
+        time_delta = now - self.start_time
+        rate = 0 if time_delta == 0 else int(self.count / time_delta)
+        message = ' count: %d/%d   %s' % (
+            self.count, self.total_count, format_and_scale_number(rate, '/s')
+        )
+        if self.concurrency is not None:
+            message += '   threads: %d' % (self.concurrency.limit,)
+        self._print_line(message, False)
+
+
+class RemovalMixin(Described, metaclass=ABCMeta):
+    """
+    Users with multiple files to be removed will benefit from multi-threaded
+    capabilities.  The default number of threads is 10.
+
+    Progress is displayed on the console unless ``--noProgress`` is specified.
+
+    With ``--adaptiveThreads``, the number of concurrent removals starts at one and
+    grows (up to ``--threads``) while the server keeps up, and is halved when it
+    throttles the removals or responds much slower than before.  The current number
+    is displayed with the progress, and a summary is printed at the end.
+
+    Normally, when an error happens during file removal, log is printed and the command
+    goes further. If any error should be immediately breaking the command,
+    ``--failFast`` can be passed to ensure that first error will stop the execution.
+    This could be useful to e.g. check whether provided credentials have **deleteFiles**
+    capabilities.
+
+    .. note::
+
+        Using ``--failFast`` doesn't prevent the command from trying to remove further files.
+        It just stops the progress. Since multiple files are removed in parallel, it's possible
+        that just some of them were not reported.
+    """
+
+    DEFAULT_THREADS = 10
+    PROGRESS_REPORT_CLASS = RmProgressReport
+    # what removing a file version is called in the messages about failures
+    REMOVAL_VERB = 'Deletion'
+    # errors of the server which is overloaded
+    THROTTLING_ERRORS = (TooManyRequests, ServiceError)
+
+    class SubmitThread(threading.Thread):
+        END_MARKER = object()
+        ERROR_TAG = 'error'
+        KEPT_TAG = 'kept'
+        EXCEPTION_TAG = 'general_exception'
+
+        def __init__(
+            self,
+            runner: 'RemovalMixin',
+            args: argparse.Namespace,
+            messages_queue: queue.Queue,
+            reporter: ProgressReport,
+            journal: Optional[RemovalJournal] = None,
+        ):
+            self.runner = runner
+            self.args = args
+            self.messages_queue = messages_queue
+            self.reporter = reporter
+            self.journal = journal
+            removal_queue_size = self.args.queueSize or (2 * self.args.threads)
+            self.semaphore = threading.BoundedSemaphore(value=removal_queue_size)
+            self.fail_fast_event = threading.Event()
+            self.mapping_lock = threading.Lock()
+            self.futures_mapping = {}
+            self.position = ListingPosition()
+            self.last_submitted = None
+            # removals of the versions of the file submitted last
+            self.file_name = None
+            self.file_futures = []
+            self.stopped = False
+            self.concurrency = None
+            if self.args.adaptiveThreads:
+                self.concurrency = AimdConcurrency(maximum=self.args.threads)
+            super().__init__(daemon=True)
+
+        def run(self) -> None:
+            try:
+                with ThreadPoolExecutor(max_workers=self.args.threads) as executor:
+                    self._run_removal(executor)
+                if self.journal is not None:
+                    with self.mapping_lock:
+                        self._record_checkpoint()
+            except Exception as error:
+                self.messages_queue.put((self.EXCEPTION_TAG, error))
+            finally:
+                self.messages_queue.put(self.END_MARKER)
+
+        def _run_removal(self, executor: Executor):
+            listing = self.runner._get_removal_listing(self.args, self.position)
+            try:
+                self._submit_removals(executor, listing)
+            finally:
+                listing.close()
+
+            self.reporter.end_total()
+
+        def _submit_removals(self, executor: Executor, listing) -> None:
+            for file_version, _ in listing:
+                if self.journal is not None and self.journal.is_done(file_version):
+                    continue
+                # Obtaining semaphore limits number of removals queued in the executor
+                # (and, without prefetching, number of elements that we fetch from LS).
+                self.semaphore.acquire(blocking=True)
+                # This event is updated before the semaphore is released. This way,
+                # in a single threaded scenario, we get synchronous responses.
+                if self.fail_fast_event.is_set():
+                    break
+                if self.concurrency is not None:
+                    self.concurrency.acquire()
+
+                with self.mapping_lock:
+                    if self.stopped:
+                        break
+                    self.reporter.update_total(1)
+                    if self.journal is not None:
+                        self.journal.record_submitted(file_version)
+                    if file_version.file_name != self.file_name:
+                        self.file_name = file_version.file_name
+                        self.file_futures = []
+                    prerequisites = []
+                    if self.runner._is_removed_last(self.args, file_version):
+                        prerequisites = list(self.file_futures)
+                    future = executor.submit(self._remove, file_version, prerequisites)
+                    self.futures_mapping[future] = file_version
+                    self.file_futures.append(future)
+                    self.last_submitted = file_version
+                    if self.journal is not None and self.journal.is_checkpoint_due():
+                        self._record_checkpoint()
+                # Done callback is added after, so it's "sure" that mapping is updated earlier.
+                future.add_done_callback(self._removal_done)
+
+        def _remove(self, file_version: FileVersion, prerequisites: List[Future]) -> bool:
+            """
+            Remove the file version after the removals of ``prerequisites``, and return whether
+            it was removed (it is kept if any of them failed).
+            """
+            # Prerequisites were submitted earlier, so they are run (or done) by other workers.
+            wait(prerequisites)
+            for prerequisite in prerequisites:
+                error = prerequisite.exception()
+                if error is not None and not isinstance(error, FileNotPresent):
+                    if self.concurrency is not None:
+                        self.concurrency.cancel()
+                    return False
+
+            if self.concurrency is None:
+                self.runner._remove_file_version(file_version)
+                return True
+
+            started = self.concurrency.clock()
+            throttled = False
+            try:
+                self.runner._remove_file_version(file_version)
+            except self.runner.THROTTLING_ERRORS:
+                throttled = True
+                raise
+            finally:
+                self.concurrency.release(started, throttled)
+            return True
+
+        def stop(self) -> Optional[List[str]]:
+            """
+            Stop submitting removals, and return the options which make the command continue
+            the removal, or ``None`` if nothing was submitted.
+            """
+            with self.mapping_lock:
+                self.stopped = True
+                if self.journal is not None:
+                    self._record_checkpoint()
+                return self._get_continuation_args()
+
+        def _record_checkpoint(self) -> None:
+            # called with the mapping lock held
+            continuation_args = self._get_continuation_args()
+            if continuation_args is not None:
+                self.journal.record_checkpoint(continuation_args)
+
+        def _get_continuation_args(self) -> Optional[List[str]]:
+            # called with the mapping lock held
+            if self.last_submitted is None:
+                return None
+            return self.runner._get_removal_continuation_args(
+                self.args, self.last_submitted, list(self.futures_mapping.values())
+            )
+
+        def _removal_done(self, future: Future) -> None:
+            with self.mapping_lock:
+                file_version = self.futures_mapping.pop(future)
+
+            try:
+                if not future.result():
+                    self.messages_queue.put((self.KEPT_TAG, file_version))
+                    return
+                self.runner._report_removal(self.reporter, file_version)
+                self.reporter.update_count(1)
+                if self.journal is not None:
+                    self.journal.record_removed(file_version)
+            except FileNotPresent:
+                # We wanted to remove this file anyway.
+                self.reporter.update_count(1)
+                if self.journal is not None:
+                    self.journal.record_removed(file_version)
+            except B2Error as error:
+                if self.args.failFast:
+                    # This is set before releasing the semaphore.
+                    # It means that when the semaphore is released,
+                    # we'll already have information about requirement to fail.
+                    self.fail_fast_event.set()
+                self.messages_queue.put((self.ERROR_TAG, file_version, error))
+            except Exception as error:
+                self.messages_queue.put((self.EXCEPTION_TAG, error))
+            finally:
+                self.semaphore.release()
+
+    @classmethod
+    def _setup_parser(cls, parser):
+        parser.add_argument('--threads', type=int, default=cls.DEFAULT_THREADS)
+        parser.add_argument('--adaptiveThreads', action='store_true')
+        parser.add_argument(
+            '--queueSize',
+            type=int,
+            default=None,
+            help='max elements fetched at once for removal, ' \
+                 'if left unset defaults to twice the number of threads.',
+        )
+        parser.add_argument('--noProgress', action='store_true')
+        parser.add_argument('--failFast', action='store_true')
+        super()._setup_parser(parser)  # noqa
+
+    @abstractmethod
+    def _get_removal_listing(self, args, position: ListingPosition):
+        """
+        Return a generator of ``(file_version, folder_name)`` pairs of the file versions
+        to remove, which ``position`` follows.
+        """
+
+    def _remove_file_version(self, file_version: FileVersion) -> None:
+        self.api.delete_file_version(file_version.id_, file_version.file_name)
+
+    def _is_removed_last(self, args, file_version: FileVersion) -> bool:
+        """
+        Return whether the file version is removed only after the versions of its file submitted
+        before it are, and kept if any of them is not.
+        """
+        return False
+
+    def _report_removal(self, reporter: ProgressReport, file_version: FileVersion) -> None:
+        """
+        Report the file version which was removed.
+        """
+
+    def _get_removal_continuation_args(
+        self,
+        args,
+        last_submitted: FileVersion,
+        in_flight: List[FileVersion],
+    ) -> Optional[List[str]]:
+        """
+        Return the options which make the command continue the removal after ``last_submitted``
+        (with removals of ``in_flight`` file versions in progress), or ``None`` if the removal
+        cannot be continued.
+        """
+        return None
+
+    def _print_removal_continuation(self, args, continuation_args: Optional[List[str]]) -> None:
+        """
+        Print how to continue the removal, if it can be continued.
+        """
+
+    @classmethod
+    def _format_file_version(cls, file_version: FileVersion) -> str:
+        # the name of a version given only by its ID is not known if it could not be looked up
+        if file_version.file_name is None:
+            return file_version.id_
+        return f'"{file_version.file_name}" ({file_version.id_})'
+
+    def _run_removal(self, args, journal: Optional[RemovalJournal] = None) -> Tuple[int, bool]:
+        """
+        Remove the files, and return the status of the command and whether all the selected
+        files were taken care of.
+        """
+        failed_on_any_file = False
+        finished = True
+        messages_queue = queue.Queue()
+
+        with self.PROGRESS_REPORT_CLASS(self.stdout, args.noProgress) as reporter:
+            submit_thread = self.SubmitThread(self, args, messages_queue, reporter, journal)
+            reporter.concurrency = submit_thread.concurrency
+            # This thread is started in daemon mode, no joining needed.
+            submit_thread.start()
+
+            try:
+                while True:
+                    queue_entry = messages_queue.get(block=True)
+                    if queue_entry is submit_thread.END_MARKER:
+                        break
+
+                    event_type, *data = queue_entry
+                    if event_type == submit_thread.ERROR_TAG:
+                        file_version, error = data
+                        message = f'{self.REMOVAL_VERB} of file ' \
+                                  f'{self._format_file_version(file_version)} failed: {str(error)}'
+                        reporter.print_completion(message)
+
+                        failed_on_any_file = True
+                        if args.failFast:
+                            finished = False
+                            break
+
+                    elif event_type == submit_thread.KEPT_TAG:
+                        file_version, = data
+                        reporter.print_completion(
+                            f'File {self._format_file_version(file_version)} was kept, '
+                            f'as other versions of the file were not removed'
+                        )
+
+                    elif event_type == submit_thread.EXCEPTION_TAG:
+                        raise data[0]
+            except KeyboardInterrupt:
+                self._print_removal_continuation(args, submit_thread.stop())
+                raise
+
+            concurrency = submit_thread.concurrency
+            if concurrency is not None:
+                reporter.print_completion(
+                    f'Concurrent removals: {concurrency.limit} at the end, '
+                    f'{concurrency.peak} at most, backed off {concurrency.decreases} times'
+                )
+
+        if submit_thread.position.more:
+            finished = False
+            self._print_removal_continuation(args, submit_thread.stop())
+        return 1 if failed_on_any_file else 0, finished
+
+
 class Command(Described):
     # Set to True for commands that receive sensitive information in arguments
     FORBID_LOGGING_ARGUMENTS = False
@@ -523,6 +928,9 @@ class Command(Described):
     # set to False for commands not requiring b2 authentication
     REQUIRES_AUTH = True
 
+    # set to False for commands which cannot be run by `b2 daemon` (e.g. prompting for input)
+    RUN_IN_DAEMON = True
+
     def __init__(self, console_tool):
         self.console_tool = console_tool
         self.api = console_tool.api
@@ -545,7 +953,13 @@ class Command(Described):
         return decorator
 
     @classmethod
-    def get_parser(cls, subparsers=None, parents=None, for_docs=False):
+    def get_parser(cls, subparsers=None, parents=None, for_docs=False, subcommand_name=None):
+        """
+        Build the parser of this command.
+
+        If ``subcommand_name`` is given, only the parser of that subcommand is built (instead of
+        parsers of all registered subcommands), which is all that is needed to run it.
+        """
         if parents is None:
             parents = []
 
@@ -586,7 +1000,11 @@ class Command(Described):
 
             subparsers = parser.add_subparsers(prog=parser.prog, title='usages', dest='command')
             subparsers.required = True
-            for subcommand in cls.subcommands_registry.values():
+            if subcommand_name is not None:
+                subcommands = [cls.subcommands_registry.get_class(subcommand_name)]
+            else:
+                subcommands = cls.subcommands_registry.values()
+            for subcommand in subcommands:
                 subcommand.get_parser(subparsers=subparsers, parents=parents, for_docs=for_docs)
 
         return parser
@@ -611,20 +1029,62 @@ class Command(Described):
     def _print_json(self, data):
         self._print(json.dumps(data, indent=4, sort_keys=True, cls=B2CliJsonEncoder))
 
-    def _print(self, *args):
-        self._print_standard_descriptor(self.stdout, 'stdout', *args)
+    def _print_json_list(self, items):
+        """
+        Print items as a JSON list, formatted the same as by ``_print_json``, one by one as they
+        are produced, so that they don't have to be kept in memory.
+        """
+        first = True
+        for item in items:
+            item_json = json.dumps(item, indent=4, sort_keys=True, cls=B2CliJsonEncoder)
+            self._print(('[\n' if first else ',\n') + textwrap.indent(item_json, '    '), end='')
+            if first:
+                # let the consumer start while the next items are being fetched
+                self.stdout.flush()
+                first = False
+        self._print('[]' if first else '\n]')
+
+    def _print_ndjson(self, record):
+        """
+        Print a record as a single line of compact JSON and flush it right away.
+        """
+        self._print(dumps_record(record))
+        self.stdout.flush()
+
+    def _print(self, *args, end='\n'):
+        self._print_standard_descriptor(self.stdout, 'stdout', *args, end=end)
+
+    @contextmanager
+    def _buffered_stdout(self):
+        """
+        Buffer what is printed to stdout within the block, according to the policy set by
+        ``B2_OUTPUT_BUFFERING`` env var, and flush it at the end.
+        """
+        if isinstance(self.stdout, BufferedOutput):
+            yield
+            return
+        stdout = self.stdout
+        try:
+            self.stdout = BufferedOutput(stdout)
+        except ValueError as error:
+            raise CommandError(str(error))
+        try:
+            yield
+        finally:
+            self.stdout.flush()
+            self.stdout = stdout
 
     def _print_stderr(self, *args, **kwargs):
         self._print_standard_descriptor(self.stderr, 'stderr', *args)
 
     @classmethod
-    def _print_standard_descriptor(cls, descriptor, descriptor_name, *args):
-        cls._print_helper(descriptor, descriptor.encoding, descriptor_name, *args)
+    def _print_standard_descriptor(cls, descriptor, descriptor_name, *args, end='\n'):
+        cls._print_helper(descriptor, descriptor.encoding, descriptor_name, *args, end=end)
 
     @classmethod
-    def _print_helper(cls, descriptor, descriptor_encoding, descriptor_name, *args):
+    def _print_helper(cls, descriptor, descriptor_encoding, descriptor_name, *args, end='\n'):
         try:
-            descriptor.write(' '.join(args))
+            descriptor.write(' '.join(args) + end)
         except UnicodeEncodeError:
             sys.stderr.write(
                 "\nWARNING: Unable to print unicode.  Encoding for {} is: '{}'\n".format(
@@ -634,8 +1094,7 @@ class Command(Described):
             )
             args = [arg.encode('ascii', 'backslashreplace').decode() for arg in args]
             sys.stderr.write("Trying to print: %s\n" % args)
-            descriptor.write(' '.join(args))
-        descriptor.write('\n')
+            descriptor.write(' '.join(args) + end)
 
     def __str__(self):
         return f'{self.__class__.__module__}.{self.__class__.__name__}'
@@ -683,6 +1142,11 @@ class B2(Command):
 
     A string provided via an optional environment variable ``{B2_USER_AGENT_APPEND_ENV_VAR}``
     will be appended to the User-Agent.
+
+    Long outputs (e.g. of ``{NAME} ls``) are written in blocks when they are not printed
+    to a terminal.  Set ``{B2_OUTPUT_BUFFERING_ENV_VAR}`` environment variable to ``line``
+    to write every line as soon as it is printed, or to ``block`` to buffer also the output
+    printed to a terminal.
     """
 
     REQUIRES_AUTH = False
@@ -693,6 +1157,21 @@ class B2(Command):
     def name_and_alias(cls):
         return NAME, None
 
+    @classmethod
+    def find_subcommand_name(cls, argv):
+        """
+        Return the registered name of the subcommand invoked by ``argv`` (command line without
+        the program name), or ``None`` if it cannot be told without building the full parser
+        (e.g. no arguments, ``--help`` or an unknown command).
+        """
+        if not argv:
+            return None
+        # aliases only differ from names by using underscores instead of hyphens
+        name = argv[0].replace('_', '-')
+        if name in cls.subcommands_registry:
+            return name
+        return None
+
     def run(self, args):
         # Commands could be named via name or alias, so we fetch
         # the command from args assigned during parser preparation.
@@ -736,6 +1215,7 @@ class AuthorizeAccount(Command):
 
     FORBID_LOGGING_ARGUMENTS = True
     REQUIRES_AUTH = False
+    RUN_IN_DAEMON = False
 
     @classmethod
     def _setup_parser(cls, parser):
@@ -817,28 +1297,61 @@ class AuthorizeAccount(Command):
 
 
 @B2.register_subcommand
-class CancelAllUnfinishedLargeFiles(Command):
+class CancelAllUnfinishedLargeFiles(RemovalMixin, Command):
     """
     Lists all large files that have been started but not
     finished and cancels them.  Any parts that have been
     uploaded will be deleted.
 
+    The ``--prefix`` option cancels only the files with names starting with it.
+    ``--olderThan`` and ``--newerThan`` cancel only the files started before or
+    after the given time ago (e.g. ``30d``, ``12h``; units are ``s``, ``m``, ``h``,
+    ``d`` and ``w``), e.g. to leave alone the uploads which are still going on.
+
+    The files are canceled as they are listed, and the ID of every canceled file
+    is printed.
+
+    {REMOVALMIXIN}
+
+    Command returns 0 if all files were canceled successfully and
+    a value different from 0 if any file was left.
+
     Requires capability:
 
     - **listFiles**
     - **writeFiles**
     """
 
+    REMOVAL_VERB = 'Cancellation'
+
     @classmethod
     def _setup_parser(cls, parser):
+        parser.add_argument('--prefix', metavar='PREFIX')
+        parser.add_argument('--olderThan', type=parse_duration_millis, metavar='AGE')
+        parser.add_argument('--newerThan', type=parse_duration_millis, metavar='AGE')
         parser.add_argument('bucketName').completer = bucket_name_completer
+        super()._setup_parser(parser)
 
     def run(self, args):
-        bucket = self.api.get_bucket_by_name(args.bucketName)
-        for file_version in bucket.list_unfinished_large_files():
-            bucket.cancel_large_file(file_version.file_id)
-            self._print(file_version.file_id, 'canceled')
-        return 0
+        self._bucket = self.api.get_bucket_by_name(args.bucketName)
+        status, _ = self._run_removal(args)
+        return status
+
+    def _get_removal_listing(self, args, position: ListingPosition):
+        file_version_filter = FileVersionFilter(
+            now_millis=current_time_millis(),
+            older_than_millis=args.olderThan,
+            newer_than_millis=args.newerThan,
+        )
+        for file_version in list_unfinished_large_files(self._bucket, args.prefix):
+            if file_version_filter.matches(file_version):
+                yield file_version, None
+
+    def _remove_file_version(self, file_version: FileVersion) -> None:
+        self.api.cancel_large_file(file_version.id_)
+
+    def _report_removal(self, reporter: ProgressReport, file_version: FileVersion) -> None:
+        reporter.print_completion(f'{file_version.id_} canceled')
 
 
 @B2.register_subcommand
@@ -1133,24 +1646,78 @@ class CreateKey(Command):
 
 
 @B2.register_subcommand
-class DeleteBucket(Command):
+class DeleteBucket(RemovalMixin, Command):
     """
     Deletes the bucket with the given name.
 
+    The bucket has to be empty, unless ``--purge`` is given.  Then, before deleting
+    the bucket, all versions of files in it are deleted and all unfinished large
+    files are canceled, as the bucket is listed, by a single pool of threads.
+    Whatever is left (e.g. files which failed to be deleted, or were uploaded
+    meanwhile) is taken care of by listing the bucket again, up to 3 times in
+    total; if the bucket is still not empty, it is not deleted.  ``--listThreads``
+    lists the bucket with the given number of concurrent cursors.  Use with caution.
+
+    {REMOVALMIXIN}
+
     Requires capability:
 
     - **deleteBuckets**
+    - **listFiles**, **deleteFiles** and **writeFiles** (with ``--purge``)
     """
 
+    # listings of the bucket removing the files in it, at most
+    PURGE_PASSES = 3
+
     @classmethod
     def _setup_parser(cls, parser):
+        parser.add_argument('--purge', action='store_true')
+        parser.add_argument('--listThreads', type=int, default=1, metavar='THREADS')
         parser.add_argument('bucketName').completer = bucket_name_completer
+        super()._setup_parser(parser)
 
     def run(self, args):
         bucket = self.api.get_bucket_by_name(args.bucketName)
+        if args.purge:
+            status = self._purge(args, bucket)
+            if status != 0:
+                return status
         self.api.delete_bucket(bucket)
         return 0
 
+    def _purge(self, args, bucket: Bucket) -> int:
+        self._bucket = bucket
+        for _ in range(self.PURGE_PASSES):
+            status, finished = self._run_removal(args)
+            if not finished:
+                # stopped by --failFast
+                return status
+            if self._is_empty(bucket):
+                return 0
+        raise CommandError(
+            f'bucket {args.bucketName} is not empty after {self.PURGE_PASSES} attempts '
+            f'to purge it, so it was not deleted'
+        )
+
+    @staticmethod
+    def _is_empty(bucket: Bucket) -> bool:
+        listing = bucket.ls(latest_only=False, recursive=True, fetch_count=1)
+        return next(iter(listing), None) is None
+
+    def _get_removal_listing(self, args, position: ListingPosition):
+        if args.listThreads > 1:
+            # the files can be removed in any order
+            lister = ShardedLister(self._bucket, args.listThreads, ordered=False)
+            return lister.ls(latest_only=False)
+        return self._bucket.ls(latest_only=False, recursive=True)
+
+    def _remove_file_version(self, file_version: FileVersion) -> None:
+        if file_version.action == 'start':
+            # unfinished large files are listed with the versions of files
+            self.api.cancel_large_file(file_version.id_)
+            return
+        super()._remove_file_version(file_version)
+
 
 @B2.register_subcommand
 class DeleteFileVersion(FileIdAndOptionalFileNameMixin, Command):
@@ -1173,6 +1740,78 @@ class DeleteFileVersion(FileIdAndOptionalFileNameMixin, Command):
         return 0
 
 
+@B2.register_subcommand
+class DeleteFileVersions(RemovalMixin, Command):
+    """
+    Permanently and irrevocably deletes the file versions listed in a file.
+    Use with caution.
+
+    File versions are read from the given file (or from stdin, if it is ``-``),
+    one per line, as ``fileId,fileName`` (everything after the first comma is
+    the name of the file).  The name can be left out, with only ``fileId`` in
+    the line, but then an additional query to B2 gets the name before deleting
+    the file version, which requires the ``readFiles`` capability.  Empty lines
+    and lines starting with ``#`` are skipped.
+
+    The file is read as the file versions are deleted, so it can be as long
+    as needed, e.g. a set of versions to delete computed offline.
+
+    {REMOVALMIXIN}
+
+    File versions which are not found are considered deleted, so an interrupted
+    command can simply be run again with the same file.
+
+    Command returns 0 if all file versions were deleted successfully and
+    a value different from 0 if any file version was left.
+
+    Examples.
+
+    Delete the file versions listed by another tool:
+
+    .. code-block::
+
+        retention-tool --expired | {NAME} delete-file-versions --threads 50 -
+
+
+    Requires capability:
+
+    - **deleteFiles**
+    - **readFiles** (if file names are not provided)
+    """
+
+    @classmethod
+    def _setup_parser(cls, parser):
+        parser.add_argument('fileVersionsFile')
+        super()._setup_parser(parser)
+
+    def run(self, args):
+        if args.fileVersionsFile == '-':
+            return self._delete_file_versions(args, sys.stdin)
+        try:
+            file_versions_file = open(args.fileVersionsFile, encoding='utf-8')
+        except OSError as error:
+            raise CommandError(f'cannot read {args.fileVersionsFile}: {error.strerror}')
+        with file_versions_file:
+            return self._delete_file_versions(args, file_versions_file)
+
+    def _delete_file_versions(self, args, lines) -> int:
+        self._file_versions_lines = lines
+        status, _ = self._run_removal(args)
+        return status
+
+    def _get_removal_listing(self, args, position: ListingPosition):
+        try:
+            for entry in read_removal_manifest(self._file_versions_lines):
+                yield entry, None
+        except ManifestError as error:
+            raise CommandError(str(error))
+
+    def _remove_file_version(self, file_version: ManifestEntry) -> None:
+        if file_version.file_name is None:
+            file_version.file_name = self.api.get_file_info(file_version.id_).file_name
+        super()._remove_file_version(file_version)
+
+
 @B2.register_subcommand
 class DeleteKey(Command):
     """
@@ -1368,6 +2007,93 @@ class DownloadFileByName(
         return 0
 
 
+@B2.register_subcommand
+class Du(NdjsonMixin, Command):
+    """
+    Reports usage of storage by the files in a bucket (or in a folder of a bucket),
+    and by the files in every folder in it, up to ``--depth`` levels below it.
+
+    The columns in the output are:
+
+    - Total size of all uploaded versions of files, in bytes
+    - Number of files which are not hidden
+    - Number of uploaded versions of files, including old versions and hidden files
+    - Number of hide markers
+    - Name of the bucket and the folder
+
+    Every folder is reported after the folders in it, so the total of the bucket
+    (or of ``folderName``) comes last.  ``--depth 0`` reports only the total; the
+    default is 1.  Unfinished large files are not counted.
+
+    The bucket is listed once, and only the totals of the folders of the file being
+    listed are kept in memory, so folders are reported as soon as they are listed.
+    ``--listThreads`` lists the bucket with the given number of concurrent cursors.
+
+    The ``--json`` option produces a list of records.
+
+    {NDJSONMIXIN}
+
+    Records have ``prefix`` (the folder), ``fileCount``, ``versionCount``,
+    ``hideMarkerCount`` and ``totalSize`` keys.
+
+    Requires capability:
+
+    - **listFiles**
+    """
+
+    # order is total size, files, versions, hide markers, name
+    DU_ENTRY_TEMPLATE = '%15d  %10d  %10d  %10d  %s'
+
+    @classmethod
+    def _setup_parser(cls, parser):
+        parser.add_argument('--depth', type=int, default=1)
+        parser.add_argument('--listThreads', type=int, default=1, metavar='THREADS')
+        parser.add_argument('--json', action='store_true')
+        parser.add_argument('bucketName').completer = bucket_name_completer
+        parser.add_argument('folderName', nargs='?').completer = file_name_completer
+        super()._setup_parser(parser)
+
+    def run(self, args):
+        if args.json and args.ndjson:
+            raise CommandError('--json and --ndjson cannot be used together')
+        if args.depth < 0:
+            raise CommandError('--depth cannot be negative')
+
+        bucket = self.api.get_bucket_by_name(args.bucketName)
+        prefix = get_listing_prefix(args.folderName or '', with_wildcard=False)
+        if args.listThreads > 1:
+            listing = ShardedLister(bucket, args.listThreads).ls(prefix, latest_only=False)
+        else:
+            listing = bucket.ls(prefix, latest_only=False, recursive=True)
+        usages = summarize_usage(
+            (file_version for file_version, _ in listing), prefix, depth=args.depth
+        )
+
+        with self._buffered_stdout():
+            if args.json:
+                self._print_json_list(
+                    {
+                        'prefix': folder,
+                        **usage.as_dict()
+                    } for folder, usage in usages
+                )
+                return 0
+            for folder, usage in usages:
+                if args.ndjson:
+                    self._print_ndjson({'prefix': folder, **usage.as_dict()})
+                else:
+                    self._print(
+                        self.DU_ENTRY_TEMPLATE % (
+                            usage.total_size,
+                            usage.file_count,
+                            usage.version_count,
+                            usage.hide_marker_count,
+                            f'{bucket.name}/{folder}',
+                        )
+                    )
+        return 0
+
+
 @B2.register_subcommand
 class GetAccountInfo(Command):
     """
@@ -1415,19 +2141,37 @@ class GetBucket(Command):
 
         Note that ``--showSize`` requires multiple
         API calls, and will therefore incur additional latency,
-        computation, and Class C transactions.
+        computation, and Class C transactions.  ``--listThreads``
+        lists the bucket with the given number of concurrent cursors.
+
+    Progress of ``--showSize`` is printed on stderr every few seconds,
+    unless ``--noProgress`` is given.  With ``--resumeFile``, the counts so
+    far and the positions of all cursors are also saved in the given file,
+    so if the command is interrupted (or fails), running it again with the
+    same file continues where it stopped.  The file is removed when the
+    counting is complete.
+
+    For the sizes of folders, and of the latest versions of files, use ``{NAME} du``.
 
     Requires capability:
 
     - **listBuckets**
     """
 
+    # seconds between progress reports (and saves of the state to --resumeFile)
+    SIZE_PROGRESS_INTERVAL = 10
+
     @classmethod
     def _setup_parser(cls, parser):
         parser.add_argument('--showSize', action='store_true')
+        parser.add_argument('--listThreads', type=int, default=1, metavar='THREADS')
+        parser.add_argument('--noProgress', action='store_true')
+        parser.add_argument('--resumeFile', metavar='FILE')
         parser.add_argument('bucketName').completer = bucket_name_completer
 
     def run(self, args):
+        if args.resumeFile is not None and not args.showSize:
+            raise CommandError('--resumeFile can only be used with --showSize')
         # This always wants up-to-date info, so it does not use
         # the bucket cache.
         for b in self.api.list_buckets(args.bucketName):
@@ -1436,25 +2180,58 @@ class GetBucket(Command):
                 return 0
             else:
                 result = b.as_dict()
-                # `files` is a generator. We don't want to collect all of the values from the
-                # generator, as there many be billions of files in a large bucket.
-                files = b.ls("", latest_only=False, recursive=True)
-                # `files` yields tuples of (file_version, folder_name). We don't care about
-                # `folder_name`, so just access the first slot of the tuple directly in the
-                # reducer. We can't ask a generator for its size, as the elements are yielded
-                # lazily, so we need to accumulate the count as we go. By using a tuple of
-                # (file count, total size), we can obtain the desired information very compactly
-                # and efficiently.
-                count_size_tuple = functools.reduce(
-                    (lambda partial, f: (partial[0] + 1, partial[1] + f[0].size)), files, (0, 0)
-                )
-                result['fileCount'] = count_size_tuple[0]
-                result['totalSize'] = count_size_tuple[1]
+                result['fileCount'], result['totalSize'] = self._count_files(b, args)
                 self._print_json(result)
                 return 0
         self._print_stderr('bucket not found: ' + args.bucketName)
         return 1
 
+    def _count_files(self, bucket: Bucket, args) -> Tuple[int, int]:
+        """
+        Count all versions of files in the bucket, and their total size, continuing from
+        the state saved in ``--resumeFile``, if there is one.
+        """
+        state = None
+        try:
+            if args.resumeFile is not None and os.path.exists(args.resumeFile):
+                with open(args.resumeFile) as f:
+                    state = json.load(f)
+            counter = ShardedSizeCounter(bucket, args.listThreads, state)
+        except ValueError as error:
+            raise CommandError(f'cannot resume from {args.resumeFile}: {error}')
+
+        def on_progress(progress_state):
+            if not args.noProgress:
+                self._print_stderr(
+                    f'counted {progress_state["fileCount"]} files '
+                    f'({progress_state["totalSize"]} bytes) so far, '
+                    f'{len(progress_state["shards"])} folders being listed'
+                )
+            if args.resumeFile is not None:
+                self._save_count_state(args.resumeFile, progress_state)
+
+        try:
+            counts = counter.count(on_progress, self.SIZE_PROGRESS_INTERVAL)
+        except BaseException:
+            if args.resumeFile is not None:
+                self._save_count_state(args.resumeFile, counter.get_state())
+                self._print_stderr(
+                    f'the counting can be continued by running the command again with '
+                    f'--resumeFile {args.resumeFile}'
+                )
+            raise
+        if args.resumeFile is not None and os.path.exists(args.resumeFile):
+            os.remove(args.resumeFile)
+        return counts
+
+    @classmethod
+    def _save_count_state(cls, path: str, state: dict) -> None:
+        # replace the file at once, so that an interruption cannot leave half of it
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+
 
 @B2.register_subcommand
 class GetFileInfo(Command):
@@ -1568,7 +2345,7 @@ class HideFile(Command):
 
 
 @B2.register_subcommand
-class ListBuckets(Command):
+class ListBuckets(NdjsonMixin, Command):
     """
     Lists all of the buckets in the current account.
 
@@ -1582,6 +2359,8 @@ class ListBuckets(Command):
     Alternatively, the ``--json`` option produces machine-readable output
     similar (but not identical) to the server api response format.
 
+    {NDJSONMIXIN}
+
     Requires capability:
 
     - **listBuckets**
@@ -1590,9 +2369,16 @@ class ListBuckets(Command):
     @classmethod
     def _setup_parser(cls, parser):
         parser.add_argument('--json', action='store_true')
+        super()._setup_parser(parser)
 
     def run(self, args):
+        if args.json and args.ndjson:
+            raise CommandError('--json and --ndjson cannot be used together')
         buckets = self.api.list_buckets()
+        if args.ndjson:
+            for bucket in buckets:
+                self._print_ndjson(bucket)
+            return 0
         if args.json:
             self._print_json(list(buckets))
             return 0
@@ -1603,7 +2389,7 @@ class ListBuckets(Command):
 
 
 @B2.register_subcommand
-class ListKeys(Command):
+class ListKeys(NdjsonMixin, Command):
     """
     Lists the application keys for the current account.
 
@@ -1619,6 +2405,10 @@ class ListKeys(Command):
 
     None of the values contain whitespace.
 
+    {NDJSONMIXIN}
+
+    Records are similar to the server api response format.
+
     For keys restricted to buckets that do not exist any more, the bucket name is
     replaced with ``id=<bucketId>``, because deleted buckets do not have names any
     more.
@@ -1631,6 +2421,7 @@ class ListKeys(Command):
     @classmethod
     def _setup_parser(cls, parser):
         parser.add_argument('--long', action='store_true')
+        super()._setup_parser(parser)
 
     def __init__(self, console_tool):
         super().__init__(console_tool)
@@ -1638,7 +2429,10 @@ class ListKeys(Command):
 
     def run(self, args):
         for key in self.api.list_keys():
-            self.print_key(key, args.long)
+            if args.ndjson:
+                self._print_ndjson(key.as_dict())
+            else:
+                self.print_key(key, args.long)
 
         return 0
 
@@ -1684,12 +2478,14 @@ class ListKeys(Command):
 
 
 @B2.register_subcommand
-class ListParts(Command):
+class ListParts(NdjsonMixin, Command):
     """
     Lists all of the parts that have been uploaded for the given
     large file, which must be a file that was started but not
     finished or canceled.
 
+    {NDJSONMIXIN}
+
     Requires capability:
 
     - **writeFiles**
@@ -1698,19 +2494,34 @@ class ListParts(Command):
     @classmethod
     def _setup_parser(cls, parser):
         parser.add_argument('largeFileId')
+        super()._setup_parser(parser)
 
     def run(self, args):
         for part in self.api.list_parts(args.largeFileId):
-            self._print('%5d  %9d  %s' % (part.part_number, part.content_length, part.content_sha1))
+            if args.ndjson:
+                self._print_ndjson(
+                    {
+                        'fileId': part.file_id,
+                        'partNumber': part.part_number,
+                        'contentLength': part.content_length,
+                        'contentSha1': part.content_sha1,
+                    }
+                )
+            else:
+                self._print(
+                    '%5d  %9d  %s' % (part.part_number, part.content_length, part.content_sha1)
+                )
         return 0
 
 
 @B2.register_subcommand
-class ListUnfinishedLargeFiles(Command):
+class ListUnfinishedLargeFiles(NdjsonMixin, Command):
     """
     Lists all of the large files in the bucket that were started,
     but not finished or canceled.
 
+    {NDJSONMIXIN}
+
     Requires capability:
 
     - **listFiles**
@@ -1719,10 +2530,21 @@ class ListUnfinishedLargeFiles(Command):
     @classmethod
     def _setup_parser(cls, parser):
         parser.add_argument('bucketName').completer = bucket_name_completer
+        super()._setup_parser(parser)
 
     def run(self, args):
         bucket = self.api.get_bucket_by_name(args.bucketName)
         for unfinished in bucket.list_unfinished_large_files():
+            if args.ndjson:
+                self._print_ndjson(
+                    {
+                        'fileId': unfinished.file_id,
+                        'fileName': unfinished.file_name,
+                        'contentType': unfinished.content_type,
+                        'fileInfo': unfinished.file_info,
+                    }
+                )
+                continue
             file_info_text = ' '.join(
                 f'{k}={unfinished.file_info[k]}' for k in sorted(unfinished.file_info)
             )
@@ -1732,7 +2554,7 @@ class ListUnfinishedLargeFiles(Command):
         return 0
 
 
-class AbstractLsCommand(Command, metaclass=ABCMeta):
+class AbstractLsCommand(NdjsonMixin, Command, metaclass=ABCMeta):
     """
     The ``--versions`` option selects all versions of each file, not
     just the most recent.
@@ -1743,7 +2565,50 @@ class AbstractLsCommand(Command, metaclass=ABCMeta):
     The ``--withWildcard`` option will allow using ``*``, ``?`` and ```[]```
     characters in ``folderName`` as a greedy wildcard, single character
     wildcard and range of characters. It requires the ``--recursive`` option.
-    Remember to quote ``folderName`` to avoid shell expansion.
+    Remember to quote ``folderName`` to avoid shell expansion.  Many patterns
+    can be given, and files matching any of them are selected; the bucket is
+    still listed only once, from the longest literal text the patterns start with.
+
+    The ``--includeRegex`` and ``--excludeRegex`` options (which can be given
+    many times, and require the ``--recursive`` option) select only the files
+    with names matching any of the included regular expressions and none of the
+    excluded ones.  Like in ``sync``, regular expressions match the beginning
+    of file names.
+
+    The ``--minSize`` and ``--maxSize`` options select only the file versions
+    with sizes in the given range (e.g. ``10MB`` or ``1GiB``), and
+    ``--olderThan`` and ``--newerThan`` only the ones uploaded before or after
+    the given time ago (e.g. ``30d``, ``12h``; units are ``s``, ``m``, ``h``,
+    ``d`` and ``w``), or, with ``--bySrcLastModified``, the ones with source
+    files modified before or after that time.  The ``--action`` option (which
+    can be given many times) selects only uploads, hide markers (``hide``, with
+    ``--versions``) or unfinished large files (``start``), and ``--contentType``
+    (which can be given many times, too) only the file versions with matching
+    content types, like ``image/*``.  These options require the ``--recursive``
+    option, and versions are selected as they are listed, before they are
+    printed or removed.
+
+    The ``--listThreads`` option makes a ``--recursive`` listing use the given
+    number of concurrent cursors, for buckets with many files.  The bucket is
+    split at folders which do not fit in a single page of results, and (while
+    there are fewer parts than threads) at names made of the characters of the
+    files listed so far, so that files which are not in folders are listed
+    concurrently, too.  Files are still listed in the order of their names,
+    unless ``--unordered`` is given.
+
+    The ``--maxResults`` option stops after the given number of files (or
+    folders).  When it stops there, or when it is interrupted, the command prints
+    (to stderr) the options which make the same command continue where it stopped:
+    ``--startAfter`` (and, with ``--versions``, ``--startAfterFileId``), which
+    select only what comes after the given file name (and version).  Instead,
+    ``--startFileName`` selects the files starting with the given name.  A
+    ``--recursive`` listing starts at that name in B2, so resuming a listing of a
+    big bucket does not list it from the beginning again.  These options cannot be
+    used with ``--unordered``.
+
+    {NDJSONMIXIN}
+
+    Records are file versions, similar to the server api response format.
     """
 
     @classmethod
@@ -1751,17 +2616,153 @@ class AbstractLsCommand(Command, metaclass=ABCMeta):
         parser.add_argument('--versions', action='store_true')
         parser.add_argument('--recursive', action='store_true')
         parser.add_argument('--withWildcard', action='store_true')
+        parser.add_argument('--listThreads', type=int, default=1, metavar='THREADS')
+        parser.add_argument('--unordered', action='store_true')
+        parser.add_argument('--includeRegex', action='append', default=[], metavar='REGEX')
+        parser.add_argument('--excludeRegex', action='append', default=[], metavar='REGEX')
+        parser.add_argument('--minSize', type=parse_size, metavar='SIZE')
+        parser.add_argument('--maxSize', type=parse_size, metavar='SIZE')
+        parser.add_argument('--olderThan', type=parse_duration_millis, metavar='AGE')
+        parser.add_argument('--newerThan', type=parse_duration_millis, metavar='AGE')
+        parser.add_argument('--bySrcLastModified', action='store_true')
+        parser.add_argument('--action', action='append', default=[], choices=FILE_VERSION_ACTIONS)
+        parser.add_argument('--contentType', action='append', default=[], metavar='PATTERN')
+        parser.add_argument('--startAfter', metavar='FILE_NAME')
+        parser.add_argument('--startAfterFileId', metavar='FILE_ID')
+        parser.add_argument('--startFileName', metavar='FILE_NAME')
+        parser.add_argument('--maxResults', type=int, metavar='COUNT')
         parser.add_argument('bucketName').completer = bucket_name_completer
-        parser.add_argument('folderName', nargs='?').completer = file_name_completer
+        parser.add_argument('folderName', nargs='*').completer = file_name_completer
+        super()._setup_parser(parser)
 
     def run(self, args):
-        generator = self._get_ls_generator(args)
+        position = ListingPosition()
+        generator = self._get_resumable_listing(args, position)
+
+        with self._printing_continuation(args, position), self._buffered_stdout():
+            if args.ndjson:
+                for file_version, _ in generator:
+                    self._print_ndjson(file_version)
+                return 0
 
-        for file_version, folder_name in generator:
-            self._print_file_version(args, file_version, folder_name)
+            for file_version, folder_name in generator:
+                self._print_file_version(args, file_version, folder_name)
 
         return 0
 
+    @classmethod
+    def _check_start_options(cls, args) -> None:
+        if args.startAfter is not None and args.startFileName is not None:
+            raise CommandError('--startAfter and --startFileName cannot be used together')
+        if args.startAfterFileId is not None and (args.startAfter is None or not args.versions):
+            raise CommandError('--startAfterFileId requires --startAfter and --versions')
+        if args.maxResults is not None and args.maxResults < 1:
+            raise CommandError('--maxResults should be a positive number')
+        resumable = (args.startAfter, args.startFileName, args.maxResults)
+        if args.unordered and any(option is not None for option in resumable):
+            raise CommandError(
+                '--startAfter, --startFileName and --maxResults cannot be used with --unordered'
+            )
+
+    def _get_resumable_listing(self, args, position: ListingPosition, ordered=None):
+        """
+        Return the listing selected by the start options and cut at ``--maxResults``, keeping
+        track of how far the caller got in ``position``.
+        """
+        self._check_start_options(args)
+        file_version_filter = self._get_file_version_filter(args)
+        listing = skip_to_start(
+            self._get_ls_generator(args, ordered),
+            start_file_name=args.startFileName,
+            start_after=args.startAfter,
+            start_after_file_id=args.startAfterFileId,
+            start_after_upload_timestamp=self._get_start_after_upload_timestamp(args),
+        )
+        if file_version_filter is not None:
+            listing = (entry for entry in listing if file_version_filter.matches(entry[0]))
+        return position.limit(listing, args.maxResults)
+
+    def _get_start_after_upload_timestamp(self, args) -> Optional[int]:
+        """
+        Return the upload timestamp which the versions of the ``--startAfter`` file have to be
+        older than to be listed, if the ``--startAfterFileId`` version is gone.
+        """
+        if args.startAfterFileId is None:
+            return None
+        bucket = self.api.get_bucket_by_name(args.bucketName)
+        # startFileName and startFileId are the cursor which B2 pages through the versions with
+        # (nextFileName and nextFileId), so B2 has to list from the position of the version
+        # rather than look it up: otherwise any paged listing would fail once the version was
+        # removed between its requests. The first version after the position is returned.
+        response = self.api.session.list_file_versions(
+            bucket.id_, args.startAfter, args.startAfterFileId, 1
+        )
+        files = response['files']
+        if not files or files[0]['fileName'] != args.startAfter:
+            return None  # no versions of the file after it
+        if files[0]['fileId'] == args.startAfterFileId:
+            return files[0]['uploadTimestamp']
+        # the first version after the one which is gone is not skipped
+        return files[0]['uploadTimestamp'] + 1
+
+    @classmethod
+    def _get_file_version_filter(cls, args) -> Optional[FileVersionFilter]:
+        """
+        Return the filter of listed file versions, or ``None`` if all of them are selected.
+        """
+        sizes = (args.minSize, args.maxSize)
+        ages = (args.olderThan, args.newerThan)
+        if args.bySrcLastModified and all(option is None for option in ages):
+            raise CommandError('--bySrcLastModified requires --olderThan or --newerThan')
+        if all(option is None for option in sizes + ages) and not (args.action or args.contentType):
+            return None
+        if not args.recursive:
+            raise CommandError(
+                '--minSize, --maxSize, --olderThan, --newerThan, --action and --contentType '
+                'require --recursive'
+            )
+        if args.minSize is not None and args.maxSize is not None and args.minSize > args.maxSize:
+            raise CommandError('--minSize cannot be greater than --maxSize')
+        return FileVersionFilter(
+            # a resumed removal measures the ages from the time it was first run at
+            now_millis=getattr(args, 'startedMillis', None) or current_time_millis(),
+            min_size=args.minSize,
+            max_size=args.maxSize,
+            older_than_millis=args.olderThan,
+            newer_than_millis=args.newerThan,
+            by_mod_time=args.bySrcLastModified,
+            actions=args.action,
+            content_types=args.contentType,
+        )
+
+    @contextmanager
+    def _printing_continuation(self, args, position: ListingPosition):
+        """
+        Print the options continuing the listing if the block is interrupted, or if the
+        listing was cut at ``--maxResults``.
+        """
+        try:
+            yield
+        except KeyboardInterrupt:
+            self._print_continuation(args, position.get_continuation_args(args.versions))
+            raise
+        if position.more:
+            self._print_continuation(args, position.get_continuation_args(args.versions))
+
+    def _print_continuation(self, args, continuation_args: Optional[List[str]]) -> None:
+        # an unordered listing cannot be continued from a name
+        if continuation_args is not None and not args.unordered:
+            self._print_stderr(format_continuation(continuation_args))
+
+    @classmethod
+    def _get_start(cls, args) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Return the file name (and ID) which the listing can start at in B2.
+        """
+        if args.startFileName is not None:
+            return args.startFileName, None
+        return args.startAfter, args.startAfterFileId
+
     def _print_file_version(
         self,
         args,
@@ -1770,10 +2771,71 @@ class AbstractLsCommand(Command, metaclass=ABCMeta):
     ) -> None:
         self._print(folder_name or file_version.file_name)
 
-    def _get_ls_generator(self, args):
-        start_file_name = args.folderName or ''
+    def _get_file_name_filter(self, args) -> Optional[FileNameFilter]:
+        """
+        Return the filter of listed file names, or ``None`` if the listing selects them
+        by itself, i.e. there is at most one ``folderName`` and no regular expressions.
+        """
+        if len(args.folderName) <= 1 and not args.includeRegex and not args.excludeRegex:
+            return None
+        if len(args.folderName) > 1 and not args.withWildcard:
+            raise CommandError('many folderName patterns can only be used with --withWildcard')
+        if not args.recursive:
+            raise CommandError(
+                '--includeRegex, --excludeRegex and many folderName patterns '
+                'require --recursive'
+            )
+        if args.withWildcard:
+            patterns, prefix = args.folderName, ''
+        else:
+            patterns, prefix = [], get_listing_prefix(self._get_folder_to_list(args), False)
+        try:
+            return FileNameFilter(patterns, args.includeRegex, args.excludeRegex, prefix=prefix)
+        except re.error as error:
+            raise CommandError(f'invalid regular expression: {error}')
+
+    @classmethod
+    def _get_folder_to_list(cls, args) -> str:
+        return args.folderName[0] if args.folderName else ''
+
+    @classmethod
+    def _filter_listing(cls, listing, file_name_filter: FileNameFilter):
+        for file_version, folder_name in listing:
+            if file_name_filter.matches(file_version.file_name):
+                yield file_version, folder_name
+
+    def _get_ls_generator(self, args, ordered=None):
+        file_name_filter = self._get_file_name_filter(args)
+        start_file_name = self._get_folder_to_list(args)
+
+        bucket = self.api.get_bucket_by_name(args.bucketName)
+
+        if ordered is None:
+            ordered = not args.unordered
+        start, start_file_id = self._get_start(args)
+        if file_name_filter is not None:
+            # a single listing of what all the selected names start with
+            lister = ShardedLister(bucket, args.listThreads, ordered=ordered)
+            listing = lister.ls_prefix(
+                file_name_filter.listing_prefix,
+                latest_only=not args.versions,
+                start_file_name=start,
+                start_file_id=start_file_id,
+            )
+            yield from self._filter_listing(listing, file_name_filter)
+            return
 
-        bucket = self.api.get_bucket_by_name(args.bucketName)
+        # Bucket.ls cannot start at a name, so a recursive listing with a start is sharded
+        if args.recursive and (args.listThreads > 1 or start is not None):
+            lister = ShardedLister(bucket, args.listThreads, ordered=ordered)
+            yield from lister.ls(
+                start_file_name,
+                latest_only=not args.versions,
+                with_wildcard=args.withWildcard,
+                start_file_name=start,
+                start_file_id=start_file_id,
+            )
+            return
 
         try:
             yield from bucket.ls(
@@ -1807,6 +2869,12 @@ class Ls(AbstractLsCommand):
 
     The ``--replication`` option adds replication status
 
+    The ``--fromSnapshot`` option lists the bucket from its local snapshot,
+    made by ``{NAME} snapshot``, instead of B2.  The snapshot file is the default
+    one of the bucket, unless ``--snapshotFile`` is given.  Only names, IDs, sizes,
+    SHA1 checksums, upload timestamps and actions of file versions are stored in
+    snapshots, so the rest of the ``--json`` output is empty.
+
     {ABSTRACTLSCOMMAND}
 
     Examples
@@ -1852,21 +2920,70 @@ class Ls(AbstractLsCommand):
         parser.add_argument('--long', action='store_true')
         parser.add_argument('--json', action='store_true')
         parser.add_argument('--replication', action='store_true')
+        parser.add_argument('--fromSnapshot', action='store_true')
+        parser.add_argument('--snapshotFile', metavar='PATH')
         super()._setup_parser(parser)
 
     def run(self, args):
+        if args.snapshotFile is not None and not args.fromSnapshot:
+            raise CommandError('--snapshotFile can only be used with --fromSnapshot')
+        if args.json and args.ndjson:
+            raise CommandError('--json and --ndjson cannot be used together')
         if args.json:
-            # TODO: Make this work for an infinite generation.
-            #   Use `_print_file_version` to print a single `file_version` and manage the external JSON list
-            #   e.g. manually. However, to do it right, some sort of state needs to be kept e.g. info whether
-            #   at least one element was written to the stream, so we can add a `,` on the start of another.
-            #   That would sadly lead to an ugly formatting, so `_print` needs to be expanded with an ability
-            #   to not print end-line character(s).
-            self._print_json([file_version for file_version, _ in self._get_ls_generator(args)])
+            position = ListingPosition()
+            listing = self._get_resumable_listing(args, position)
+            with self._printing_continuation(args, position), self._buffered_stdout():
+                self._print_json_list(file_version for file_version, _ in listing)
             return 0
 
         return super().run(args)
 
+    def _get_start_after_upload_timestamp(self, args) -> Optional[int]:
+        if not args.fromSnapshot or args.startAfterFileId is None:
+            return super()._get_start_after_upload_timestamp(args)
+        snapshot_path = get_snapshot_path(args.bucketName, args.snapshotFile)
+        try:
+            with BucketSnapshot.open(snapshot_path) as snapshot:
+                upload_timestamp = snapshot.get_upload_timestamp(args.startAfterFileId)
+        except SnapshotError as error:
+            raise CommandError(str(error))
+        if upload_timestamp is None:
+            # the snapshot was refreshed since the version was listed, so where it was is not
+            # known: all versions of the file are listed rather than some of them skipped
+            return sys.maxsize
+        return upload_timestamp
+
+    def _get_ls_generator(self, args, ordered=None):
+        if not args.fromSnapshot:
+            yield from super()._get_ls_generator(args, ordered)
+            return
+
+        file_name_filter = self._get_file_name_filter(args)
+        snapshot_path = get_snapshot_path(args.bucketName, args.snapshotFile)
+        try:
+            with BucketSnapshot.open(snapshot_path) as snapshot:
+                if snapshot.get_meta('bucket_name') != args.bucketName:
+                    raise CommandError(f'{snapshot_path} is a snapshot of another bucket')
+                if file_name_filter is not None:
+                    listing = snapshot.ls_prefix(
+                        self.api.file_version_factory,
+                        file_name_filter.listing_prefix,
+                        latest_only=not args.versions,
+                    )
+                    yield from self._filter_listing(listing, file_name_filter)
+                    return
+                yield from snapshot.ls(
+                    self.api.file_version_factory,
+                    self._get_folder_to_list(args),
+                    latest_only=not args.versions,
+                    recursive=args.recursive,
+                    with_wildcard=args.withWildcard,
+                )
+        except SnapshotError as error:
+            raise CommandError(str(error))
+        except ValueError as error:
+            raise B2Error(error.args[0])
+
     def _print_file_version(
         self,
         args,
@@ -1886,9 +3003,7 @@ class Ls(AbstractLsCommand):
         return self.LS_ENTRY_TEMPLATE % ('-', '-', '-', '-', 0, name)
 
     def format_ls_entry(self, file_version: FileVersion, replication: bool):
-        dt = datetime.datetime.utcfromtimestamp(file_version.upload_timestamp / 1000)
-        date_str = dt.strftime('%Y-%m-%d')
-        time_str = dt.strftime('%H:%M:%S')
+        date_str, time_str = format_upload_time(file_version.upload_timestamp // 1000)
         size = file_version.size or 0  # required if self.action == 'hide'
         template = replication and self.LS_ENTRY_TEMPLATE_REPLICATION or self.LS_ENTRY_TEMPLATE
         parameters = [
@@ -1906,7 +3021,7 @@ class Ls(AbstractLsCommand):
 
 
 @B2.register_subcommand
-class Rm(AbstractLsCommand):
+class Rm(RemovalMixin, AbstractLsCommand):
     """
     Removes a "folder" or a set of files matching a pattern.  Use with caution.
 
@@ -1922,27 +3037,36 @@ class Rm(AbstractLsCommand):
     To list (but not remove) files to be deleted, use ``--dryRun``.  You can also
     list files via ``ls`` command - the listing behaviour is exactly the same.
 
-    Users with multiple files to be removed will benefit from multi-threaded
-    capabilities.  The default number of threads is 10.
-
-    Progress is displayed on the console unless ``--noProgress`` is specified.
+    To delete file versions listed in a file (by their IDs), use ``delete-file-versions``.
 
-    {ABSTRACTLSCOMMAND}
+    {REMOVALMIXIN}
 
-    The ``--dryRun`` option prints all the files that would be affected by
-    the command, but removes nothing.
+    Files are listed ahead of their removal, so removals do not wait for the next
+    page of the listing.  At most ``--prefetchPages`` pages (of 1000 file versions)
+    are kept ahead, 2 by default; 0 lists files only when there is room to remove
+    them.
 
-    Normally, when an error happens during file removal, log is printed and the command
-    goes further. If any error should be immediately breaking the command,
-    ``--failFast`` can be passed to ensure that first error will stop the execution.
-    This could be useful to e.g. check whether provided credentials have **deleteFiles**
-    capabilities.
+    {ABSTRACTLSCOMMAND}
 
-    .. note::
+    The ``--journal`` option records the progress of the removal in the given file:
+    the files submitted for removal, the removed ones, and (every few seconds)
+    checkpoints of the listing.  If the command is killed or interrupted, running
+    it again with the same journal resumes the removal from the last checkpoint,
+    without listing the files before it again, and skips the files which the journal
+    says were taken care of (without ``--versions``, the files submitted for removal;
+    with it, the removed and not found versions).  The journal is removed when all
+    the files are removed.  It cannot be used with ``--dryRun`` and ``--unordered``.
+    The ages of ``--olderThan`` and ``--newerThan`` are measured from the time the
+    command was first run at, so that resuming it selects the same file versions.
+
+    When removal is interrupted (or stops at ``--maxResults``) without ``--versions``,
+    files which were being removed at that moment may be left, as the continuation
+    skips them rather than risk removing the previous versions of the files.  Files
+    are removed in the order of their names, unless ``--unordered`` is given.
 
-        Using ``--failFast`` doesn't prevent the command from trying to remove further files.
-        It just stops the progress. Since multiple files are removed in parallel, it's possible
-        that just some of them were not reported.
+    The ``--dryRun`` option prints all the files that would be affected by
+    the command, but removes nothing.  The ``--ndjson`` option can only be used
+    together with ``--dryRun``.
 
     Command returns 0 if all files were removed successfully and
     a value different from 0 if any file was left.
@@ -1981,138 +3105,281 @@ class Rm(AbstractLsCommand):
         {NAME} rm --recursive --withWildcard bucketName "b[0-9]/*.pdf"
 
 
+    Remove all tmp and bak files and everything in the cache folder, listing the bucket once:
+
+    .. code-block::
+
+        {NAME} rm --recursive --withWildcard bucketName "*.tmp" "*.bak" "cache/*"
+
+
     Requires capability:
 
     - **listFiles**
     - **deleteFiles**
     """
 
-    DEFAULT_THREADS = 10
-    PROGRESS_REPORT_CLASS = ProgressReport
+    DEFAULT_PREFETCH_PAGES = 2
+    # file versions in a page of the listing
+    PREFETCH_PAGE_SIZE = 1000
+    # options of the command which its journal has to be resumed with
+    JOURNAL_COMMAND_ARGS = (
+        'bucketName',
+        'folderName',
+        'versions',
+        'recursive',
+        'withWildcard',
+        'includeRegex',
+        'excludeRegex',
+        'minSize',
+        'maxSize',
+        'olderThan',
+        'newerThan',
+        'bySrcLastModified',
+        'action',
+        'contentType',
+    )
 
-    class SubmitThread(threading.Thread):
-        END_MARKER = object()
-        ERROR_TAG = 'error'
-        EXCEPTION_TAG = 'general_exception'
+    @classmethod
+    def _setup_parser(cls, parser):
+        parser.add_argument('--dryRun', action='store_true')
+        parser.add_argument('--journal', metavar='PATH')
+        parser.add_argument(
+            '--prefetchPages', type=int, default=cls.DEFAULT_PREFETCH_PAGES, metavar='PAGES'
+        )
+        super()._setup_parser(parser)
 
-        def __init__(
-            self,
-            runner: 'Rm',
-            args: argparse.Namespace,
-            messages_queue: queue.Queue,
-            reporter: ProgressReport,
-        ):
-            self.runner = runner
-            self.args = args
-            self.messages_queue = messages_queue
-            self.reporter = reporter
-            removal_queue_size = self.args.queueSize or (2 * self.args.threads)
-            self.semaphore = threading.BoundedSemaphore(value=removal_queue_size)
-            self.fail_fast_event = threading.Event()
-            self.mapping_lock = threading.Lock()
-            self.futures_mapping = {}
-            super().__init__(daemon=True)
+    def run(self, args):
+        if args.dryRun:
+            if args.journal is not None:
+                raise CommandError('--journal cannot be used with --dryRun')
+            return super().run(args)
+        if args.ndjson:
+            raise CommandError('--ndjson can only be used with --dryRun')
+        if args.prefetchPages < 0:
+            raise CommandError('--prefetchPages cannot be negative')
+        # the listing is made by another thread, so its options are checked here
+        self._check_start_options(args)
+        self._get_file_version_filter(args)
+
+        journal = self._open_journal(args)
+        try:
+            status, finished = self._run_removal(args, journal)
+        except BaseException:
+            if journal is not None:
+                journal.close()
+                self._print_stderr(
+                    f'the removal can be continued by running the command again with '
+                    f'--journal {args.journal}'
+                )
+            raise
+        if journal is not None:
+            if status == 0 and finished:
+                journal.remove()
+            else:
+                journal.close()
+        return status
 
-        def run(self) -> None:
-            try:
-                with ThreadPoolExecutor(max_workers=self.args.threads) as executor:
-                    self._run_removal(executor)
-            except Exception as error:
-                self.messages_queue.put((self.EXCEPTION_TAG, error))
-            finally:
-                self.messages_queue.put(self.END_MARKER)
+    def _open_journal(self, args) -> Optional[RemovalJournal]:
+        """
+        Open the journal given by ``--journal``, and continue the listing from its checkpoint.
+        """
+        if args.journal is None:
+            return None
+        if args.unordered:
+            raise CommandError('--journal cannot be used with --unordered')
+        command = {name: getattr(args, name) for name in self.JOURNAL_COMMAND_ARGS}
+        try:
+            journal = RemovalJournal.open(
+                args.journal,
+                command,
+                versions=args.versions,
+                started_millis=current_time_millis(),
+            )
+        except JournalError as error:
+            raise CommandError(str(error))
+        args.startedMillis = journal.started_millis
+        if journal.checkpoint is not None:
+            if args.startAfter is not None or args.startFileName is not None:
+                journal.close()
+                raise CommandError(
+                    '--startAfter and --startFileName cannot be used when resuming from a journal'
+                )
+            option, file_name = journal.checkpoint
+            setattr(args, option[2:], file_name)
+        return journal
+
+    def _get_removal_listing(self, args, position: ListingPosition):
+        listing = self._get_resumable_listing(args, position)
+        if args.prefetchPages > 0:
+            # the listing goes on while the removals wait for free slots
+            listing = prefetch(listing, args.prefetchPages * self.PREFETCH_PAGE_SIZE)
+        return listing
+
+    def _get_removal_continuation_args(
+        self,
+        args,
+        last_submitted: FileVersion,
+        in_flight: List[FileVersion],
+    ) -> Optional[List[str]]:
+        if not args.versions:
+            # Removals in progress may not finish, but listing them again would
+            # remove the previous versions of these files, so they are skipped.
+            return ['--startAfter', last_submitted.file_name]
+        # removed versions are not listed again, so the listing can start from
+        # the first file which is being removed (or the last one removed)
+        file_names = [file_version.file_name for file_version in in_flight]
+        return ['--startFileName', min(file_names, default=last_submitted.file_name)]
+
+    def _print_removal_continuation(self, args, continuation_args: Optional[List[str]]) -> None:
+        self._print_continuation(args, continuation_args)
 
-        def _run_removal(self, executor: Executor):
-            for file_version, _ in self.runner._get_ls_generator(self.args):
-                # Obtaining semaphore limits number of elements that we fetch from LS.
-                self.semaphore.acquire(blocking=True)
-                # This event is updated before the semaphore is released. This way,
-                # in a single threaded scenario, we get synchronous responses.
-                if self.fail_fast_event.is_set():
-                    break
 
-                self.reporter.update_total(1)
-                future = executor.submit(
-                    self.runner.api.delete_file_version,
-                    file_version.id_,
-                    file_version.file_name,
-                )
-                with self.mapping_lock:
-                    self.futures_mapping[future] = file_version
-                # Done callback is added after, so it's "sure" that mapping is updated earlier.
-                future.add_done_callback(self._removal_done)
+@B2.register_subcommand
+class PruneVersions(Rm):
+    """
+    Removes old versions of files, in a single pass over a listing of all
+    versions in a bucket (or a folder).  Use with caution.
+
+    All versions except the newest ``--keepVersions`` (1 by default) versions
+    (uploads or hide markers) of every file are removed.  With ``--purgeHidden``,
+    all versions of hidden files (i.e. files whose newest version is a hide
+    marker) are removed, too.  The hide marker of a hidden file is removed only
+    after all the other versions of the file are, and it is kept if any of them
+    cannot be removed, so that the file does not become visible again.
+    Unfinished large files are left alone.
+
+    The removed versions can be narrowed down by the options selecting file
+    versions, e.g. ``--olderThan 30d`` removes only the old versions uploaded more
+    than 30 days ago, and ``--minSize 1GB`` only the big ones.
+
+    The removal works like ``{NAME} rm --recursive --versions`` (which are
+    implied), with the same options, e.g. ``--dryRun`` lists the versions which
+    would be removed, and ``--threads`` sets the number of concurrent removals.
+    ``--unordered`` cannot be used, as the versions of each file have to be
+    listed together.
 
-            self.reporter.end_total()
+    Examples.
 
-        def _removal_done(self, future: Future) -> None:
-            with self.mapping_lock:
-                file_version = self.futures_mapping.pop(future)
+    Keep only the three newest versions of every file in a folder:
 
-            try:
-                future.result()
-                self.reporter.update_count(1)
-            except FileNotPresent:
-                # We wanted to remove this file anyway.
-                self.reporter.update_count(1)
-            except B2Error as error:
-                if self.args.failFast:
-                    # This is set before releasing the semaphore.
-                    # It means that when the semaphore is released,
-                    # we'll already have information about requirement to fail.
-                    self.fail_fast_event.set()
-                self.messages_queue.put((self.ERROR_TAG, file_version, error))
-            except Exception as error:
-                self.messages_queue.put((self.EXCEPTION_TAG, error))
-            finally:
-                self.semaphore.release()
+    .. code-block::
+
+        {NAME} prune-versions --keepVersions 3 bucketName folderName
+
+
+    Remove the old versions uploaded more than 30 days ago, and hidden files:
+
+    .. code-block::
+
+        {NAME} prune-versions --olderThan 30d --purgeHidden bucketName
+
+
+    Requires capability:
+
+    - **listFiles**
+    - **deleteFiles**
+    """
+
+    JOURNAL_COMMAND_ARGS = Rm.JOURNAL_COMMAND_ARGS + ('keepVersions', 'purgeHidden')
 
     @classmethod
     def _setup_parser(cls, parser):
-        parser.add_argument('--dryRun', action='store_true')
-        parser.add_argument('--threads', type=int, default=cls.DEFAULT_THREADS)
-        parser.add_argument(
-            '--queueSize',
-            type=int,
-            default=None,
-            help='max elements fetched at once for removal, ' \
-                 'if left unset defaults to twice the number of threads.',
-        )
-        parser.add_argument('--noProgress', action='store_true')
-        parser.add_argument('--failFast', action='store_true')
+        parser.add_argument('--keepVersions', type=int, default=1, metavar='COUNT')
+        parser.add_argument('--purgeHidden', action='store_true')
         super()._setup_parser(parser)
 
     def run(self, args):
-        if args.dryRun:
-            return super().run(args)
+        if args.keepVersions < 1:
+            raise CommandError('--keepVersions should be a positive number')
+        if args.unordered:
+            raise CommandError('--unordered cannot be used with prune-versions')
+        args.versions = True
+        args.recursive = True
+        return super().run(args)
 
-        failed_on_any_file = False
-        messages_queue = queue.Queue()
+    @classmethod
+    def _get_start(cls, args) -> Tuple[Optional[str], Optional[str]]:
+        # all versions of the file to start at are listed, to count the ones to keep
+        start, _ = super()._get_start(args)
+        return start, None
+
+    def _is_removed_last(self, args, file_version: FileVersion) -> bool:
+        # the hide marker of a hidden file comes after its other versions
+        return args.purgeHidden and file_version.action == 'hide'
+
+    def _get_ls_generator(self, args, ordered=None):
+        listing = super()._get_ls_generator(args, ordered)
+        file_versions = select_versions_to_prune(
+            (file_version for file_version, _ in listing),
+            keep_versions=args.keepVersions,
+            purge_hidden=args.purgeHidden,
+        )
+        for file_version in file_versions:
+            yield file_version, None
 
-        with self.PROGRESS_REPORT_CLASS(self.stdout, args.noProgress) as reporter:
-            submit_thread = self.SubmitThread(self, args, messages_queue, reporter)
-            # This thread is started in daemon mode, no joining needed.
-            submit_thread.start()
 
-            while True:
-                queue_entry = messages_queue.get(block=True)
-                if queue_entry is submit_thread.END_MARKER:
-                    break
+@B2.register_subcommand
+class Snapshot(Command):
+    """
+    Stores a listing of all versions of all files in a bucket in a local
+    SQLite database (a snapshot), so that ``{NAME} ls --fromSnapshot`` can list
+    the bucket without listing it in B2 again.
 
-                event_type, *data = queue_entry
-                if event_type == submit_thread.ERROR_TAG:
-                    file_version, error = data
-                    message = f'Deletion of file "{file_version.file_name}" ' \
-                              f'({file_version.id_}) failed: {str(error)}'
-                    reporter.print_completion(message)
+    Running the command again refreshes the snapshot: versions listed in B2
+    are added to it and versions which are not there any more are removed.
+    B2 cannot list versions by their upload time, so refreshing lists the whole
+    bucket again.  To refresh only the files in a folder, give ``folderName``.
 
-                    failed_on_any_file = True
-                    if args.failFast:
-                        break
+    The snapshot is kept in the cache directory of the tool (``B2_CACHE_DIR``,
+    ``XDG_CACHE_HOME/b2`` or ``~/.cache/b2``), unless ``--snapshotFile`` is given.
+
+    The ``--listThreads`` option lists the bucket with the given number of
+    concurrent cursors.
+
+    Prints a summary in JSON: the number of file versions in the snapshot,
+    listed, added and removed ones, the number of listed versions uploaded after
+    the previous refresh's newest one, and the upload timestamp of the newest
+    version (the watermark).
+
+    Requires capability:
+
+    - **listFiles**
+    """
+
+    @classmethod
+    def _setup_parser(cls, parser):
+        parser.add_argument('--listThreads', type=int, default=1, metavar='THREADS')
+        parser.add_argument('--snapshotFile', metavar='PATH')
+        parser.add_argument('bucketName').completer = bucket_name_completer
+        parser.add_argument('folderName', nargs='?').completer = file_name_completer
 
-                elif event_type == submit_thread.EXCEPTION_TAG:
-                    raise data[0]
+    def run(self, args):
+        bucket = self.api.get_bucket_by_name(args.bucketName)
+        snapshot_path = get_snapshot_path(args.bucketName, args.snapshotFile)
+        prefix = args.folderName or ''
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        if args.listThreads > 1:
+            lister = ShardedLister(bucket, args.listThreads, ordered=False)
+            listing = lister.ls(prefix, latest_only=False)
+        else:
+            listing = bucket.ls(prefix, latest_only=False, recursive=True)
 
-        return 1 if failed_on_any_file else 0
+        try:
+            with BucketSnapshot.create_or_open(
+                snapshot_path,
+                self.api.account_info.get_account_id(),
+                bucket.id_,
+                bucket.name,
+            ) as snapshot:
+                summary = snapshot.refresh(
+                    (file_version for file_version, _ in listing),
+                    prefix=prefix,
+                )
+        except SnapshotError as error:
+            raise CommandError(str(error))
+        self._print_json({'bucketName': bucket.name, 'snapshotFile': str(snapshot_path), **summary})
+        return 0
 
 
 @B2.register_subcommand
@@ -2155,6 +3422,7 @@ class Sync(
     WriteBufferSizeMixin,
     SkipHashVerificationMixin,
     MaxDownloadStreamsMixin,
+    NdjsonMixin,
     UploadModeMixin,
     Command,
 ):
@@ -2176,6 +3444,11 @@ class Sync(
 
     Specify ``--dryRun`` to simulate the actions that would be taken.
 
+    {NDJSONMIXIN}
+
+    Every record describes an action, e.g.
+    ``{{"action":"upload","fileName":"a.txt"}}``, and progress is not displayed.
+
     To allow sync to run when the source directory is empty, potentially
     deleting all files in a bucket, specify ``--allowEmptySource``.
     The default is to fail when the specified source directory doesn't exist
@@ -2414,7 +3687,11 @@ class Sync(
                 write_bucket_settings=write_encryption_settings,
             )
 
-        with SyncReport(self.stdout, args.noProgress) as reporter:
+        if args.ndjson:
+            reporter = NdjsonSyncReport(self.stdout)
+        else:
+            reporter = SyncReport(self.stdout, args.noProgress)
+        with reporter:
             try:
                 synchronizer.sync_folders(
                     source_folder=source,
@@ -3092,6 +4369,8 @@ class ReplicationStatus(Command):
         self._print_json(results)
 
     def output_console(self, results: Dict[str, List[dict]]) -> None:
+        from tabulate import tabulate
+
         for rule_name, rule_results in results.items():
             self._print(f'Replication "{rule_name}":')
             rule_results = [
@@ -3180,6 +4459,8 @@ class License(Command):  # pragma: no cover
 
     def __init__(self, console_tool):
         super().__init__(console_tool)
+        import requests
+
         self.request_session = requests.session()
 
     @classmethod
@@ -3213,6 +4494,8 @@ class License(Command):  # pragma: no cover
 
         included_sources = get_included_sources()
         if included_sources:
+            import prettytable
+
             stream.write(
                 f'\n\nThird party libraries modified and included in {NAME} or {b2sdk.__name__}:\n'
             )
@@ -3232,6 +4515,8 @@ class License(Command):  # pragma: no cover
         stream.write(b2_license_file_text)
 
     def _put_license_text_for_packages(self, stream: io.StringIO):
+        import prettytable
+
         license_table = prettytable.PrettyTable(
             ['Module name', 'License text'], hrules=prettytable.ALL
         )
@@ -3266,6 +4551,9 @@ class License(Command):  # pragma: no cover
 
     @classmethod
     def _get_licenses_dicts(cls) -> List[Dict]:
+        piplicenses = None
+        with suppress(ImportError):
+            import piplicenses
         assert piplicenses, 'In order to run this command, you need to install the `license` extra: pip install b2[license]'
         parser = piplicenses.create_parser()
         args = parser.parse_args(
@@ -3288,11 +4576,15 @@ class License(Command):  # pragma: no cover
         return response.text
 
     def _get_single_license(self, module_dict: dict):
+        import piplicenses
+
         license_ = module_dict['LicenseText']
         module_name = module_dict['Name']
         if module_name == 'rst2ansi':
             # this one module is problematic, we need to extract the license text from its docstring
             assert license_ == piplicenses.LICENSE_UNKNOWN  # let's make sure they didn't fix it
+            import rst2ansi
+
             license_ = rst2ansi.__doc__
             assert 'MIT License' in license_  # let's make sure the license is still there
         elif module_name == 'b2sdk':
@@ -3348,6 +4640,187 @@ class InstallAutocomplete(Command):
         return 0
 
 
+@B2.register_subcommand
+class Daemon(Command):
+    """
+    Runs commands of {NAME} executables of the current user in this long-lived process.
+
+    Starting the tool, loading account info and connecting to B2 takes longer than most
+    commands, so while the daemon is running, {NAME} only forwards its arguments, environment
+    and standard streams to it.  The daemon keeps B2 API objects (with their connection pools,
+    bucket caches and upload URLs) between the commands, per profile.  Output and exit
+    status of the commands are the same as when they run in-process.  Commands are run one
+    at a time; the ones started while the daemon is running another command are run
+    in-process, rather than wait for it.
+
+    If no daemon is running (or it cannot run a command, like ``authorize-account``,
+    or it was started by another installation or version of {NAME}, or with another
+    Python interpreter), commands are run in-process as usual.
+
+    The daemon listens on a Unix socket, at ``{B2_DAEMON_SOCKET_ENV_VAR}`` env var's value,
+    if set, otherwise at ``daemon/daemon.sock`` in the cache directory
+    (``~/.cache/b2`` by default).
+
+    --idleTimeout SECONDS
+    Exit after not receiving any command for the given number of seconds.
+    """
+
+    REQUIRES_AUTH = False
+    RUN_IN_DAEMON = False
+
+    @classmethod
+    def _setup_parser(cls, parser):
+        parser.add_argument('--idleTimeout', type=float, metavar='SECONDS')
+        super()._setup_parser(parser)
+
+    def run(self, args):
+        socket_path = get_daemon_socket_path()
+        b2_apis = {}
+
+        def run_command(argv, stdin, stdout, stderr):
+            subcommand_name = B2.find_subcommand_name(argv[1:])
+            if subcommand_name is not None:
+                if not B2.subcommands_registry.get_class(subcommand_name).RUN_IN_DAEMON:
+                    raise RunInClient()
+            return DaemonConsoleTool(b2_apis, stdout, stderr).run_command(argv)
+
+        server = DaemonServer(socket_path, run_command, idle_timeout=args.idleTimeout)
+        try:
+            server.bind()
+        except DaemonProtocolError as e:
+            raise CommandError(str(e)) from e
+        except OSError as e:
+            raise CommandError(
+                f'cannot create the socket {socket_path}: {e}, '
+                f'please set {B2_DAEMON_SOCKET_ENV_VAR}'
+            ) from e
+        self._print(f'b2 daemon listening on {socket_path}')
+        self.stdout.flush()
+        server.serve_forever()
+        return 0
+
+
+@B2.register_subcommand
+class Batch(Command):
+    """
+    Runs many commands in a single process, sharing one authorized B2 API object.
+
+    Commands are read from the given file (or from stdin, if it is ``-``), one per line:
+    either as arguments typed in a shell, without the leading ``{NAME}``
+    (e.g. ``hide-file bucketName "file name"``), or as a JSON array of them
+    (e.g. ``["hide-file", "bucketName", "file name"]``).  Empty lines and lines starting
+    with ``#`` are skipped.
+
+    For each command, a JSON object is printed in a single line, with the number of its line
+    (``line``), its arguments (``command``), exit status (``status``) and output
+    (``stdout`` and ``stderr``).  Results are printed in the order of the commands, even
+    if they are run in parallel.  The exit status of ``batch`` is 0 only if all of the
+    commands succeeded.
+
+    --threads THREADS
+    Number of commands to run in parallel (1 by default).
+
+    Commands cannot change the configuration of the shared B2 API object (e.g. ``--profile``),
+    and ``authorize-account``, ``batch`` and ``daemon`` cannot be run in a batch.
+    """
+
+    @classmethod
+    def _setup_parser(cls, parser):
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument('commandsFile')
+        super()._setup_parser(parser)
+
+    def run(self, args):
+        if args.threads < 1:
+            raise CommandError('--threads must be a positive number')
+        if args.commandsFile == '-':
+            return self._run_commands(sys.stdin, args.threads)
+        with open(args.commandsFile) as commands_file:
+            return self._run_commands(commands_file, args.threads)
+
+    def _run_commands(self, lines, threads):
+        failed = False
+        pending = collections.deque()
+        executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        try:
+            for line_number, line in enumerate(lines, start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                pending.append(self._start_command(executor, line_number, line))
+                # results are printed in order, so only a limited number of them is kept
+                while pending and (pending[0].done() or len(pending) > 2 * threads):
+                    failed |= self._print_result(pending.popleft().result())
+            while pending:
+                failed |= self._print_result(pending.popleft().result())
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return 1 if failed else 0
+
+    def _start_command(self, executor: Optional[Executor], line_number: int, line: str) -> Future:
+        result = {'line': line_number, 'command': None}
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        future = Future()
+        try:
+            argv = self._parse_line(line)
+            result['command'] = argv
+            # parser prints help and errors to sys.stdout and sys.stderr
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                parser = B2.get_parser(subcommand_name=B2.find_subcommand_name(argv))
+                args = parser.parse_args(argv)
+            if args.command_class in (AuthorizeAccount, Batch, Daemon):
+                raise CommandError(f'{argv[0]} cannot be run in a batch')
+        except SystemExit as e:
+            future.set_result(self._make_result(result, e.code, stdout, stderr))
+            return future
+        except (B2Error, ValueError) as e:
+            stderr.write(f'ERROR: {e}\n')
+            future.set_result(self._make_result(result, 1, stdout, stderr))
+            return future
+
+        def run_command():
+            console_tool = ConsoleTool(self.api, stdout, stderr)
+            try:
+                status = console_tool.run_parsed_command(
+                    args, [NAME, *argv], authorize_from_env=False
+                )
+            except Exception as e:
+                stderr.write(f'ERROR: {e!r}\n')
+                status = 1
+            return self._make_result(result, status, stdout, stderr)
+
+        if executor is None:
+            future.set_result(run_command())
+            return future
+        return executor.submit(run_command)
+
+    @classmethod
+    def _parse_line(cls, line: str) -> List[str]:
+        if line.startswith('['):
+            argv = json.loads(line)
+            if not all(isinstance(arg, str) for arg in argv):
+                raise ValueError('JSON array of the command must contain only strings')
+        else:
+            argv = shlex.split(line)
+        if not argv:
+            raise ValueError('empty command')
+        return argv
+
+    @classmethod
+    def _make_result(cls, result, status, stdout, stderr):
+        return dict(result, status=status, stdout=stdout.getvalue(), stderr=stderr.getvalue())
+
+    def _print_result(self, result) -> bool:
+        """
+        Print result of a command, return ``True`` if it failed.
+        """
+        self._print(json.dumps(result, sort_keys=True))
+        self.stdout.flush()
+        return result['status'] != 0
+
+
 class ConsoleTool:
     """
     Implements the commands available in the B2 command-line tool
@@ -3363,11 +4836,25 @@ class ConsoleTool:
 
     def run_command(self, argv):
         signal.signal(signal.SIGINT, keyboard_interrupt_handler)
-        parser = B2.get_parser()
-        argcomplete.autocomplete(parser)
+        if '_ARGCOMPLETE' in os.environ:
+            import argcomplete
+
+            # completion of the command name requires parsers of all the commands
+            parser = B2.get_parser()
+            save_completion_table(parser)
+            argcomplete.autocomplete(parser)
+        parser = B2.get_parser(subcommand_name=B2.find_subcommand_name(argv[1:]))
         args = parser.parse_args(argv[1:])
         self._setup_logging(args, argv)
+        return self.run_parsed_command(args, argv)
 
+    def run_parsed_command(self, args, argv, authorize_from_env=True):
+        """
+        Run a command with already parsed arguments, using ``self.api`` (created, if not given).
+
+        :param authorize_from_env: whether to authorize with keys from env vars, if given
+                                   (can be skipped if the api has been already authorized)
+        """
         if self.api:
             if (
                 args.profile or getattr(args, 'write_buffer_size', None) or
@@ -3393,7 +4880,7 @@ class ConsoleTool:
             if 'max_download_streams_per_file' in args:
                 kwargs['max_download_streams_per_file'] = args.max_download_streams_per_file
 
-            self.api = _get_b2api_for_profile(**kwargs)
+            self.api = self._get_b2api(**kwargs)
 
         b2_command = B2(self)
         command_class = b2_command.run(args)
@@ -3405,9 +4892,10 @@ class ConsoleTool:
             logger.info('starting command [%s] with arguments: %s', command, argv)
 
         try:
-            auth_ret = self.authorize_from_env(command_class)
-            if auth_ret:
-                return auth_ret
+            if authorize_from_env:
+                auth_ret = self.authorize_from_env(command_class)
+                if auth_ret:
+                    return auth_ret
             return command.run(args)
         except MissingAccountData as e:
             logger.exception('ConsoleTool missing account data error')
@@ -3430,6 +4918,9 @@ class ConsoleTool:
             logger.exception('ConsoleTool unexpected exception')
             raise
 
+    def _get_b2api(self, **kwargs) -> B2Api:
+        return _get_b2api_for_profile(**kwargs)
+
     def authorize_from_env(self, command_class):
         if not command_class.REQUIRES_AUTH:
             return 0
@@ -3464,7 +4955,9 @@ class ConsoleTool:
         if args.logConfig and (args.verbose or args.debugLogs):
             raise ValueError('Please provide either --logConfig or --verbose/--debugLogs')
         if args.logConfig:
-            logging.config.fileConfig(args.logConfig)
+            from logging.config import fileConfig
+
+            fileConfig(args.logConfig)
         elif args.verbose or args.debugLogs:
             # set log level to DEBUG for ALL loggers (even those not belonging to B2), but without any handlers,
             # those will added as needed (file and/or stderr)
@@ -3500,6 +4993,37 @@ class ConsoleTool:
         logger.debug('filesystem encoding is %s', sys.getfilesystemencoding())
 
 
+class DaemonConsoleTool(ConsoleTool):
+    """
+    Console tool running a command in `b2 daemon`, reusing B2Api objects of previous commands.
+    """
+
+    # env vars (of the client) which change the B2Api object created for a profile
+    B2API_ENV_VARS = (
+        B2_ACCOUNT_INFO_ENV_VAR,
+        XDG_CONFIG_HOME_ENV_VAR,
+        'HOME',
+        B2_USER_AGENT_APPEND_ENV_VAR,
+    )
+
+    def __init__(self, b2_apis: Dict[str, B2Api], stdout, stderr):
+        super().__init__(None, stdout, stderr)
+        self.b2_apis = b2_apis
+
+    def _get_b2api(self, **kwargs) -> B2Api:
+        env = [os.environ.get(name) for name in self.B2API_ENV_VARS]
+        key = json.dumps([kwargs, env], sort_keys=True)
+        if key not in self.b2_apis:
+            self.b2_apis[key] = super()._get_b2api(**kwargs)
+        return self.b2_apis[key]
+
+    @classmethod
+    def _setup_logging(cls, args, argv):
+        # undo the configuration of the previous command
+        logger.setLevel(logging.NOTSET)
+        super()._setup_logging(args, argv)
+
+
 # used by Sphinx
 get_parser = functools.partial(B2.get_parser, for_docs=True)
 
@@ -210,6 +210,13 @@ def test(session):
         session.notify('integration')
 
 
+@nox.session(python=PYTHON_DEFAULT_VERSION)
+def benchmark(session):
+    """Run benchmarks of startup and simple commands, compare them with the baseline."""
+    install_myself(session)
+    session.run('python', '-m', 'test.benchmark', *session.posargs)
+
+
 @nox.session(python=PYTHON_DEFAULT_VERSION)
 def cleanup_buckets(session):
     """Remove buckets from previous test runs."""
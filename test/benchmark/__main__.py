@@ -0,0 +1,230 @@
+######################################################################
+#
+# File: test/benchmark/__main__.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Benchmarks of the startup, of simple commands and of printing a long listing, run against a
+simulated B2 server.
+
+For every command, counts (the same in every run, with the same versions of Python and
+the dependencies):
+
+* ``import_modules`` - modules loaded by importing ``b2.console_tool``,
+* ``modules`` - modules loaded after the first run of the command (including the simulator),
+* ``api_calls`` - calls of the B2 API made by the first run of the command in a process,
+* ``warm_api_calls`` - calls of the B2 API made by the command run again in the same process,
+
+and measures (different in every run, and on every machine):
+
+* ``cold_wall_s`` - wall time of a new process, from starting the interpreter till the end of
+  the command (without setting up the simulator), median of ``--cold-runs`` processes,
+* ``import_s`` - time of importing ``b2.console_tool``, median of the same processes,
+* ``warm_wall_s`` - wall time of the command run again in an already warm process,
+  median of ``--warm-runs`` runs,
+* ``peak_rss_mib`` - peak resident memory of the processes.
+
+The counts are compared with the baseline (``baseline.json`` in this directory, unless
+``--baseline`` is given) and any count higher than in the baseline is reported as a regression
+(and makes the exit status non-zero).  ``--save`` stores the counts as the new baseline.
+
+Timings are only reported: they are compared with the baseline if it was measured on the same
+machine (e.g. results of a run before a change, stored with ``--output`` and given with
+``--baseline``), and differences bigger than ``--tolerance`` are marked as slower, but they do
+not make the exit status non-zero, since timings of separate runs vary too much for that.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .runner import BENCHMARKS
+
+BASELINE_PATH = pathlib.Path(__file__).parent / 'baseline.json'
+RESULTS_FORMAT = 2
+
+COUNTED_METRICS = ('import_modules', 'modules', 'api_calls', 'warm_api_calls')
+MEASURED_METRICS = ('cold_wall_s', 'import_s', 'warm_wall_s', 'peak_rss_mib')
+
+
+def _run_benchmark_process(name, runs, env):
+    launched_at = time.time()
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            '-m',
+            'test.benchmark.runner',
+            name,
+            '--runs',
+            str(runs),
+            '--launched-at',
+            repr(launched_at),
+        ],
+        env=env,
+    )
+    return json.loads(output)
+
+
+def run_benchmark(name, cold_runs, warm_runs, env):
+    cold = [_run_benchmark_process(name, 1, env) for _ in range(cold_runs)]
+    warm = _run_benchmark_process(name, warm_runs + 1, env)
+    peak_rss = [result['peak_rss_mib'] for result in cold if result['peak_rss_mib'] is not None]
+    return {
+        'import_modules': cold[0]['import_modules'],
+        'modules': cold[0]['modules'],
+        'api_calls': cold[0]['first_run_api_calls'],
+        'warm_api_calls': warm['next_runs_api_calls'],
+        'cold_wall_s': statistics.median(result['cold_wall_s'] for result in cold),
+        'import_s': statistics.median(result['import_s'] for result in cold),
+        'warm_wall_s': warm['next_runs_s'],
+        'peak_rss_mib': max(peak_rss) if peak_rss else None,
+    }
+
+
+def run_benchmarks(names, cold_runs, warm_runs):
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(os.environ)
+        # keep caches of the tool (e.g. rendered help) of the benchmarks separate, but shared
+        # between their runs, like between runs of the tool by a user
+        env['B2_CACHE_DIR'] = os.path.join(temp_dir, 'cache')
+        env['B2_ACCOUNT_INFO'] = os.path.join(temp_dir, 'account_info')
+        env.pop('B2_DAEMON_SOCKET', None)
+        for name in names:
+            print(f'running {name}...', file=sys.stderr)
+            results[name] = run_benchmark(name, cold_runs, warm_runs, env)
+    return {
+        'format': RESULTS_FORMAT,
+        'environment':
+            {
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'machine': platform.node(),
+            },
+        'benchmarks': results,
+    }
+
+
+def get_baseline(results):
+    """
+    Return the counts of the results, to be stored as the baseline.
+    """
+    benchmarks = {}
+    for name, metrics in results['benchmarks'].items():
+        benchmarks[name] = {metric: metrics[metric] for metric in COUNTED_METRICS}
+    return {'format': results['format'], 'benchmarks': benchmarks}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with the baseline: the counts always, the timings only if the baseline
+    was measured on the same machine.
+
+    :return: a list of rows of the report and a list of regressions
+    """
+    rows = []
+    regressions = []
+    if baseline and baseline.get('format') != results['format']:
+        baseline = None
+    same_machine = baseline is not None and baseline.get('environment') == results['environment']
+    for name, metrics in results['benchmarks'].items():
+        baseline_metrics = baseline['benchmarks'].get(name, {}) if baseline else {}
+        for metric, value in metrics.items():
+            baseline_value = baseline_metrics.get(metric)
+            if metric in MEASURED_METRICS and not same_machine:
+                baseline_value = None
+            if value is None or baseline_value is None:
+                rows.append((name, metric, baseline_value, value, ''))
+                continue
+            change = (value - baseline_value) / baseline_value if baseline_value else 0.0
+            status = ''
+            if metric in COUNTED_METRICS and value > baseline_value:
+                status = 'REGRESSION'
+                regressions.append(f'{name} {metric}: {value} > {baseline_value}')
+            elif metric in MEASURED_METRICS and change > tolerance:
+                status = 'slower'
+            rows.append((name, metric, baseline_value, value, f'{change:+.0%} {status}'.strip()))
+    return rows, regressions
+
+
+def _format_value(value):
+    if value is None:
+        return '-'
+    if isinstance(value, int):
+        return str(value)
+    return f'{value:.4f}'
+
+
+def print_report(rows):
+    header = ('benchmark', 'metric', 'baseline', 'current', 'change')
+    lines = [header] + [
+        (name, metric, _format_value(baseline), _format_value(current), change)
+        for name, metric, baseline, current, change in rows
+    ]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    for line in lines:
+        print('  '.join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m test.benchmark',
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        '--benchmark',
+        action='append',
+        choices=sorted(BENCHMARKS),
+        help='benchmark to run (all by default); can be given many times',
+    )
+    parser.add_argument('--cold-runs', type=int, default=5)
+    parser.add_argument('--warm-runs', type=int, default=20)
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.2,
+        help='relative difference of timings marked as slower, 0.2 is 20%%',
+    )
+    parser.add_argument('--baseline', type=pathlib.Path, default=BASELINE_PATH)
+    parser.add_argument('--output', type=pathlib.Path, help='file to store the results in')
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmark or list(BENCHMARKS), args.cold_runs, args.warm_runs)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=4, sort_keys=True) + '\n')
+
+    baseline = None
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    rows, regressions = compare(results, baseline, args.tolerance)
+    print_report(rows)
+
+    if args.save:
+        baseline = get_baseline(results)
+        args.baseline.write_text(json.dumps(baseline, indent=4, sort_keys=True) + '\n')
+        print(f'baseline saved to {args.baseline}')
+        return 0
+    if regressions:
+        print('\nRegressions (compared to the baseline):')
+        for regression in regressions:
+            print(f'  {regression}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
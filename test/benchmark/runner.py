@@ -0,0 +1,202 @@
+######################################################################
+#
+# File: test/benchmark/runner.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+"""
+Runs a single benchmarked command (a number of times) against a simulated B2 server.
+
+Meant to be run in a fresh process, started by ``python -m test.benchmark``; prints a JSON
+object with the measurements.
+"""
+
+import argparse
+import io
+import json
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Arguments of the benchmarked commands; `{file_id}` and `{local_file}` are replaced
+# with a file uploaded to `my-bucket` and a 1 KB local file, respectively, and `{snapshot_file}`
+# with a snapshot of `my-bucket` with `FILES_IN_SNAPSHOT` files (which measures the throughput
+# of printing a long listing, since listing a local snapshot is much faster than listing B2).
+BENCHMARKS = {
+    'version': ['version'],
+    'help': ['--help'],
+    'ls': ['ls', 'my-bucket'],
+    'ls-long-snapshot':
+        [
+            'ls', '--long', '--recursive', '--fromSnapshot', '--snapshotFile', '{snapshot_file}',
+            'my-bucket'
+        ],
+    'get-file-info': ['get-file-info', '{file_id}'],
+    'upload-file': ['upload-file', '--noProgress', 'my-bucket', '{local_file}', 'uploaded'],
+}
+
+FILES_IN_BUCKET = 100
+FILES_IN_SNAPSHOT = 20000
+
+
+def _get_peak_rss_mib():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+class ApiCallCounter:
+    """
+    Counts calls of the B2 API (methods of the raw API) made by commands.
+    """
+
+    def __init__(self, raw_api):
+        from b2sdk.raw_api import AbstractRawApi
+
+        self.count = 0
+        for name in AbstractRawApi.__abstractmethods__:
+            setattr(raw_api, name, self._counted(getattr(raw_api, name)))
+
+    def _counted(self, method):
+        def counted_method(*args, **kwargs):
+            self.count += 1
+            return method(*args, **kwargs)
+
+        return counted_method
+
+
+def _make_simulated_api(temp_dir):
+    from b2sdk.v2 import B2Api, B2HttpApiConfig, RawSimulator, StubAccountInfo, UploadSourceBytes
+
+    api = B2Api(StubAccountInfo(), None, api_config=B2HttpApiConfig(_raw_api_class=RawSimulator))
+    account_id, master_key = api.session.raw_api.create_account()
+    api.authorize_account('production', account_id, master_key)
+    bucket = api.create_bucket('my-bucket', 'allPublic')
+    for i in range(FILES_IN_BUCKET):
+        file_version = bucket.upload(UploadSourceBytes(b'x' * 1024), f'file{i:03}')
+
+    local_file = os.path.join(temp_dir, 'local_file')
+    with open(local_file, 'wb') as f:
+        f.write(b'x' * 1024)
+    return api, {'file_id': file_version.id_, 'local_file': local_file}
+
+
+def _make_snapshot(api, temp_dir):
+    from b2._cli.snapshot import BucketSnapshot
+
+    bucket = api.get_bucket_by_name('my-bucket')
+    snapshot_file = os.path.join(temp_dir, 'snapshot.sqlite')
+    upload_timestamp = 1_600_000_000_000
+    file_versions = (
+        api.file_version_factory.from_api_response(
+            {
+                'accountId': api.account_info.get_account_id(),
+                'bucketId': bucket.id_,
+                'fileId': f'id{i:08}',
+                'fileName': f'folder{i // 1000:03}/file{i:08}.txt',
+                'size': 1024 + i,
+                'contentSha1': f'{i:040x}',
+                # a few files per second, like in a bucket written to by a busy application
+                'uploadTimestamp': upload_timestamp + i * 250,
+                'action': 'upload',
+                'fileRetention': {
+                    'isClientAuthorizedToRead': False,
+                    'value': None
+                },
+                'legalHold': {
+                    'isClientAuthorizedToRead': False,
+                    'value': None
+                },
+            }
+        ) for i in range(FILES_IN_SNAPSHOT)
+    )
+    with BucketSnapshot.create_or_open(
+        pathlib.Path(snapshot_file), api.account_info.get_account_id(), bucket.id_, bucket.name
+    ) as snapshot:
+        snapshot.refresh(file_versions)
+    return snapshot_file
+
+
+def _run(console_tool_class, api, argv, api_call_counter):
+    """
+    Run the command, and return the time it took and the number of B2 API calls it made.
+    """
+    api_calls_before = api_call_counter.count
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    start = time.perf_counter()
+    # help is printed by argparse directly to sys.stdout
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            status = console_tool_class(api, stdout, stderr).run_command(argv)
+        except SystemExit as e:
+            status = e.code
+    elapsed = time.perf_counter() - start
+    if status:
+        raise RuntimeError(f'{argv} failed with status {status}: {stderr.getvalue()}')
+    return elapsed, api_call_counter.count - api_calls_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--runs', type=int, default=1)
+    parser.add_argument(
+        '--launched-at', type=float, help='time.time() of starting this process, to measure it'
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from b2.console_tool import ConsoleTool
+    import_s = time.perf_counter() - start
+    import_modules = len(sys.modules)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        setup_start = time.perf_counter()
+        api, placeholders = _make_simulated_api(temp_dir)
+        if any('{snapshot_file}' in arg for arg in BENCHMARKS[args.benchmark]):
+            placeholders['snapshot_file'] = _make_snapshot(api, temp_dir)
+        setup_s = time.perf_counter() - setup_start
+        api_call_counter = ApiCallCounter(api.session.raw_api)
+        argv = ['b2'] + [arg.format(**placeholders) for arg in BENCHMARKS[args.benchmark]]
+        runs = [_run(ConsoleTool, api, argv, api_call_counter)]
+        # from starting the interpreter till the end of the command, without the simulator setup
+        cold_wall_s = args.launched_at and time.time() - args.launched_at - setup_s
+        modules = len(sys.modules)
+        runs += [_run(ConsoleTool, api, argv, api_call_counter) for _ in range(args.runs - 1)]
+
+    timings = [elapsed for elapsed, _ in runs]
+    api_calls = [calls for _, calls in runs]
+    json.dump(
+        {
+            'cold_wall_s': cold_wall_s,
+            'import_s': import_s,
+            'import_modules': import_modules,
+            'modules': modules,
+            'first_run_s': timings[0],
+            'first_run_api_calls': api_calls[0],
+            # the first run pays for lazy imports and building caches
+            'next_runs_s': statistics.median(timings[1:]) if len(timings) > 1 else None,
+            'next_runs_api_calls': max(api_calls[1:]) if len(api_calls) > 1 else None,
+            'peak_rss_mib': _get_peak_rss_mib(),
+        },
+        sys.stdout,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -54,7 +54,7 @@ def b2_in_path(tmp_path_factory):
             f"#!{sys.executable}\n"
             "import sys\n"
             f"sys.path.insert(0, {os.getcwd()!r})\n"  # ensure relative imports work even if command is run in different directory
-            "from b2.console_tool import main\n"
+            "from b2._cli.entry_point import main\n"
             "main()\n"
         )
 
@@ -2571,3 +2571,21 @@ def test_cut(b2_tool, bucket_name):
                 len(file_data),
             )
         )
+
+
+def test_ls_versions_continuation_after_removed_version(b2_tool, bucket_name):
+    # B2 lists from the position of a version which is gone, which the resumed ls relies on
+    for _ in range(3):
+        b2_tool.should_succeed_json(
+            ['upload-file', '--noProgress', '--quiet', bucket_name, 'README.md', 'a']
+        )
+    newest, middle, oldest = b2_tool.list_file_versions(bucket_name)
+    b2_tool.should_succeed(['delete-file-version', 'a', middle['fileId']])
+
+    listed = b2_tool.should_succeed_json(
+        [
+            'ls', '--json', '--recursive', '--versions', '--startAfter', 'a', '--startAfterFileId',
+            middle['fileId'], bucket_name
+        ]
+    )
+    assert [file_version['fileId'] for file_version in listed] == [oldest['fileId']]
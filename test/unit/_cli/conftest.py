@@ -0,0 +1,47 @@
+######################################################################
+#
+# File: test/unit/_cli/conftest.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import pytest
+from b2sdk.v2 import B2Api, B2HttpApiConfig, RawSimulator, StubAccountInfo
+
+FILE_NAMES = [
+    'a',
+    'a-b',
+    'b/1',
+    'b/2/1',
+    'b/2/2',
+    'b/2/3',
+    'b/3',
+    'b0',
+    'c/1',
+    'c/2',
+    'c/3',
+    'c/4',
+    'c/5',
+    'd/e/f/1',
+    'd/e/f/2',
+    'd/e/f/3',
+    'd/e/f/4',
+    'd/e/f/5',
+    'd/e/f/6',
+    'd/e/f/7',
+    'z',
+]
+
+
+@pytest.fixture
+def bucket():
+    api = B2Api(StubAccountInfo(), None, api_config=B2HttpApiConfig(_raw_api_class=RawSimulator))
+    api.authorize_account('production', *api.session.raw_api.create_account())
+    bucket = api.create_bucket('bucket', 'allPrivate')
+    for file_name in FILE_NAMES:
+        bucket.upload_bytes(b'data', file_name)
+    bucket.upload_bytes(b'new data', 'c/3')
+    bucket.hide_file('b/2/2')
+    return bucket
@@ -0,0 +1,110 @@
+######################################################################
+#
+# File: test/unit/_cli/test_adaptive_concurrency.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import threading
+
+import pytest
+
+from b2._cli.adaptive_concurrency import AimdConcurrency
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _run_round(concurrency, clock, latency=0.1, throttled=()):
+    """
+    Run as many operations as the limit allows, all started at once, and return their count.
+    """
+    count = concurrency.limit
+    started = clock()
+    for _ in range(count):
+        concurrency.acquire()
+    clock.now += latency
+    for index in range(count):
+        concurrency.release(started, throttled=index in throttled)
+    return count
+
+
+def test_slow_start_then_additive_increase(clock):
+    concurrency = AimdConcurrency(maximum=100, clock=clock)
+    assert [_run_round(concurrency, clock) for _ in range(4)] == [1, 2, 4, 8]
+
+    _run_round(concurrency, clock, throttled={0, 1, 2})
+    assert (concurrency.limit, concurrency.decreases) == (8, 1)
+    # after the back-off, the limit grows by (a little less than) one per round
+    assert [_run_round(concurrency, clock) for _ in range(4)] == [8, 8, 9, 10]
+    assert concurrency.peak == 16
+
+
+def test_limits(clock):
+    concurrency = AimdConcurrency(maximum=5, initial=2, clock=clock)
+    for _ in range(5):
+        _run_round(concurrency, clock)
+    assert concurrency.limit == 5
+
+    for _ in range(5):
+        _run_round(concurrency, clock, throttled={0})
+    assert concurrency.limit == 1
+
+
+def test_latency_increase_backs_off(clock):
+    concurrency = AimdConcurrency(maximum=100, initial=8, clock=clock)
+    _run_round(concurrency, clock, latency=0.1)
+    assert concurrency.limit == 16
+
+    _run_round(concurrency, clock, latency=1.0)
+    assert (concurrency.limit, concurrency.decreases) == (8, 1)
+
+
+def test_latency_at_minimum_becomes_normal(clock):
+    concurrency = AimdConcurrency(maximum=100, clock=clock)
+    _run_round(concurrency, clock, latency=0.1)
+    _run_round(concurrency, clock, throttled={0})
+    assert concurrency.limit == 1
+
+    # the server got slower for good; nothing to back off from at the minimum
+    _run_round(concurrency, clock, latency=1.0)
+    assert (concurrency.limit, concurrency.decreases) == (2, 1)
+
+
+def test_acquire_waits_for_release(clock):
+    concurrency = AimdConcurrency(maximum=1, clock=clock)
+    concurrency.acquire()
+    acquired = threading.Event()
+
+    def acquire():
+        concurrency.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.05)
+    concurrency.release(clock())
+    assert acquired.wait(5)
+    thread.join()
+
+
+def test_cancel_frees_the_operation_without_measuring_it(clock):
+    concurrency = AimdConcurrency(maximum=100, clock=clock)
+    concurrency.acquire()
+    concurrency.cancel()
+    assert (concurrency.limit, concurrency.decreases) == (1, 0)
+    # the canceled operation is not in flight any more
+    assert _run_round(concurrency, clock) == 1
+    assert concurrency.limit == 2
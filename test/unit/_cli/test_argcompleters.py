@@ -0,0 +1,98 @@
+######################################################################
+#
+# File: test/unit/_cli/test_argcompleters.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import argparse
+import time
+
+import pytest
+
+from b2._cli import argcompleters
+from b2._cli.argcompleters import bucket_name_completer, file_name_completer
+from b2._cli.completion_cache import CompletionCache
+from b2._cli.const import B2_COMPLETION_CACHE_TTL_ENV_VAR
+
+
+@pytest.fixture
+def api_calls(monkeypatch):
+    calls = []
+
+    def list_(profile, key):
+        calls.append((profile, key))
+        return [f'{key[0]}-{len(calls)}']
+
+    monkeypatch.setattr(argcompleters, '_list', list_)
+    return calls
+
+
+@pytest.fixture
+def background_refreshes(monkeypatch):
+    refreshes = []
+    monkeypatch.setattr(
+        argcompleters, '_refresh_in_background', lambda cache, key: refreshes.append(key)
+    )
+    return refreshes
+
+
+def _args(**kwargs):
+    return argparse.Namespace(profile=None, **kwargs)
+
+
+def test_bucket_names_are_cached(api_calls):
+    assert bucket_name_completer(prefix='', parsed_args=_args()) == ['_list_bucket_names-1']
+    assert bucket_name_completer(prefix='', parsed_args=_args()) == ['_list_bucket_names-1']
+    assert api_calls == [(None, ['_list_bucket_names'])]
+
+
+def test_file_names_are_cached_per_bucket_and_folder(api_calls):
+    for _ in range(2):
+        file_name_completer(prefix='', parsed_args=_args(bucketName='bucket1', folderName=None))
+        file_name_completer(prefix='', parsed_args=_args(bucketName='bucket1', folderName='dir/'))
+        file_name_completer(prefix='', parsed_args=_args(bucketName='bucket2', folderName=None))
+
+    assert api_calls == [
+        (None, ['_list_file_names', 'bucket1', '']),
+        (None, ['_list_file_names', 'bucket1', 'dir/']),
+        (None, ['_list_file_names', 'bucket2', '']),
+    ]
+
+
+def test_cache_is_per_profile(api_calls):
+    bucket_name_completer(prefix='', parsed_args=argparse.Namespace(profile='a'))
+    bucket_name_completer(prefix='', parsed_args=argparse.Namespace(profile='b'))
+    bucket_name_completer(prefix='', parsed_args=argparse.Namespace(profile='a'))
+    assert [profile for profile, _ in api_calls] == ['a', 'b']
+
+
+def test_stale_completions_are_refreshed_in_background(
+    api_calls, background_refreshes, monkeypatch
+):
+    bucket_name_completer(prefix='', parsed_args=_args())
+    monkeypatch.setattr(time, 'time', lambda real_time=time.time: real_time() + 3600)
+
+    assert bucket_name_completer(prefix='', parsed_args=_args()) == ['_list_bucket_names-1']
+    assert len(api_calls) == 1
+    assert background_refreshes == [['_list_bucket_names']]
+
+
+def test_zero_ttl_disables_cache(api_calls, monkeypatch):
+    monkeypatch.setenv(B2_COMPLETION_CACHE_TTL_ENV_VAR, '0')
+    bucket_name_completer(prefix='', parsed_args=_args())
+    bucket_name_completer(prefix='', parsed_args=_args())
+    assert len(api_calls) == 2
+    assert list(CompletionCache(None).cache_dir.iterdir()) == []
+
+
+def test_refresh_is_claimed_once():
+    cache = CompletionCache('profile')
+    key = ['_list_bucket_names']
+    assert cache.claim_refresh(key)
+    assert not cache.claim_refresh(key)
+
+    cache.set(key, ['bucket'])
+    assert cache.claim_refresh(key)
@@ -0,0 +1,120 @@
+######################################################################
+#
+# File: test/unit/_cli/test_autocomplete_cache.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from b2._cli import autocomplete_cache
+from b2._cli.argcompleters import bucket_name_completer, file_name_completer
+from b2._cli.autocomplete_cache import build_completion_table, parser_from_completion_table
+from b2.console_tool import B2
+
+
+@pytest.fixture(scope='module')
+def table():
+    # make sure the table survives a round trip through JSON
+    return json.loads(json.dumps(build_completion_table(B2.get_parser())))
+
+
+def test_table_contains_commands_and_aliases(table):
+    assert table['commands']['get-bucket']['aliases'] == ['get_bucket']
+    assert table['commands']['ls']['aliases'] == []
+    assert 'get_bucket' not in table['commands']
+
+
+def test_parser_from_table_parses_like_the_full_parser(table):
+    argv = ['ls', '--recursive', '--profile', 'my-profile', 'my-bucket', 'folder']
+    full_args = vars(B2.get_parser().parse_args(argv))
+    table_args = vars(parser_from_completion_table(table, prog='b2').parse_args(argv))
+
+    del full_args['command_class']
+    assert table_args == full_args
+
+
+def test_parser_from_table_has_completers(table):
+    parser = parser_from_completion_table(table, prog='b2')
+    [subparsers_action] = [action for action in parser._actions if action.dest == 'command']
+    ls_actions = {action.dest: action for action in subparsers_action.choices['ls']._actions}
+
+    assert ls_actions['bucketName'].completer is bucket_name_completer
+    assert ls_actions['folderName'].completer is file_name_completer
+
+
+@pytest.fixture
+def complete(tmp_path, cache_dir):
+    output_file = tmp_path / 'completions'
+
+    def complete_(comp_line, python_flags=()):
+        env = dict(os.environ)
+        env.update(
+            _ARGCOMPLETE='1',
+            _ARGCOMPLETE_IFS='\n',
+            _ARGCOMPLETE_STDOUT_FILENAME=str(output_file),
+            COMP_LINE=comp_line,
+            COMP_POINT=str(len(comp_line)),
+        )
+        result = subprocess.run(
+            [sys.executable, *python_flags, '-m', 'b2'],
+            env=env,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        return sorted(output_file.read_text().split()), result.stderr
+
+    return complete_
+
+
+def test_completion_from_cache(complete, cache_dir):
+    expected = ['download-file-by-id', 'download-file-by-name']
+
+    completions, _ = complete('b2 download-')
+    assert completions == expected
+    assert list((cache_dir / 'autocomplete').glob('commands-*.json'))
+
+    completions, import_log = complete('b2 download-', python_flags=['-X', 'importtime'])
+    assert completions == expected
+    assert 'b2sdk' not in import_log
+    assert 'b2.console_tool' not in import_log
+
+    completions, _ = complete('b2 ls --rec')
+    assert completions == ['--recursive']
+
+
+def test_table_is_stored_anew_when_commands_change(tmp_path, cache_dir, monkeypatch):
+    command_module = tmp_path / 'console_tool.py'
+    command_module.write_text('# commands')
+    monkeypatch.setattr(autocomplete_cache, '_COMMAND_MODULES', [command_module])
+    parser = B2.get_parser()
+
+    autocomplete_cache.save_completion_table(parser)
+    [old_table_path] = (cache_dir / 'autocomplete').glob('commands-*.json')
+    assert autocomplete_cache._get_table_path() == old_table_path
+
+    # the same version, with other commands
+    command_module.write_text('# more commands')
+    new_table_path = autocomplete_cache._get_table_path()
+    assert new_table_path != old_table_path
+
+    autocomplete_cache.save_completion_table(parser)
+    assert list((cache_dir / 'autocomplete').glob('commands-*.json')) == [new_table_path]
+
+
+def test_stale_table_is_rewritten(cache_dir):
+    parser = B2.get_parser()
+    table_path = autocomplete_cache._get_table_path()
+    table_path.parent.mkdir(parents=True, exist_ok=True)
+    table_path.write_text(json.dumps({'format': autocomplete_cache.TABLE_FORMAT_VERSION}))
+
+    autocomplete_cache.save_completion_table(parser)
+    assert json.loads(table_path.read_text()) == build_completion_table(parser)
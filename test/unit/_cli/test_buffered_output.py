@@ -0,0 +1,86 @@
+######################################################################
+#
+# File: test/unit/_cli/test_buffered_output.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import io
+from unittest import mock
+
+import pytest
+
+from b2._cli.buffered_output import BufferedOutput, get_buffering_policy
+from b2._cli.const import B2_OUTPUT_BUFFERING_ENV_VAR
+
+
+class Stream(io.StringIO):
+    def __init__(self, is_terminal=False):
+        super().__init__()
+        self.is_terminal = is_terminal
+        self.writes = []
+
+    def isatty(self):
+        return self.is_terminal
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+@pytest.mark.parametrize(
+    'is_terminal,policy,env_policy,expected',
+    [
+        (True, None, None, 'line'),
+        (False, None, None, 'block'),
+        (True, None, 'auto', 'line'),
+        (True, None, 'block', 'block'),
+        (False, None, 'line', 'line'),
+        (False, 'line', 'block', 'line'),
+    ],
+)
+def test_get_buffering_policy(monkeypatch, is_terminal, policy, env_policy, expected):
+    if env_policy is None:
+        monkeypatch.delenv(B2_OUTPUT_BUFFERING_ENV_VAR, raising=False)
+    else:
+        monkeypatch.setenv(B2_OUTPUT_BUFFERING_ENV_VAR, env_policy)
+    assert get_buffering_policy(Stream(is_terminal), policy) == expected
+
+
+def test_get_buffering_policy_of_invalid_policy():
+    with pytest.raises(ValueError, match="should be one of auto, line, block, not 'full'"):
+        get_buffering_policy(Stream(), 'full')
+
+
+def test_block_buffering():
+    stream = Stream()
+    output = BufferedOutput(stream, 'block', block_size=10)
+    for line in ['1234\n', '5678\n', 'abc\n']:
+        output.write(line)
+    assert stream.writes == ['1234\n5678\n']
+    output.flush()
+    assert stream.writes == ['1234\n5678\n', 'abc\n']
+    assert stream.getvalue() == '1234\n5678\nabc\n'
+
+
+def test_line_buffering():
+    stream = Stream(is_terminal=True)
+    output = BufferedOutput(stream)
+    with mock.patch.object(stream, 'flush') as flush:
+        output.write('a')
+        output.write('b\n')
+        output.write('c\nd')
+    assert stream.writes == ['ab\n', 'c\nd']
+    assert flush.call_count == 2
+
+
+def test_unencodable_text_is_rejected_when_written():
+    stream = io.TextIOWrapper(io.BytesIO(), encoding='ascii')
+    output = BufferedOutput(stream, 'block')
+    output.write('a\n')
+    with pytest.raises(UnicodeEncodeError):
+        output.write('ą\n')
+    output.flush()
+    assert stream.buffer.getvalue() == b'a\n'
@@ -0,0 +1,204 @@
+######################################################################
+#
+# File: test/unit/_cli/test_daemon.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from b2._cli.const import B2_CACHE_DIR_ENV_VAR, B2_DAEMON_SOCKET_ENV_VAR
+from b2._cli.daemon import run_in_daemon
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='requires Unix sockets')
+
+SLOW_COMMAND_SERVER_SCRIPT = """
+import sys, time
+from pathlib import Path
+from b2._cli.daemon import DaemonServer
+
+def run_command(argv, stdin, stdout, stderr):
+    try:
+        print('started', file=stdout, flush=True)
+        time.sleep(30)
+    except KeyboardInterrupt:
+        print('interrupted', file=stderr)
+        return 130
+    return 0
+
+DaemonServer(Path(sys.argv[1]), run_command, idle_timeout=30).serve_forever()
+"""
+
+OTHER_VERSION_SERVER_SCRIPT = """
+import sys
+from pathlib import Path
+from b2._cli import daemon
+
+def run_command(argv, stdin, stdout, stderr):
+    print('run by the daemon', file=stdout)
+    return 0
+
+daemon.VERSION = 'other'
+daemon.DaemonServer(Path(sys.argv[1]), run_command, idle_timeout=30).serve_forever()
+"""
+
+
+def _wait_for_socket(socket_path, process):
+    for _ in range(200):
+        if socket_path.exists():
+            return
+        assert process.poll() is None, process.communicate()
+        time.sleep(0.05)
+    raise TimeoutError(f'{socket_path} not created')
+
+
+@pytest.fixture
+def daemon_env(tmp_path):
+    env = dict(os.environ)
+    env['B2_ACCOUNT_INFO'] = str(tmp_path / 'account_info')
+    env[B2_DAEMON_SOCKET_ENV_VAR] = str(tmp_path / 'daemon.sock')
+    env.pop('_ARGCOMPLETE', None)
+    return env
+
+
+@pytest.fixture
+def daemon(daemon_env, tmp_path):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'b2', 'daemon', '--idleTimeout', '60'],
+        env=daemon_env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    _wait_for_socket(tmp_path / 'daemon.sock', process)
+    yield process
+    process.terminate()
+    process.wait()
+
+
+def _run_b2(env, *argv, python_flags=()):
+    return subprocess.run(
+        [sys.executable, *python_flags, '-m', 'b2', *argv],
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+    )
+
+
+@pytest.mark.parametrize(
+    'argv',
+    [
+        ['version'],
+        ['get-bucket', 'my-bucket'],  # not authorized
+        ['ls'],  # invalid arguments
+        ['no-such-command'],
+    ],
+)
+def test_output_same_as_in_process(daemon, daemon_env, argv):
+    in_process_env = dict(daemon_env)
+    del in_process_env[B2_DAEMON_SOCKET_ENV_VAR]
+    expected = _run_b2(in_process_env, *argv)
+
+    result = _run_b2(daemon_env, *argv)
+
+    assert (result.returncode, result.stdout, result.stderr) == \
+        (expected.returncode, expected.stdout, expected.stderr)
+
+
+def test_client_does_not_load_console_tool(daemon, daemon_env):
+    result = _run_b2(daemon_env, 'version', python_flags=['-X', 'importtime'])
+    assert result.stdout.startswith('b2 command line tool, version')
+    assert 'b2sdk' not in result.stderr
+    assert 'b2.console_tool' not in result.stderr
+
+
+def test_commands_not_run_in_daemon_fall_back_to_client(daemon, daemon_env):
+    result = _run_b2(daemon_env, 'daemon')
+    assert result.returncode == 1
+    assert 'b2 daemon is already running' in result.stderr
+
+
+def test_stale_socket(tmp_path, monkeypatch):
+    socket_path = tmp_path / 'daemon.sock'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(str(socket_path))
+    monkeypatch.setenv(B2_DAEMON_SOCKET_ENV_VAR, str(socket_path))
+
+    assert run_in_daemon(['b2', 'version']) is None
+
+
+def test_client_does_not_create_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv(B2_DAEMON_SOCKET_ENV_VAR, raising=False)
+    monkeypatch.setenv(B2_CACHE_DIR_ENV_VAR, str(tmp_path / 'cache'))
+
+    assert run_in_daemon(['b2', 'version']) is None
+    assert not (tmp_path / 'cache').exists()
+
+
+def _start_server(script, daemon_env, socket_path):
+    server = subprocess.Popen([sys.executable, '-c', script, str(socket_path)], env=daemon_env)
+    _wait_for_socket(socket_path, server)
+    return server
+
+
+def test_daemon_of_another_version_is_not_used(daemon_env, tmp_path):
+    server = _start_server(OTHER_VERSION_SERVER_SCRIPT, daemon_env, tmp_path / 'daemon.sock')
+    try:
+        result = _run_b2(daemon_env, 'version')
+        assert result.returncode == 0
+        assert result.stdout.startswith('b2 command line tool, version')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_interrupt_is_forwarded(daemon_env, tmp_path):
+    server = _start_server(SLOW_COMMAND_SERVER_SCRIPT, daemon_env, tmp_path / 'daemon.sock')
+    try:
+        client = subprocess.Popen(
+            [sys.executable, '-m', 'b2', 'version'],
+            env=daemon_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        assert client.stdout.readline() == 'started\n'
+        client.send_signal(signal.SIGINT)
+        stdout, stderr = client.communicate(timeout=10)
+        assert (client.returncode, stderr) == (130, 'interrupted\n')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_busy_daemon_lets_client_run_in_process(daemon_env, tmp_path):
+    server = _start_server(SLOW_COMMAND_SERVER_SCRIPT, daemon_env, tmp_path / 'daemon.sock')
+    try:
+        busy_client = subprocess.Popen(
+            [sys.executable, '-m', 'b2', 'version'],
+            env=daemon_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        assert busy_client.stdout.readline() == 'started\n'
+
+        result = _run_b2(daemon_env, 'version')
+        assert result.returncode == 0
+        assert result.stdout.startswith('b2 command line tool, version')
+
+        busy_client.send_signal(signal.SIGINT)
+        busy_client.communicate(timeout=10)
+        assert busy_client.returncode == 130
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,68 @@
+######################################################################
+#
+# File: test/unit/_cli/test_du.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import pytest
+
+from b2._cli.du import Usage, summarize_usage
+from b2._cli.sharded_listing import ShardedLister
+
+
+def _summarize(bucket, prefix='', depth=1):
+    listing = bucket.ls(prefix, latest_only=False, recursive=True)
+    return [
+        (folder, usage.as_dict()) for folder, usage in
+        summarize_usage((file_version for file_version, _ in listing), prefix, depth)
+    ]
+
+
+def _usage(*counts):
+    return Usage(*counts).as_dict()
+
+
+def test_summarize_usage(bucket):
+    assert _summarize(bucket) == [
+        ('b/', _usage(4, 5, 1, 20)),
+        ('c/', _usage(5, 6, 0, 28)),
+        ('d/', _usage(7, 7, 0, 28)),
+        ('', _usage(20, 22, 1, 92)),
+    ]
+
+
+def test_summarize_usage_deeper(bucket):
+    assert _summarize(bucket, depth=3) == [
+        ('b/2/', _usage(2, 3, 1, 12)),
+        ('b/', _usage(4, 5, 1, 20)),
+        ('c/', _usage(5, 6, 0, 28)),
+        ('d/e/f/', _usage(7, 7, 0, 28)),
+        ('d/e/', _usage(7, 7, 0, 28)),
+        ('d/', _usage(7, 7, 0, 28)),
+        ('', _usage(20, 22, 1, 92)),
+    ]
+
+
+@pytest.mark.parametrize('depth', [0, 1, 5])
+def test_summarize_usage_of_folder(bucket, depth):
+    expected = [('b/2/', _usage(2, 3, 1, 12)), ('b/', _usage(4, 5, 1, 20))]
+    assert _summarize(bucket, 'b/', depth) == expected[1 - min(depth, 1):]
+
+
+def test_summarize_usage_of_empty_listing():
+    assert [('a/', Usage())] == list(summarize_usage([], 'a/'))
+
+
+def test_summarize_usage_of_sharded_listing(bucket):
+    listing = ShardedLister(bucket, 3, fetch_count=2).ls(latest_only=False)
+    usages = summarize_usage((file_version for file_version, _ in listing), depth=3)
+    assert [(folder, usage.as_dict()) for folder, usage in usages] == _summarize(bucket, depth=3)
+
+
+def test_summarize_usage_with_unfinished_large_file(bucket):
+    # the unfinished large file is newer, so it is listed before the uploaded version of 'c/2'
+    bucket.api.session.start_large_file(bucket.id_, 'c/2', 'b2/x-auto', {})
+    assert _summarize(bucket, 'c/', 0) == [('c/', _usage(5, 6, 0, 28))]
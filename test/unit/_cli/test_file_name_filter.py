@@ -0,0 +1,83 @@
+######################################################################
+#
+# File: test/unit/_cli/test_file_name_filter.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import re
+
+import pytest
+
+from b2._cli.file_name_filter import FileNameFilter, get_regex_literal_prefix
+
+from .conftest import FILE_NAMES
+
+
+@pytest.mark.parametrize(
+    'regex,prefix',
+    [
+        ('', ''),
+        ('logs/', 'logs/'),
+        ('^logs/.*', 'logs/'),
+        (r'logs/2023\.01', 'logs/2023.01'),
+        ('logs/a?', 'logs/'),
+        ('logs/a*', 'logs/'),
+        ('logs/a{2}', 'logs/'),
+        ('logs/a+', 'logs/a'),
+        (r'logs/\d', 'logs/'),
+        ('logs/[ab]', 'logs/'),
+        ('logs/(a|b)', ''),
+        ('(?i)logs', ''),
+    ],
+)
+def test_get_regex_literal_prefix(regex, prefix):
+    assert get_regex_literal_prefix(regex) == prefix
+
+
+@pytest.mark.parametrize(
+    'kwargs,listing_prefix',
+    [
+        (dict(), ''),
+        (dict(patterns=['d/e/f/[12]', 'd/e/f/7']), 'd/e/f/'),
+        (dict(patterns=['b/*', 'c/*']), ''),
+        (dict(patterns=['*']), ''),
+        (dict(include_regexes=['c/[12]', 'c/3']), 'c/'),
+        (dict(patterns=['*/1'], include_regexes=['d/e']), 'd/e'),
+        (dict(exclude_regexes=['a']), ''),
+        (dict(patterns=['b/*'], prefix='b/2/'), 'b/2/'),
+    ],
+)
+def test_listing_prefix(kwargs, listing_prefix):
+    file_name_filter = FileNameFilter(**kwargs)
+    assert file_name_filter.listing_prefix == listing_prefix
+    # every selected name has the prefix
+    assert all(
+        file_name.startswith(listing_prefix)
+        for file_name in FILE_NAMES if file_name_filter.matches(file_name)
+    )
+
+
+@pytest.mark.parametrize(
+    'kwargs,expected',
+    [
+        (dict(patterns=['b/?', 'c/[24]']), ['b/1', 'b/3', 'c/2', 'c/4']),
+        (dict(patterns=['*/1']), ['b/1', 'b/2/1', 'c/1', 'd/e/f/1']),
+        (dict(include_regexes=['a', 'z']), ['a', 'a-b', 'z']),
+        (dict(include_regexes=[r'b/\d$'], exclude_regexes=['b/1']), ['b/3']),
+        (dict(patterns=['*'], exclude_regexes=['.*/', 'a']), ['b0', 'z']),
+        (dict(include_regexes=['.*3'], prefix='b/'), ['b/2/3', 'b/3']),
+    ],
+)
+def test_matches(kwargs, expected):
+    file_name_filter = FileNameFilter(**kwargs)
+    assert [
+        file_name for file_name in FILE_NAMES if file_name_filter.matches(file_name)
+    ] == expected
+
+
+def test_invalid_regex():
+    with pytest.raises(re.error):
+        FileNameFilter(exclude_regexes=['('])
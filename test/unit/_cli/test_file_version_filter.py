@@ -0,0 +1,73 @@
+######################################################################
+#
+# File: test/unit/_cli/test_file_version_filter.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import pytest
+
+from b2._cli.file_version_filter import FileVersionFilter
+
+
+@pytest.fixture
+def file_versions(bucket):
+    bucket.upload_bytes(b'image', 'e/1.png', content_type='image/png')
+    bucket.upload_bytes(
+        b'old image',
+        'e/2.jpg',
+        content_type='image/jpeg',
+        file_infos={'src_last_modified_millis': '1000'},
+    )
+    bucket.upload_bytes(b'text', 'e/3.txt', content_type='text/plain')
+    return [file_version for file_version, _ in bucket.ls(latest_only=False, recursive=True)]
+
+
+def _selected(file_versions, **kwargs):
+    file_version_filter = FileVersionFilter(**kwargs)
+    return [
+        (file_version.file_name, file_version.action)
+        for file_version in file_versions if file_version_filter.matches(file_version)
+    ]
+
+
+def test_size(file_versions):
+    assert _selected(file_versions, now_millis=0, min_size=5) == [
+        ('c/3', 'upload'),
+        ('e/1.png', 'upload'),
+        ('e/2.jpg', 'upload'),
+    ]
+    assert _selected(file_versions, now_millis=0, min_size=6, max_size=8) == [('c/3', 'upload')]
+
+
+def test_age(file_versions):
+    upload_timestamps = {
+        file_version.file_name: file_version.upload_timestamp
+        for file_version in file_versions
+    }
+    now_millis = upload_timestamps['e/3.txt'] + 10
+    older_than_millis = now_millis - upload_timestamps['e/2.jpg']
+
+    assert _selected(file_versions, now_millis=now_millis,
+                     newer_than_millis=older_than_millis) == [('e/3.txt', 'upload')]
+    assert ('e/2.jpg', 'upload') not in _selected(
+        file_versions, now_millis=now_millis, older_than_millis=older_than_millis
+    )
+    # the source of e/2.jpg was modified at 1000
+    assert _selected(file_versions, now_millis=2000, older_than_millis=500,
+                     by_mod_time=True) == [('e/2.jpg', 'upload')]
+
+
+def test_action(file_versions):
+    assert _selected(file_versions, now_millis=0, actions=['hide']) == [('b/2/2', 'hide')]
+
+
+def test_content_type(file_versions):
+    selected = _selected(file_versions, now_millis=0, content_types=['image/*', 'text/plain'])
+    assert selected == [('e/1.png', 'upload'), ('e/2.jpg', 'upload'), ('e/3.txt', 'upload')]
+
+
+def test_everything_is_selected_without_conditions(file_versions):
+    assert len(_selected(file_versions, now_millis=0)) == len(file_versions)
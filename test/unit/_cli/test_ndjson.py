@@ -0,0 +1,61 @@
+######################################################################
+#
+# File: test/unit/_cli/test_ndjson.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import io
+import json
+
+import pytest
+
+from b2._cli.ndjson import NdjsonSyncReport, sync_action_record
+
+
+@pytest.mark.parametrize(
+    'message,action,file_name,note',
+    [
+        ('upload a b.txt', 'upload', 'a b.txt', None),
+        ('hide   a.txt', 'hide', 'a.txt', None),
+        ('dnload a.txt', 'download', 'a.txt', None),
+        ('copy a.txt', 'copy', 'a.txt', None),
+        ('delete a b.txt', 'delete', 'a b.txt', None),
+        ('delete a.txt ', 'delete', 'a.txt', None),
+        ('delete a.txt (old version)', 'delete', 'a.txt', 'old version'),
+        ('delete a.txt (hide marker)', 'delete', 'a.txt', 'hide marker'),
+    ],
+)
+def test_sync_action_record(message, action, file_name, note):
+    expected = {'action': action, 'fileName': file_name}
+    if note is not None:
+        expected['note'] = note
+    assert sync_action_record(message) == expected
+
+
+def test_sync_action_record_of_other_messages():
+    assert sync_action_record('b2_upload(a.txt): error') is None
+
+
+def test_ndjson_sync_report():
+    stdout = io.StringIO()
+    with NdjsonSyncReport(stdout) as reporter:
+        reporter.update_total(1)
+        reporter.print_completion('upload a.txt')
+        reporter.error('b2_upload(a.txt): error')
+        reporter.local_access_error('/b.txt')
+
+    assert [json.loads(line) for line in stdout.getvalue().splitlines()] == [
+        {
+            'action': 'upload',
+            'fileName': 'a.txt'
+        },
+        {
+            'error': 'b2_upload(a.txt): error'
+        },
+        {
+            'warning': 'WARNING: /b.txt could not be accessed (broken symlink?)'
+        },
+    ]
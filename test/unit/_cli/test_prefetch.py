@@ -0,0 +1,62 @@
+######################################################################
+#
+# File: test/unit/_cli/test_prefetch.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import threading
+
+import pytest
+
+from b2._cli.prefetch import prefetch
+
+
+def test_items_in_order():
+    assert list(prefetch(range(1000), max_items=7)) == list(range(1000))
+
+
+def test_listing_goes_ahead_of_consumer():
+    taken = []
+    all_buffered = threading.Event()
+
+    def listing():
+        for item in range(10):
+            taken.append(item)
+            if len(taken) == 4:
+                all_buffered.set()
+            yield item
+
+    items = prefetch(listing(), max_items=3)
+    assert next(items) == 0
+    # one item is consumed and three are buffered
+    assert all_buffered.wait(5)
+    assert list(items) == list(range(1, 10))
+
+
+def test_error_is_raised_to_consumer():
+    def listing():
+        yield 1
+        raise ValueError('listing failed')
+
+    items = prefetch(listing(), max_items=10)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match='listing failed'):
+        next(items)
+
+
+def test_closing_stops_listing():
+    closed = threading.Event()
+
+    def listing():
+        try:
+            yield from range(1000)
+        finally:
+            closed.set()
+
+    items = prefetch(listing(), max_items=2)
+    assert next(items) == 0
+    items.close()
+    assert closed.wait(5)
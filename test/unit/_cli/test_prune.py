@@ -0,0 +1,69 @@
+######################################################################
+#
+# File: test/unit/_cli/test_prune.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import pytest
+
+from b2._cli.prune import select_versions_to_prune
+
+
+@pytest.fixture
+def versioned_bucket(bucket):
+    for _ in range(3):
+        bucket.upload_bytes(b'more data', 'a')
+    bucket.upload_bytes(b'newest data', 'b/2/2')
+    bucket.hide_file('b/2/2')
+    return bucket
+
+
+def _pruned(bucket, **kwargs):
+    file_versions = (
+        file_version for file_version, _ in bucket.ls(latest_only=False, recursive=True)
+    )
+    return [
+        (file_version.file_name, file_version.action, file_version.size)
+        for file_version in select_versions_to_prune(file_versions, **kwargs)
+    ]
+
+
+@pytest.mark.parametrize(
+    'keep_versions,expected',
+    [
+        (
+            1,
+            [
+                ('a', 'upload', 9),
+                ('a', 'upload', 9),
+                ('a', 'upload', 4),
+                ('b/2/2', 'upload', 11),
+                ('b/2/2', 'hide', 0),
+                ('b/2/2', 'upload', 4),
+                ('c/3', 'upload', 4),
+            ],
+        ),
+        (3, [('a', 'upload', 4), ('b/2/2', 'upload', 4)]),
+        (4, []),
+    ],
+)
+def test_keep_versions(versioned_bucket, keep_versions, expected):
+    assert _pruned(versioned_bucket, keep_versions=keep_versions) == expected
+
+
+def test_purge_hidden(versioned_bucket):
+    assert _pruned(versioned_bucket, keep_versions=4, purge_hidden=True) == [
+        ('b/2/2', 'upload', 11),
+        ('b/2/2', 'hide', 0),
+        ('b/2/2', 'upload', 4),
+        # the hide marker which hides the file comes last
+        ('b/2/2', 'hide', 0),
+    ]
+
+
+def test_unfinished_large_files_are_left(bucket):
+    bucket.api.services.large_file.start_large_file(bucket.id_, 'c/3', 'b2/x-auto', {})
+    assert _pruned(bucket) == [('b/2/2', 'upload', 4), ('c/3', 'upload', 4)]
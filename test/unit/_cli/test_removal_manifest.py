@@ -0,0 +1,39 @@
+######################################################################
+#
+# File: test/unit/_cli/test_removal_manifest.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import pytest
+
+from b2._cli.removal_manifest import ManifestEntry, ManifestError, read_removal_manifest
+
+
+def test_read_removal_manifest():
+    lines = [
+        '# file versions to delete\n',
+        '\n',
+        'id1,a/b.txt\n',
+        'id2\r\n',
+        ' id3 ,name, with commas \n',
+        'id4,\n',
+        '   \n',
+        'id5,last line without a line break',
+    ]
+    assert list(read_removal_manifest(lines)) == [
+        ManifestEntry('id1', 'a/b.txt'),
+        ManifestEntry('id2'),
+        ManifestEntry('id3', 'name, with commas '),
+        ManifestEntry('id4'),
+        ManifestEntry('id5', 'last line without a line break'),
+    ]
+
+
+def test_read_removal_manifest_without_file_id():
+    entries = read_removal_manifest(['id1,a\n', '\n', ' ,b\n', 'id3,c\n'])
+    assert next(entries) == ManifestEntry('id1', 'a')
+    with pytest.raises(ManifestError, match='line 3 of the manifest has no file ID'):
+        next(entries)
@@ -0,0 +1,110 @@
+######################################################################
+#
+# File: test/unit/_cli/test_resumable_listing.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import pytest
+
+from b2._cli.resumable_listing import (
+    ListingPosition,
+    format_continuation,
+    get_entry_name,
+    skip_to_start,
+)
+
+
+def _versions(bucket):
+    return list(bucket.ls(latest_only=False, recursive=True))
+
+
+def _names(listing):
+    return [file_version.file_name for file_version, _ in listing]
+
+
+@pytest.mark.parametrize(
+    'kwargs,first',
+    [
+        (dict(), 'a'),
+        (dict(start_file_name='c/3'), 'c/3'),
+        (dict(start_file_name='c/35'), 'c/4'),
+        (dict(start_after='c/2'), 'c/3'),
+        (dict(start_after='c/3'), 'c/4'),
+        (dict(start_after='zz'), None),
+    ],
+)
+def test_skip_to_start(bucket, kwargs, first):
+    names = _names(skip_to_start(_versions(bucket), **kwargs))
+    assert names[:1] == ([first] if first else [])
+    assert names == sorted(names)
+
+
+def test_skip_to_start_after_file_id(bucket):
+    versions = _versions(bucket)
+    new_c_3, old_c_3 = (
+        file_version for file_version, _ in versions if file_version.file_name == 'c/3'
+    )
+    listing = skip_to_start(versions, start_after='c/3', start_after_file_id=new_c_3.id_)
+    assert next(listing)[0].id_ == old_c_3.id_
+
+    listing = skip_to_start(versions, start_after='c/3', start_after_file_id=old_c_3.id_)
+    assert next(listing)[0].file_name == 'c/4'
+
+
+def test_skip_to_start_after_file_id_which_is_gone(bucket):
+    versions = _versions(bucket)
+    new_c_3, old_c_3 = (
+        file_version for file_version, _ in versions if file_version.file_name == 'c/3'
+    )
+    versions = [entry for entry in versions if entry[0].id_ != new_c_3.id_]
+
+    listing = skip_to_start(
+        versions,
+        start_after='c/3',
+        start_after_file_id=new_c_3.id_,
+        start_after_upload_timestamp=new_c_3.upload_timestamp,
+    )
+    assert next(listing)[0].id_ == old_c_3.id_
+
+    # without the upload timestamp, the place of the version among the others is not known
+    listing = skip_to_start(versions, start_after='c/3', start_after_file_id=new_c_3.id_)
+    assert next(listing)[0].file_name == 'c/4'
+
+
+def test_skip_to_start_of_folders(bucket):
+    listing = skip_to_start(bucket.ls(recursive=False), start_after='b/')
+    assert [get_entry_name(entry) for entry in listing] == ['b0', 'c/', 'd/', 'z']
+
+
+def test_position(bucket):
+    position = ListingPosition()
+    listing = position.limit(_versions(bucket), max_results=3)
+
+    assert _names(listing) == ['a', 'a-b', 'b/1']
+    assert position.more
+    assert position.get_continuation_args(with_file_id=False) == ['--startAfter', 'b/1']
+    assert position.get_continuation_args(with_file_id=True) == [
+        '--startAfter', 'b/1', '--startAfterFileId', position.last[0].id_
+    ]
+
+
+def test_position_without_limit(bucket):
+    position = ListingPosition()
+    listing = position.limit(_versions(bucket))
+
+    assert position.get_continuation_args(with_file_id=False) is None
+    assert next(listing)[0].file_name == 'a'
+    # the consumer is not done with the first entry before it asks for the next one
+    assert position.last is None
+    assert len(list(listing)) == 22
+    assert position.last[0].file_name == 'z'
+    assert not position.more
+
+
+def test_format_continuation():
+    assert format_continuation(
+        ['--startAfter', "it's"]
+    ) == ('To continue, run the command again with: --startAfter \'it\'"\'"\'s\'')
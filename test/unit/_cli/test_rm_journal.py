@@ -0,0 +1,80 @@
+######################################################################
+#
+# File: test/unit/_cli/test_rm_journal.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import pytest
+
+from b2._cli.rm_journal import JournalError, RemovalJournal
+
+COMMAND = {'bucketName': 'bucket', 'folderName': ['c']}
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / 'rm.journal')
+
+
+@pytest.fixture
+def c_versions(bucket):
+    return [file_version for file_version, _ in bucket.ls('c', latest_only=False)]
+
+
+@pytest.mark.parametrize('versions', [False, True])
+def test_resume_from_checkpoint(journal_path, c_versions, versions):
+    journal = RemovalJournal.open(journal_path, COMMAND, versions)
+    assert journal.checkpoint is None
+    for file_version in c_versions[:4]:
+        journal.record_submitted(file_version)
+    journal.record_checkpoint(['--startAfter', 'c/3'])
+    for file_version in c_versions[2:]:
+        journal.record_submitted(file_version)
+    journal.record_removed(c_versions[4])
+    journal.close()
+
+    journal = RemovalJournal.open(journal_path, COMMAND, versions)
+    assert journal.checkpoint == ['--startAfter', 'c/3']
+    # only the records after the checkpoint are used
+    done = [file_version.id_ for file_version in c_versions if journal.is_done(file_version)]
+    if versions:
+        assert done == [c_versions[4].id_]
+    else:
+        # c/3 has two versions, and the latest one was submitted, so both are skipped
+        assert done == [file_version.id_ for file_version in c_versions[2:]]
+    journal.remove()
+
+
+def test_partially_written_record_is_ignored(journal_path, c_versions):
+    journal = RemovalJournal.open(journal_path, COMMAND, versions=False)
+    journal.record_checkpoint(['--startAfter', 'c/1'])
+    journal.close()
+    with open(journal_path, 'a') as f:
+        f.write('{"checkpoint": ["--startAf')
+
+    journal = RemovalJournal.open(journal_path, COMMAND, versions=False)
+    assert journal.checkpoint == ['--startAfter', 'c/1']
+    journal.close()
+
+
+def test_journal_of_another_command(journal_path):
+    RemovalJournal.open(journal_path, COMMAND, versions=False).close()
+    with pytest.raises(JournalError, match='journal of another rm command'):
+        RemovalJournal.open(journal_path, dict(COMMAND, folderName=['d']), versions=False)
+
+
+def test_resume_keeps_start_time(journal_path):
+    RemovalJournal.open(journal_path, COMMAND, versions=False, started_millis=1000).close()
+    journal = RemovalJournal.open(journal_path, COMMAND, versions=False, started_millis=2000)
+    assert journal.started_millis == 1000
+    journal.close()
+
+
+def test_not_a_journal(journal_path):
+    with open(journal_path, 'w') as f:
+        f.write('not json\n')
+    with pytest.raises(JournalError, match='not a journal'):
+        RemovalJournal.open(journal_path, COMMAND, versions=False)
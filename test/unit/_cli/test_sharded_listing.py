@@ -0,0 +1,313 @@
+######################################################################
+#
+# File: test/unit/_cli/test_sharded_listing.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import threading
+import time
+
+import pytest
+
+from b2._cli.sharded_listing import (
+    MAX_BUFFERED_PAGES,
+    ShardedLister,
+    ShardedSizeCounter,
+    _Shard,
+    get_listing_prefix,
+    sample_split_points,
+)
+
+
+def _names(listing):
+    return [(file_version.file_name, file_version.action) for file_version, _ in listing]
+
+
+@pytest.mark.parametrize('threads', [1, 4])
+@pytest.mark.parametrize('fetch_count', [1, 3, 100])
+@pytest.mark.parametrize('latest_only', [True, False])
+@pytest.mark.parametrize(
+    'folder_to_list,with_wildcard',
+    [
+        ('', False),
+        ('b', False),
+        ('d/e/', False),
+        ('*/1', True),
+        ('c/[24]', True),
+        ('b/2/1', True),
+    ],
+)
+def test_same_as_bucket_ls(
+    bucket, threads, fetch_count, latest_only, folder_to_list, with_wildcard
+):
+    lister = ShardedLister(bucket, threads, fetch_count=fetch_count)
+    listing = lister.ls(folder_to_list, latest_only=latest_only, with_wildcard=with_wildcard)
+    expected = bucket.ls(
+        folder_to_list, latest_only=latest_only, recursive=True, with_wildcard=with_wildcard
+    )
+
+    assert _names(listing) == _names(expected)
+
+
+@pytest.mark.parametrize('fetch_count', [1, 3, 100])
+@pytest.mark.parametrize('prefix', ['b/2', 'd/e/f/', 'c/3', 'x'])
+def test_ls_prefix(bucket, fetch_count, prefix):
+    lister = ShardedLister(bucket, 2, fetch_count=fetch_count)
+    listing = lister.ls_prefix(prefix, latest_only=False)
+    expected = [
+        file_version for file_version in bucket.ls(latest_only=False, recursive=True)
+        if file_version[0].file_name.startswith(prefix)
+    ]
+
+    assert _names(listing) == _names(expected)
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+@pytest.mark.parametrize('fetch_count', [1, 3, 100])
+@pytest.mark.parametrize('start_file_name', ['', 'b/2/', 'b/2/2', 'c/35', 'd/e/f/', 'zz'])
+def test_ls_from_start(bucket, threads, fetch_count, start_file_name):
+    lister = ShardedLister(bucket, threads, fetch_count=fetch_count)
+    listing = lister.ls(latest_only=False, start_file_name=start_file_name)
+    expected = [
+        file_version for file_version in bucket.ls(latest_only=False, recursive=True)
+        if file_version[0].file_name >= start_file_name
+    ]
+
+    assert _names(listing) == _names(expected)
+
+
+def test_ls_from_start_file_id(bucket):
+    [(new_c_3, _),
+     (old_c_3, _)] = bucket.ls('c/3', latest_only=False, recursive=True, with_wildcard=True)
+    lister = ShardedLister(bucket, 2, fetch_count=1)
+    listing = lister.ls('c', latest_only=False, start_file_name='c/3', start_file_id=old_c_3.id_)
+
+    assert [file_version.id_ for file_version, _ in listing][:1] == [old_c_3.id_]
+    assert new_c_3.upload_timestamp > old_c_3.upload_timestamp
+
+
+@pytest.mark.parametrize('fetch_count', [1, 2, 100])
+def test_unordered(bucket, fetch_count):
+    lister = ShardedLister(bucket, 4, ordered=False, fetch_count=fetch_count)
+    listing = lister.ls(latest_only=False)
+    expected = bucket.ls(latest_only=False, recursive=True)
+
+    assert sorted(_names(listing)) == sorted(_names(expected))
+
+
+def test_folders_are_listed_concurrently(bucket, monkeypatch):
+    listed_prefixes = []
+    list_file_names = bucket.api.session.list_file_names
+
+    def list_file_names_(bucket_id, start_file_name, max_file_count, prefix):
+        listed_prefixes.append(prefix)
+        return list_file_names(bucket_id, start_file_name, max_file_count, prefix)
+
+    monkeypatch.setattr(bucket.api.session, 'list_file_names', list_file_names_)
+    lister = ShardedLister(bucket, 2, fetch_count=2)
+
+    assert len(list(lister.ls())) == len(list(bucket.ls(recursive=True)))
+    # folders continuing beyond a page were split off, recursively
+    assert {'', 'b/', 'c/', 'd/', 'd/e/', 'd/e/f/'} == set(listed_prefixes)
+
+
+@pytest.fixture
+def flat_bucket(bucket):
+    # files without folders, which can only be split by their names
+    for index in range(100):
+        bucket.upload_bytes(b'data', f'flat/file{index:03}')
+    bucket.hide_file('flat/file050')
+    return bucket
+
+
+@pytest.mark.parametrize('threads', [2, 4])
+@pytest.mark.parametrize('fetch_count', [1, 7])
+@pytest.mark.parametrize('latest_only', [True, False])
+@pytest.mark.parametrize('ordered', [True, False])
+def test_flat_folder_same_as_bucket_ls(flat_bucket, threads, fetch_count, latest_only, ordered):
+    lister = ShardedLister(flat_bucket, threads, ordered=ordered, fetch_count=fetch_count)
+    listing = _names(lister.ls('flat', latest_only=latest_only))
+    expected = _names(flat_bucket.ls('flat', latest_only=latest_only, recursive=True))
+
+    assert (listing if ordered else sorted(listing)) == (expected if ordered else sorted(expected))
+
+
+def test_flat_folder_is_listed_concurrently(flat_bucket, monkeypatch):
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+    list_file_names = flat_bucket.api.session.list_file_names
+
+    def list_file_names_(*args):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        try:
+            time.sleep(0.01)
+            return list_file_names(*args)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(flat_bucket.api.session, 'list_file_names', list_file_names_)
+    lister = ShardedLister(flat_bucket, 4, fetch_count=5)
+
+    assert len(list(lister.ls('flat'))) == 99
+    assert peak[0] > 1
+
+
+@pytest.mark.parametrize(
+    'prefix,next_file_name,end_file_name,count,split_points',
+    [
+        ('', 'file001000', None, 3, ['file002', 'file003', 'file004']),
+        ('', 'file001000', 'file0035', 3, ['file002', 'file003']),
+        ('', 'file009000', None, 3, ['file00e', 'file00f', 'file00i']),
+        # only the characters after the prefix are used; the smallest ranges first
+        (
+            'file0',
+            'file001000',
+            None,
+            100,
+            [f'file00{digit}' for digit in '23456789'] + [f'file0{digit}' for digit in '123456789'],
+        ),
+    ],
+)
+def test_sample_split_points(prefix, next_file_name, end_file_name, count, split_points):
+    page_file_names = [f'file{index:06}' for index in range(1000)]
+    assert sample_split_points(
+        prefix, page_file_names, next_file_name, end_file_name, count
+    ) == split_points
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_buffered_file_versions_are_bounded(bucket, ordered):
+    for folder in range(30):
+        for file in range(5):
+            bucket.upload_bytes(b'data', f'many/{folder:02}/{file}')
+    threads, fetch_count = 4, 2
+    lister = ShardedLister(bucket, threads, ordered=ordered, fetch_count=fetch_count)
+
+    peak = 0
+    listed = []
+    for file_version, _ in lister.ls('many'):
+        listed.append(file_version.file_name)
+        time.sleep(0.001)  # a slow caller, like rm
+        with lister._condition:
+            buffered = sum(
+                not isinstance(entry, _Shard) for shard in lister._shards for entry in shard.entries
+            )
+        peak = max(peak, buffered)
+
+    assert len(listed) == 150
+    # the pages buffered by all the shards, and the pages being fetched
+    assert peak <= (MAX_BUFFERED_PAGES + 1) * threads * fetch_count
+
+
+def test_error_is_raised(bucket, monkeypatch):
+    def list_file_names(*args):
+        raise RuntimeError('listing failed')
+
+    monkeypatch.setattr(bucket.api.session, 'list_file_names', list_file_names)
+    with pytest.raises(RuntimeError, match='listing failed'):
+        list(ShardedLister(bucket, 2).ls())
+
+
+def _expected_counts(bucket):
+    file_versions = [
+        file_version for file_version, _ in bucket.ls(latest_only=False, recursive=True)
+    ]
+    return len(file_versions), sum(file_version.size for file_version in file_versions)
+
+
+@pytest.mark.parametrize('threads', [1, 4])
+@pytest.mark.parametrize('fetch_count', [1, 3, 100])
+def test_size_counter(bucket, threads, fetch_count):
+    counter = ShardedSizeCounter(bucket, threads, fetch_count=fetch_count)
+    assert counter.count() == _expected_counts(bucket)
+    assert counter.get_state()['shards'] == []
+
+
+@pytest.mark.parametrize('failing_call', [1, 2, 5, 9])
+def test_size_counter_resumes_from_state(bucket, monkeypatch, failing_call):
+    calls = []
+    list_file_versions = bucket.api.session.list_file_versions
+
+    def list_file_versions_(*args):
+        calls.append(args)
+        if len(calls) == failing_call:
+            raise RuntimeError('listing failed')
+        return list_file_versions(*args)
+
+    monkeypatch.setattr(bucket.api.session, 'list_file_versions', list_file_versions_)
+    counter = ShardedSizeCounter(bucket, 1, fetch_count=2)
+    with pytest.raises(RuntimeError, match='listing failed'):
+        counter.count()
+    state = counter.get_state()
+    assert state['shards']
+
+    counter = ShardedSizeCounter(bucket, 2, state=state, fetch_count=2)
+    assert counter.count() == _expected_counts(bucket)
+
+
+def test_size_counter_of_flat_folder_resumes_from_state(flat_bucket, monkeypatch):
+    calls = []
+    list_file_versions = flat_bucket.api.session.list_file_versions
+
+    def list_file_versions_(bucket_id, start_file_name, *args):
+        if start_file_name.startswith('flat/'):
+            calls.append(start_file_name)
+            if len(calls) == 3:
+                raise RuntimeError('listing failed')
+        return list_file_versions(bucket_id, start_file_name, *args)
+
+    monkeypatch.setattr(flat_bucket.api.session, 'list_file_versions', list_file_versions_)
+    counter = ShardedSizeCounter(flat_bucket, 4, fetch_count=3)
+    with pytest.raises(RuntimeError, match='listing failed'):
+        counter.count()
+    state = counter.get_state()
+    # the folder was split into ranges
+    assert any(shard['endFileName'] is not None for shard in state['shards'])
+
+    counter = ShardedSizeCounter(flat_bucket, 4, state=state, fetch_count=3)
+    assert counter.count() == _expected_counts(flat_bucket)
+
+
+def test_size_counter_reports_progress(bucket, monkeypatch):
+    list_file_versions = bucket.api.session.list_file_versions
+
+    def list_file_versions_(*args):
+        time.sleep(0.01)
+        return list_file_versions(*args)
+
+    monkeypatch.setattr(bucket.api.session, 'list_file_versions', list_file_versions_)
+    states = []
+    counter = ShardedSizeCounter(bucket, 2, fetch_count=1)
+    counter.count(on_progress=states.append, progress_interval=0)
+    assert states
+    file_counts = [state['fileCount'] for state in states]
+    assert sorted(file_counts) == file_counts
+
+
+@pytest.mark.parametrize('state', [{'bucketId': 'other'}, {'bucketId': 'bucket_0'}, []])
+def test_size_counter_invalid_state(bucket, state):
+    with pytest.raises(ValueError):
+        ShardedSizeCounter(bucket, 1, state=state)
+
+
+@pytest.mark.parametrize(
+    'folder_to_list,with_wildcard,prefix',
+    [
+        ('', False, ''),
+        ('a', False, 'a/'),
+        ('a/', False, 'a/'),
+        ('*.txt', True, ''),
+        ('a/b*/c?', True, 'a/'),
+        ('a/b/c[0-9]', True, 'a/b/'),
+        ('a/b.txt', True, 'a/b.txt'),
+    ],
+)
+def test_get_listing_prefix(folder_to_list, with_wildcard, prefix):
+    assert get_listing_prefix(folder_to_list, with_wildcard) == prefix
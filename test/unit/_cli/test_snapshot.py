@@ -0,0 +1,168 @@
+######################################################################
+#
+# File: test/unit/_cli/test_snapshot.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+import hashlib
+import io
+
+import pytest
+
+from b2._cli.snapshot import BucketSnapshot, SnapshotError
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return tmp_path / 'snapshot.sqlite'
+
+
+def _open(bucket, snapshot_path):
+    return BucketSnapshot.create_or_open(
+        snapshot_path, bucket.api.account_info.get_account_id(), bucket.id_, bucket.name
+    )
+
+
+def _refresh(bucket, snapshot_path, prefix=''):
+    with _open(bucket, snapshot_path) as snapshot:
+        listing = bucket.ls(prefix, latest_only=False, recursive=True)
+        return snapshot.refresh((file_version for file_version, _ in listing), prefix=prefix)
+
+
+def _entries(listing):
+    return [
+        (
+            file_version.id_,
+            file_version.file_name,
+            file_version.size,
+            file_version.content_sha1,
+            file_version.upload_timestamp,
+            file_version.action,
+            folder_name,
+        ) for file_version, folder_name in listing
+    ]
+
+
+@pytest.mark.parametrize('latest_only', [True, False])
+@pytest.mark.parametrize(
+    'folder_to_list,recursive,with_wildcard',
+    [
+        ('', False, False),
+        ('', True, False),
+        ('b', False, False),
+        ('b/', True, False),
+        ('d', False, False),
+        ('*/1', True, True),
+        ('c/[24]', True, True),
+    ],
+)
+def test_ls_same_as_bucket_ls(
+    bucket, snapshot_path, latest_only, folder_to_list, recursive, with_wildcard
+):
+    _refresh(bucket, snapshot_path)
+
+    with BucketSnapshot.open(snapshot_path) as snapshot:
+        listing = snapshot.ls(
+            bucket.api.file_version_factory,
+            folder_to_list,
+            latest_only=latest_only,
+            recursive=recursive,
+            with_wildcard=with_wildcard,
+        )
+        expected = bucket.ls(
+            folder_to_list,
+            latest_only=latest_only,
+            recursive=recursive,
+            with_wildcard=with_wildcard,
+        )
+        assert _entries(listing) == _entries(expected)
+
+
+def test_ls_with_unfinished_large_file(bucket, snapshot_path):
+    # the unfinished large file is newer than the uploaded version of 'c/2'
+    bucket.api.session.start_large_file(bucket.id_, 'c/2', 'b2/x-auto', {})
+    _refresh(bucket, snapshot_path)
+
+    with BucketSnapshot.open(snapshot_path) as snapshot:
+        listing = snapshot.ls(bucket.api.file_version_factory, 'c/', recursive=True)
+        file_names = [file_version.file_name for file_version, _ in listing]
+        assert ['c/1', 'c/2', 'c/3', 'c/4', 'c/5'] == file_names
+        listing = snapshot.ls(
+            bucket.api.file_version_factory,
+            'c/2',
+            latest_only=False,
+            recursive=True,
+            with_wildcard=True,
+        )
+        assert ['start', 'upload'] == [file_version.action for file_version, _ in listing]
+
+
+def test_refresh(bucket, snapshot_path):
+    summary = _refresh(bucket, snapshot_path)
+    assert (23, 23, 23, 0) == (
+        summary['fileVersions'],
+        summary['listed'],
+        summary['added'],
+        summary['removed'],
+    )
+
+    bucket.upload_bytes(b'new', 'a')
+    [(c_1, _)] = bucket.ls('c/1', recursive=True, with_wildcard=True)
+    bucket.api.delete_file_version(c_1.id_, c_1.file_name)
+    summary = _refresh(bucket, snapshot_path)
+    assert (23, 23, 1, 1, 1) == (
+        summary['fileVersions'],
+        summary['listed'],
+        summary['added'],
+        summary['removed'],
+        summary['newSinceWatermark'],
+    )
+    assert summary['watermark'] == max(
+        file_version.upload_timestamp
+        for file_version, _ in bucket.ls(latest_only=False, recursive=True)
+    )
+
+
+def test_refresh_of_finished_large_file(bucket, snapshot_path):
+    session = bucket.api.session
+    large_file_id = session.start_large_file(bucket.id_, 'e', 'b2/x-auto', {})['fileId']
+    _refresh(bucket, snapshot_path)
+
+    data = b'large'
+    sha1 = hashlib.sha1(data).hexdigest()
+    session.upload_part(large_file_id, 1, len(data), sha1, io.BytesIO(data))
+    session.finish_large_file(large_file_id, [sha1])
+    summary = _refresh(bucket, snapshot_path)
+    assert (0, 0) == (summary['added'], summary['removed'])
+
+    with BucketSnapshot.open(snapshot_path) as snapshot:
+        [(file_version, _)
+        ] = snapshot.ls(bucket.api.file_version_factory, 'e', recursive=True, with_wildcard=True)
+        assert (large_file_id, 'upload', len(data)) == (
+            file_version.id_,
+            file_version.action,
+            file_version.size,
+        )
+
+
+def test_refresh_of_folder_keeps_other_files(bucket, snapshot_path):
+    _refresh(bucket, snapshot_path)
+    for file_version, _ in bucket.ls(latest_only=False, recursive=True):
+        bucket.api.delete_file_version(file_version.id_, file_version.file_name)
+
+    summary = _refresh(bucket, snapshot_path, prefix='d/')
+    assert (16, 7) == (summary['fileVersions'], summary['removed'])
+
+
+def test_snapshot_of_another_bucket(bucket, snapshot_path):
+    _refresh(bucket, snapshot_path)
+    with pytest.raises(SnapshotError, match='snapshot of another bucket'):
+        BucketSnapshot.create_or_open(snapshot_path, 'account', 'other-bucket-id', 'other')
+
+
+def test_missing_snapshot(snapshot_path):
+    with pytest.raises(SnapshotError, match='does not exist'):
+        BucketSnapshot.open(snapshot_path)
@@ -0,0 +1,25 @@
+######################################################################
+#
+# File: test/unit/_cli/test_unfinished_large_files.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+from b2._cli.unfinished_large_files import list_unfinished_large_files
+
+
+def test_list_unfinished_large_files(bucket):
+    for file_name in ['a/1', 'a/2', 'b/1']:
+        bucket.api.session.start_large_file(bucket.id_, file_name, 'text/plain', {})
+
+    file_versions = list(list_unfinished_large_files(bucket, batch_size=2))
+    assert sorted(file_version.file_name for file_version in file_versions) == ['a/1', 'a/2', 'b/1']
+    assert all(file_version.action == 'start' for file_version in file_versions)
+    assert all(file_version.size == 0 for file_version in file_versions)
+    assert all(file_version.upload_timestamp is not None for file_version in file_versions)
+
+    assert sorted(
+        file_version.file_name for file_version in list_unfinished_large_files(bucket, prefix='a/')
+    ) == ['a/1', 'a/2']
@@ -0,0 +1,21 @@
+######################################################################
+#
+# File: test/unit/conftest.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+
+import pytest
+
+from b2._cli.const import B2_CACHE_DIR_ENV_VAR
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep data cached by the tool from leaking between tests (and into the home directory)."""
+    cache_dir = tmp_path / 'b2_cache'
+    monkeypatch.setenv(B2_CACHE_DIR_ENV_VAR, str(cache_dir))
+    yield cache_dir
@@ -10,14 +10,18 @@
 
 import argparse
 import sys
+import unittest.mock as mock
 
 from b2.arg_parser import (
     ArgumentParser,
     parse_comma_separated_list,
+    parse_duration_millis,
     parse_millis_from_float_timestamp,
     parse_range,
+    parse_size,
+    render_help_text,
 )
-from b2.console_tool import B2
+from b2.console_tool import B2, GetBucket
 
 from .test_base import TestBase
 
@@ -33,6 +37,22 @@ class TestCustomArgTypes(TestBase):
         with self.assertRaises(ValueError):
             parse_millis_from_float_timestamp('!$@$%@!@$')
 
+    def test_parse_size(self):
+        self.assertEqual(1024, parse_size('1024'))
+        self.assertEqual(10000, parse_size('10KB'))
+        self.assertEqual(10240, parse_size('10kib'))
+        self.assertEqual(3 * 1000**3, parse_size('3 GB'))
+        for invalid in ['', 'KB', '1.5MB', '10XB']:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_size(invalid)
+
+    def test_parse_duration_millis(self):
+        self.assertEqual(90 * 1000, parse_duration_millis('90s'))
+        self.assertEqual(7 * 24 * 3600 * 1000, parse_duration_millis('7d'))
+        for invalid in ['', '7', 'd', '7y']:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_duration_millis(invalid)
+
     def test_parse_range(self):
         self.assertEqual((1, 2), parse_range('1,2'))
         with self.assertRaises(argparse.ArgumentTypeError):
@@ -88,3 +108,50 @@ class TestNonUTF8TerminalSupport(TestBase):
         for command_name, command_class in command_classes.items():
             with self.subTest(command_class=command_class, command_name=command_name):
                 self.check_help_string(command_class, command_name)
+
+
+class TestRenderHelpText(TestBase):
+    TEXT = """
+    Some **help** text.
+
+    .. code-block::
+
+        b2 ls
+    """
+
+    def test_rendered_text_is_cached(self):
+        rendered = render_help_text(self.TEXT, 'utf-8')
+        self.assertIn('help', rendered)
+
+        # rst2ansi (and docutils) are not needed once the text has been rendered
+        with mock.patch.dict(sys.modules, {'rst2ansi': None}):
+            self.assertEqual(rendered, render_help_text(self.TEXT, 'utf-8'))
+
+            with self.assertRaises(ImportError):
+                render_help_text(self.TEXT, 'ascii')
+
+
+class TestSubcommandParser(TestBase):
+    def test_find_subcommand_name(self):
+        self.assertEqual('get-bucket', B2.find_subcommand_name(['get-bucket', 'my-bucket']))
+        self.assertEqual('get-bucket', B2.find_subcommand_name(['get_bucket', 'my-bucket']))
+        self.assertIsNone(B2.find_subcommand_name([]))
+        self.assertIsNone(B2.find_subcommand_name(['--help']))
+        self.assertIsNone(B2.find_subcommand_name(['no-such-command']))
+
+    def test_parser_of_single_subcommand(self):
+        parser = B2.get_parser(subcommand_name='get-bucket')
+        subparsers_action = one_subparsers_action(parser)
+        self.assertEqual({'get-bucket', 'get_bucket'}, set(subparsers_action.choices))
+
+        args = parser.parse_args(['get_bucket', '--showSize', 'my-bucket'])
+        self.assertIs(GetBucket, args.command_class)
+        self.assertTrue(args.showSize)
+        self.assertEqual('my-bucket', args.bucketName)
+
+
+def one_subparsers_action(parser):
+    [action] = [
+        action for action in parser._actions if isinstance(action, argparse._SubParsersAction)
+    ]
+    return action
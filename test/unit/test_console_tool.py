@@ -11,6 +11,7 @@
 import json
 import os
 import pathlib
+import queue
 import re
 import unittest.mock as mock
 from io import StringIO
@@ -23,22 +24,28 @@ from b2sdk.v2 import (
     REALM_URLS,
     B2Api,
     B2HttpApiConfig,
-    ProgressReport,
+    Bucket,
     RawSimulator,
     StubAccountInfo,
     TempDir,
     UploadSourceBytes,
     fix_windows_path_limit,
 )
-from b2sdk.v2.exception import Conflict  # Any error for testing fast-fail of the rm command.
+from b2sdk.v2.exception import (
+    Conflict,  # Any error for testing fast-fail of the rm command.
+    TooManyRequests,
+)
 from more_itertools import one
 
 from b2._cli.const import (
     B2_APPLICATION_KEY_ENV_VAR,
     B2_APPLICATION_KEY_ID_ENV_VAR,
+    B2_CACHE_DIR_ENV_VAR,
     B2_ENVIRONMENT_ENV_VAR,
+    B2_OUTPUT_BUFFERING_ENV_VAR,
 )
-from b2.console_tool import ConsoleTool, Rm
+from b2.console_tool import ConsoleTool, DeleteBucket, Ls, Rm, RmProgressReport
+from b2.json_encoder import B2CliJsonEncoder
 
 from .test_base import TestBase
 
@@ -87,6 +94,23 @@ class BaseConsoleToolTest(TestBase):
         self.assertEqual('', actual_stderr, 'stderr')
         self.assertEqual(0, actual_status, 'exit status code')
 
+    def _run_ndjson_command(self, argv):
+        """
+        Runs the given command in the console tool, checking that it
+        succeeds and prints nothing but compact JSON lines, and returns
+        the printed records.
+        """
+        stdout, stderr = self._get_stdouterr()
+        actual_status = ConsoleTool(self.b2_api, stdout, stderr).run_command(['b2'] + argv)
+        self.assertEqual((0, ''), (actual_status, stderr.getvalue()))
+
+        lines = stdout.getvalue().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(
+            lines, [json.dumps(record, separators=(',', ':')) for record in records], 'compact'
+        )
+        return records
+
     def _trim_leading_spaces(self, s):
         """
         Takes the contents of a triple-quoted string, and removes the leading
@@ -1724,6 +1748,10 @@ class TestConsoleTool(BaseConsoleToolTest):
             ['get-bucket', '--showSize', 'my-bucket'],
             expected_json_in_stdout=expected_json,
         )
+        self._run_command(
+            ['get-bucket', '--showSize', '--listThreads', '4', 'my-bucket'],
+            expected_json_in_stdout=expected_json,
+        )
 
     def test_get_bucket_with_hidden(self):
         self._authorize_account()
@@ -1769,6 +1797,77 @@ class TestConsoleTool(BaseConsoleToolTest):
             expected_json_in_stdout=expected_json,
         )
 
+    def test_get_bucket_show_size_resume(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+
+        with TempDir() as temp_dir:
+            resume_file = os.path.join(temp_dir, 'state.json')
+            with mock.patch.object(
+                self.b2_api.session, 'list_file_versions', side_effect=Conflict()
+            ):
+                self._run_command(
+                    ['get-bucket', '--showSize', '--resumeFile', resume_file, 'my-bucket'],
+                    '',
+                    'the counting can be continued by running the command again with '
+                    f'--resumeFile {resume_file}\n'
+                    'ERROR: Conflict:\n',
+                    1,
+                )
+            with open(resume_file) as f:
+                state = json.load(f)
+            self.assertEqual(
+                {
+                    'bucketId':
+                        'bucket_0',
+                    'fileCount':
+                        0,
+                    'totalSize':
+                        0,
+                    'shards':
+                        [
+                            {
+                                'prefix': '',
+                                'startFileName': '',
+                                'startFileId': None,
+                                'endFileName': None,
+                            }
+                        ],
+                },
+                state,
+            )
+
+            # resuming from the middle of the listing is tested with the counter itself
+            state['fileCount'] = 100
+            with open(resume_file, 'w') as f:
+                json.dump(state, f)
+            self._run_command(
+                ['get-bucket', '--showSize', '--resumeFile', resume_file, 'my-bucket'],
+                expected_json_in_stdout={
+                    'fileCount': 108,
+                    'totalSize': 72
+                },
+            )
+            self.assertFalse(os.path.exists(resume_file))
+
+            with open(resume_file, 'w') as f:
+                json.dump({**state, 'bucketId': 'bucket_1'}, f)
+            self._run_command(
+                ['get-bucket', '--showSize', '--resumeFile', resume_file, 'my-bucket'],
+                '',
+                f'ERROR: cannot resume from {resume_file}: the state is of another bucket\n',
+                1,
+            )
+
+        self._run_command(
+            ['get-bucket', '--resumeFile', 'state.json', 'my-bucket'],
+            '',
+            'ERROR: --resumeFile can only be used with --showSize\n',
+            1,
+        )
+
     def test_get_bucket_complex(self):
         self._authorize_account()
         self._create_my_bucket()
@@ -1946,6 +2045,31 @@ class TestConsoleTool(BaseConsoleToolTest):
                 expected_json_in_stdout=expected_json,
             )
 
+    def test_sync_dry_run_ndjson(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        bucket.upload(UploadSourceBytes(b'old'), 'old.txt')
+
+        with TempDir() as temp_dir:
+            self._make_local_file(temp_dir, 'new file.txt')
+            command = ['sync', '--dryRun', '--ndjson', '--delete', temp_dir, 'b2://my-bucket']
+            self.assertEqual(
+                [
+                    {
+                        'action': 'upload',
+                        'fileName': 'new file.txt'
+                    },
+                    {
+                        'action': 'delete',
+                        'fileName': 'old.txt'
+                    },
+                ],
+                sorted(self._run_ndjson_command(command), key=lambda record: record['fileName']),
+            )
+
+        self._run_command(['ls', 'my-bucket'], 'old.txt\n', '', 0)
+
     def test_sync_exclude_all_symlinks(self):
         self._authorize_account()
         self._create_my_bucket()
@@ -2126,6 +2250,231 @@ class TestConsoleTool(BaseConsoleToolTest):
         '''
         self._run_command(['ls', '--long', '--versions', 'my-bucket'], expected_stdout, '', 0)
 
+    def test_ls_json(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        self._run_command(['ls', '--json', 'my-bucket'], '[]\n', '', 0)
+
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        bucket.upload(UploadSourceBytes(b'new'), 'c/test.csv')
+        file_versions = [
+            file_version for file_version, _ in bucket.ls(latest_only=False, recursive=True)
+        ]
+        expected_stdout = json.dumps(
+            file_versions, indent=4, sort_keys=True, cls=B2CliJsonEncoder
+        ) + '\n'
+
+        stdout, stderr = self._get_stdouterr()
+        status = ConsoleTool(self.b2_api, stdout, stderr).run_command(
+            ['b2', 'ls', '--json', '--versions', '--recursive', 'my-bucket']
+        )
+        self.assertEqual((0, expected_stdout, ''), (status, stdout.getvalue(), stderr.getvalue()))
+
+    def test_ls_json_is_streamed(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        stdout, stderr = self._get_stdouterr()
+        printed_before_next_item = []
+        original_ls = Bucket.ls
+
+        def ls(*args, **kwargs):
+            for entry in original_ls(bucket, recursive=True):
+                yield entry
+                printed_before_next_item.append(stdout.getvalue())
+
+        console_tool = ConsoleTool(self.b2_api, stdout, stderr)
+        with mock.patch.object(Bucket, 'ls', side_effect=ls), \
+                mock.patch.dict(os.environ, {B2_OUTPUT_BUFFERING_ENV_VAR: 'line'}):
+            console_tool.run_command(['b2', 'ls', '--json', '--recursive', 'my-bucket'])
+
+        # with line buffering (of terminals), every item is printed before the next one is fetched
+        self.assertTrue(printed_before_next_item[0].startswith('[\n    {\n'))
+        printed_lengths = [len(printed) for printed in printed_before_next_item]
+        self.assertEqual(sorted(set(printed_lengths)), printed_lengths)
+        self.assertEqual(8, len(printed_lengths))
+        self.assertEqual(8, len(json.loads(stdout.getvalue())))
+
+    def test_ls_output_buffering(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+
+        stdout, stderr = self._get_stdouterr()
+        console_tool = ConsoleTool(self.b2_api, stdout, stderr)
+        with mock.patch.object(stdout, 'write', wraps=stdout.write) as write:
+            console_tool.run_command(['b2', 'ls', '--long', '--recursive', 'my-bucket'])
+        # the output is not a terminal, so all lines are written at once
+        self.assertEqual(1, write.call_count)
+        self.assertEqual(8, len(stdout.getvalue().splitlines()))
+
+        with mock.patch.dict(os.environ, {B2_OUTPUT_BUFFERING_ENV_VAR: 'lines'}):
+            self._run_command(
+                ['ls', 'my-bucket'],
+                '',
+                "ERROR: B2_OUTPUT_BUFFERING should be one of auto, line, block, not 'lines'\n",
+                1,
+            )
+
+    def test_ls_list_threads(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        self._upload_multiple_files(bucket)
+
+        stdout, stderr = self._get_stdouterr()
+        ConsoleTool(self.b2_api, stdout, stderr).run_command(
+            ['b2', 'ls', '--long', '--versions', '--recursive', 'my-bucket']
+        )
+        expected_stdout = stdout.getvalue()
+        self.assertEqual(16, len(expected_stdout.splitlines()))
+
+        command = ['ls', '--long', '--versions', '--recursive', '--listThreads', '3', 'my-bucket']
+        self._run_command(command, expected_stdout, '', 0)
+
+        stdout, stderr = self._get_stdouterr()
+        ConsoleTool(self.b2_api, stdout, stderr).run_command(['b2', *command, '--unordered'])
+        self.assertEqual(
+            sorted(expected_stdout.splitlines()), sorted(stdout.getvalue().splitlines())
+        )
+
+    def test_ls_from_snapshot(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        self._upload_multiple_files(bucket)
+
+        self._run_command(
+            ['ls', '--fromSnapshot', 'my-bucket'],
+            '',
+            'ERROR: snapshot {cache_dir}/snapshots/my-bucket.sqlite does not exist\n',
+            1,
+            format_vars={'cache_dir': os.environ[B2_CACHE_DIR_ENV_VAR]},
+        )
+        self._run_command(
+            ['snapshot', '--listThreads', '2', 'my-bucket'],
+            expected_json_in_stdout={
+                'bucketName': 'my-bucket',
+                'fileVersions': 16,
+                'added': 16,
+                'removed': 0,
+            },
+        )
+
+        for args in [[], ['--recursive'], ['--long', '--versions', '--recursive']]:
+            stdout, stderr = self._get_stdouterr()
+            ConsoleTool(self.b2_api, stdout,
+                        stderr).run_command(['b2', 'ls', *args, 'my-bucket', 'b'])
+            self._run_command(
+                ['ls', '--fromSnapshot', *args, 'my-bucket', 'b'], stdout.getvalue(), '', 0
+            )
+
+        # files uploaded later are not in the snapshot, until it is refreshed
+        bucket.upload(UploadSourceBytes(b'new'), 'b/new.txt')
+        self._run_command(
+            ['ls', '--fromSnapshot', '--recursive', 'my-bucket', 'b'],
+            unexpected_part_of_stdout='new.txt',
+        )
+        self._run_command(
+            ['snapshot', 'my-bucket', 'b'],
+            expected_json_in_stdout={
+                'fileVersions': 17,
+                'added': 1,
+                'removed': 0,
+            },
+        )
+        self._run_command(
+            ['ls', '--fromSnapshot', '--recursive', 'my-bucket', 'b'],
+            expected_part_of_stdout='b/new.txt',
+        )
+
+    def test_ls_from_snapshot_versions_continuation(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        self._upload_multiple_files(bucket)
+        versions = [
+            file_version for file_version, _ in bucket.ls(latest_only=False, recursive=True)
+        ]
+        self._run_command(['snapshot', 'my-bucket'], expected_part_of_stdout='"added": 16')
+        bucket.delete_file_version(versions[2].id_, versions[2].file_name)
+
+        # the version is gone from the bucket, but not from the snapshot, which is listed offline
+        expected_stdout = ''.join(f'{file_version.file_name}\n' for file_version in versions[3:])
+        command = [
+            'ls', '--fromSnapshot', '--recursive', '--versions', '--startAfter', 'a/test.tsv',
+            '--startAfterFileId', versions[2].id_, 'my-bucket'
+        ]
+        offline = mock.patch.object(
+            self.b2_api.session, 'list_file_versions', side_effect=AssertionError('not offline')
+        )
+        with offline:
+            self._run_command(command, expected_stdout, '', 0)
+
+        # once it is gone from the snapshot too, the versions of the file left are listed again
+        self._run_command(['snapshot', 'my-bucket'], expected_part_of_stdout='"removed": 1')
+        with offline:
+            self._run_command(command, expected_stdout, '', 0)
+
+    def test_ls_ndjson(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        self._run_command(['ls', '--ndjson', 'my-bucket'], '', '', 0)
+
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        expected_stdout = ''.join(
+            json.dumps(file_version, separators=(',', ':'), cls=B2CliJsonEncoder) + '\n'
+            for file_version, _ in bucket.ls(recursive=True)
+        )
+
+        stdout, stderr = self._get_stdouterr()
+        status = ConsoleTool(self.b2_api, stdout, stderr).run_command(
+            ['b2', 'ls', '--ndjson', '--recursive', 'my-bucket']
+        )
+        self.assertEqual((0, expected_stdout, ''), (status, stdout.getvalue(), stderr.getvalue()))
+        self.assertEqual(8, len(stdout.getvalue().splitlines()))
+
+        self._run_command(
+            ['ls', '--json', '--ndjson', 'my-bucket'],
+            '',
+            'ERROR: --json and --ndjson cannot be used together\n',
+            1,
+        )
+
+    def test_list_buckets_ndjson(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        self._run_command(['create-bucket', 'my-bucket-2', 'allPrivate'], 'bucket_1\n', '', 0)
+
+        records = self._run_ndjson_command(['list-buckets', '--ndjson'])
+        self.assertEqual(
+            [('bucket_0', 'my-bucket', 'allPublic'), ('bucket_1', 'my-bucket-2', 'allPrivate')],
+            [
+                (record['bucketId'], record['bucketName'], record['bucketType'])
+                for record in records
+            ],
+        )
+
+    def test_list_keys_ndjson(self):
+        self._authorize_account()
+        self._run_command(
+            ['create-key', 'goodKeyName', 'listBuckets,listKeys'],
+            'appKeyId0 appKey0\n',
+            '',
+            0,
+        )
+
+        records = self._run_ndjson_command(['list-keys', '--ndjson'])
+        self.assertEqual(['goodKeyName'], [record['keyName'] for record in records])
+        self.assertEqual(['listBuckets', 'listKeys'], records[0]['capabilities'])
+
     def test_ls_wildcard(self):
         self._authorize_account()
         self._create_my_bucket()
@@ -2200,89 +2549,392 @@ class TestConsoleTool(BaseConsoleToolTest):
             expected_status=1,
         )
 
-    def test_restrictions(self):
-        # Initial condition
-        self.assertEqual(None, self.account_info.get_account_auth_token())
-
-        # Authorize an account with the master key.
-        account_id = self.account_id
-        self._run_command_ignore_output(['authorize-account', account_id, self.master_key])
-
-        # Create a bucket to use
-        bucket_name = 'restrictedBucket'
-        bucket_id = 'bucket_0'
-        self._run_command(['create-bucket', bucket_name, 'allPrivate'], bucket_id + '\n', '', 0)
+    def test_ls_many_patterns_and_regexes(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
 
-        # Create another bucket
-        other_bucket_name = 'otherBucket'
-        self._run_command_ignore_output(['create-bucket', other_bucket_name, 'allPrivate'])
+        expected_stdout = '''
+        a/test.tsv
+        b/b/test.csv
+        b/b2/test.tsv
+        b/test.txt
+        c/test.tsv
+        '''
+        self._run_command(
+            ['ls', '--recursive', '--withWildcard', 'my-bucket', '*.tsv', 'b/*.txt', 'b/b/*'],
+            expected_stdout,
+        )
 
-        # Create a key restricted to a bucket
-        app_key_id = 'appKeyId0'
-        app_key = 'appKey0'
-        capabilities = "listBuckets,readFiles"
-        file_prefix = 'some/file/prefix/'
+        expected_stdout = '''
+        b/b/test.csv
+        b/b1/test.csv
+        '''
         self._run_command(
             [
-                'create-key', '--bucket', bucket_name, '--namePrefix', file_prefix, 'my-key',
-                capabilities
+                'ls', '--recursive', '--includeRegex', r'.*\.csv$', '--excludeRegex', 'c/',
+                '--excludeRegex', 'a/', 'my-bucket'
             ],
-            app_key_id + ' ' + app_key + '\n',
-            '',
-            0,
+            expected_stdout,
         )
-
-        self._run_command_ignore_output(['authorize-account', app_key_id, app_key])
-
-        # Auth token should be in account info now
-        self.assertEqual('auth_token_1', self.account_info.get_account_auth_token())
-
-        # Assertions that the restrictions not only are saved but what they are supposed to be
-        self.assertEqual(
-            dict(
-                bucketId=bucket_id,
-                bucketName=bucket_name,
-                capabilities=[
-                    'listBuckets',
-                    'readFiles',
-                ],
-                namePrefix=file_prefix,
-            ),
-            self.account_info.get_allowed(),
+        self._run_command(
+            ['ls', '--recursive', '--excludeRegex', r'.*/b\d', 'my-bucket', 'b'],
+            'b/b/test.csv\nb/test.txt\n',
         )
 
-        # Test that the application key info gets added to the unauthorized error message.
-        expected_create_key_stderr = "ERROR: unauthorized for application key " \
-                                     "with capabilities 'listBuckets,readFiles', " \
-                                     "restricted to bucket 'restrictedBucket', " \
-                                     "restricted to files that start with 'some/file/prefix/' (unauthorized)\n"
         self._run_command(
-            ['create-key', 'goodKeyName-One', 'readFiles,listBuckets'],
+            ['ls', '--recursive', 'my-bucket', 'a', 'b'],
             '',
-            expected_create_key_stderr,
+            'ERROR: many folderName patterns can only be used with --withWildcard\n',
             1,
         )
-
-    def test_list_buckets_not_allowed_for_app_key(self):
-        # Create a bucket and a key restricted to that bucket.
-        self._authorize_account()
         self._run_command(
-            ['create-bucket', 'my-bucket', 'allPrivate'],
-            'bucket_0\n',
+            ['ls', '--excludeRegex', 'a/', 'my-bucket'],
             '',
-            0,
+            'ERROR: --includeRegex, --excludeRegex and many folderName patterns '
+            'require --recursive\n',
+            1,
         )
-
-        # Authorizing with the key will fail because the ConsoleTool needs
-        # to be able to look up the name of the bucket.
         self._run_command(
-            ['create-key', 'my-key', 'listFiles'],
-            'appKeyId0 appKey0\n',
+            ['ls', '--recursive', '--includeRegex', '(', 'my-bucket'],
             '',
-            0,
+            'ERROR: invalid regular expression: missing ), unterminated subpattern at position 0\n',
+            1,
         )
 
-        # Authorize with the key, which should result in an error.
+    def test_ls_max_results_and_start_after(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+
+        expected_stdout = '''
+        a/test.csv
+        a/test.tsv
+        b/b/test.csv
+        '''
+        continuation = 'To continue, run the command again with: --startAfter {}\n'
+        self._run_command(
+            ['ls', '--recursive', '--maxResults', '3', 'my-bucket'],
+            expected_stdout,
+            continuation.format('b/b/test.csv'),
+        )
+        expected_stdout = '''
+        b/b1/test.csv
+        b/b2/test.tsv
+        b/test.txt
+        c/test.csv
+        c/test.tsv
+        '''
+        # the listing which ends at the limit has nothing to continue
+        self._run_command(
+            ['ls', '--recursive', '--startAfter', 'b/b/test.csv', '--maxResults', '5', 'my-bucket'],
+            expected_stdout,
+        )
+        for list_threads in ['1', '3']:
+            self._run_command(
+                [
+                    'ls', '--recursive', '--listThreads', list_threads, '--startFileName',
+                    'b/test.txt', 'my-bucket', 'b'
+                ],
+                'b/test.txt\n',
+            )
+
+        self._run_command(
+            ['ls', '--maxResults', '1', 'my-bucket'],
+            'a/\n',
+            continuation.format('a/'),
+        )
+        self._run_command(['ls', '--startAfter', 'a/', 'my-bucket'], 'b/\nc/\n')
+        self._run_command(
+            ['ls', '--recursive', '--withWildcard', '--startAfter', 'a', 'my-bucket', '*.tsv'],
+            'a/test.tsv\nb/b2/test.tsv\nc/test.tsv\n',
+        )
+
+    def test_ls_versions_continuation(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        self._upload_multiple_files(bucket)
+        versions = [
+            file_version for file_version, _ in bucket.ls(latest_only=False, recursive=True)
+        ]
+
+        stdout, stderr = self._get_stdouterr()
+        command = ['ls', '--recursive', '--versions', '--listThreads', '2', 'my-bucket']
+        ConsoleTool(self.b2_api, stdout,
+                    stderr).run_command(['b2', *command, '--long', '--maxResults', '3'])
+        self.assertEqual(
+            'To continue, run the command again with: --startAfter a/test.tsv '
+            f'--startAfterFileId {versions[2].id_}\n',
+            stderr.getvalue(),
+        )
+
+        expected_stdout = ''.join(f'{file_version.file_name}\n' for file_version in versions[3:])
+        self._run_command(
+            [*command, '--startAfter', 'a/test.tsv', '--startAfterFileId', versions[2].id_],
+            expected_stdout,
+        )
+
+        # the version which the listing stopped at is gone, but the older ones are listed
+        bucket.delete_file_version(versions[2].id_, versions[2].file_name)
+        for list_threads in ['1', '2']:
+            self._run_command(
+                [
+                    'ls', '--recursive', '--versions', '--listThreads', list_threads, '--long',
+                    '--startAfter', 'a/test.tsv', '--startAfterFileId', versions[2].id_, 'my-bucket'
+                ],
+                expected_part_of_stdout=f'{versions[3].id_}  upload',
+            )
+            self._run_command(
+                [
+                    *command[:-2], list_threads, '--startAfter', 'a/test.tsv', '--startAfterFileId',
+                    versions[2].id_, 'my-bucket'
+                ],
+                expected_stdout,
+            )
+
+    def test_ls_interrupted_prints_continuation(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+
+        def print_or_interrupt(self, args, file_version, folder_name):
+            if file_version.file_name == 'b/b1/test.csv':
+                raise KeyboardInterrupt()
+            self._print(file_version.file_name)
+
+        expected_stdout = '''
+        a/test.csv
+        a/test.tsv
+        b/b/test.csv
+        '''
+        expected_stderr = '''
+        To continue, run the command again with: --startAfter b/b/test.csv
+
+        Interrupted.  Shutting down...
+
+        '''
+        with mock.patch.object(Ls, '_print_file_version', print_or_interrupt):
+            self._run_command(
+                ['ls', '--recursive', 'my-bucket'],
+                expected_stdout,
+                expected_stderr,
+                1,
+            )
+
+    def test_ls_start_options_errors(self):
+        self._authorize_account()
+        self._create_my_bucket()
+
+        for options, message in [
+            (
+                ['--startAfter', 'a', '--startFileName', 'b'],
+                '--startAfter and --startFileName cannot be used together',
+            ),
+            (
+                ['--startAfter', 'a', '--startAfterFileId', 'id'],
+                '--startAfterFileId requires --startAfter and --versions',
+            ),
+            (['--maxResults', '0'], '--maxResults should be a positive number'),
+            (
+                ['--unordered', '--maxResults', '10'],
+                '--startAfter, --startFileName and --maxResults cannot be used with --unordered',
+            ),
+        ]:
+            self._run_command(
+                ['ls', '--recursive', *options, 'my-bucket'],
+                '',
+                f'ERROR: {message}\n',
+                1,
+            )
+
+    def test_ls_size_age_action_and_content_type_filters(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        bucket.upload_bytes(b'big-test-data', 'b/test.txt', content_type='text/plain')
+        bucket.hide_file('c/test.tsv')
+
+        self._run_command(
+            ['ls', '--recursive', '--versions', '--minSize', '10', 'my-bucket'],
+            'b/test.txt\n',
+        )
+        self._run_command(
+            [
+                'ls', '--recursive', '--versions', '--maxSize', '9', '--action', 'upload',
+                'my-bucket', 'c'
+            ],
+            'c/test.csv\nc/test.tsv\n',
+        )
+        self._run_command(
+            ['ls', '--recursive', '--versions', '--action', 'hide', 'my-bucket'],
+            'c/test.tsv\n',
+        )
+        self._run_command(
+            ['ls', '--recursive', '--contentType', 'text/*', 'my-bucket'],
+            'b/test.txt\n',
+        )
+        # the simulated uploads happened at the beginning of the epoch
+        self._run_command(['ls', '--recursive', '--newerThan', '1d', 'my-bucket'], '')
+        self._run_command(
+            ['ls', '--recursive', '--olderThan', '1d', '--bySrcLastModified', 'my-bucket', 'a'],
+            'a/test.csv\na/test.tsv\n',
+        )
+
+        for options, message in [
+            (
+                ['--minSize', '1KB'],
+                '--minSize, --maxSize, --olderThan, --newerThan, --action and --contentType '
+                'require --recursive',
+            ),
+            (
+                ['--recursive', '--minSize', '2KB', '--maxSize', '1KB'],
+                '--minSize cannot be greater than --maxSize',
+            ),
+            (
+                ['--recursive', '--bySrcLastModified'],
+                '--bySrcLastModified requires --olderThan or --newerThan',
+            ),
+        ]:
+            self._run_command(['ls', *options, 'my-bucket'], '', f'ERROR: {message}\n', 1)
+
+    def test_du(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        self._upload_multiple_files(bucket)
+        bucket.upload(UploadSourceBytes(b'new test-data'), 'b/test.txt')
+        bucket.hide_file('c/test.tsv')
+
+        expected_stdout = """
+                     18           2           2           0  my-bucket/a/
+                     49           4           5           0  my-bucket/b/
+                     18           1           2           1  my-bucket/c/
+                     85           7           9           1  my-bucket/
+        """
+        self._run_command(['du', 'my-bucket'], expected_stdout)
+
+        expected_stdout = """
+                      9           1           1           0  my-bucket/b/b/
+                      9           1           1           0  my-bucket/b/b1/
+                      9           1           1           0  my-bucket/b/b2/
+                     49           4           5           0  my-bucket/b/
+        """
+        self._run_command(
+            ['du', '--depth', '2', '--listThreads', '3', 'my-bucket', 'b'], expected_stdout
+        )
+
+        expected_json = [
+            {
+                'prefix': 'c/',
+                'fileCount': 1,
+                'versionCount': 2,
+                'hideMarkerCount': 1,
+                'totalSize': 18,
+            }
+        ]
+        self._run_command(
+            ['du', '--depth', '0', '--json', 'my-bucket', 'c/'],
+            expected_json_in_stdout=expected_json
+        )
+        records = self._run_ndjson_command(['du', '--depth', '0', '--ndjson', 'my-bucket', 'c/'])
+        self.assertEqual(expected_json, records)
+
+        self._run_command(
+            ['du', '--depth', '-1', 'my-bucket'],
+            '',
+            'ERROR: --depth cannot be negative\n',
+            1,
+        )
+
+    def test_restrictions(self):
+        # Initial condition
+        self.assertEqual(None, self.account_info.get_account_auth_token())
+
+        # Authorize an account with the master key.
+        account_id = self.account_id
+        self._run_command_ignore_output(['authorize-account', account_id, self.master_key])
+
+        # Create a bucket to use
+        bucket_name = 'restrictedBucket'
+        bucket_id = 'bucket_0'
+        self._run_command(['create-bucket', bucket_name, 'allPrivate'], bucket_id + '\n', '', 0)
+
+        # Create another bucket
+        other_bucket_name = 'otherBucket'
+        self._run_command_ignore_output(['create-bucket', other_bucket_name, 'allPrivate'])
+
+        # Create a key restricted to a bucket
+        app_key_id = 'appKeyId0'
+        app_key = 'appKey0'
+        capabilities = "listBuckets,readFiles"
+        file_prefix = 'some/file/prefix/'
+        self._run_command(
+            [
+                'create-key', '--bucket', bucket_name, '--namePrefix', file_prefix, 'my-key',
+                capabilities
+            ],
+            app_key_id + ' ' + app_key + '\n',
+            '',
+            0,
+        )
+
+        self._run_command_ignore_output(['authorize-account', app_key_id, app_key])
+
+        # Auth token should be in account info now
+        self.assertEqual('auth_token_1', self.account_info.get_account_auth_token())
+
+        # Assertions that the restrictions not only are saved but what they are supposed to be
+        self.assertEqual(
+            dict(
+                bucketId=bucket_id,
+                bucketName=bucket_name,
+                capabilities=[
+                    'listBuckets',
+                    'readFiles',
+                ],
+                namePrefix=file_prefix,
+            ),
+            self.account_info.get_allowed(),
+        )
+
+        # Test that the application key info gets added to the unauthorized error message.
+        expected_create_key_stderr = "ERROR: unauthorized for application key " \
+                                     "with capabilities 'listBuckets,readFiles', " \
+                                     "restricted to bucket 'restrictedBucket', " \
+                                     "restricted to files that start with 'some/file/prefix/' (unauthorized)\n"
+        self._run_command(
+            ['create-key', 'goodKeyName-One', 'readFiles,listBuckets'],
+            '',
+            expected_create_key_stderr,
+            1,
+        )
+
+    def test_list_buckets_not_allowed_for_app_key(self):
+        # Create a bucket and a key restricted to that bucket.
+        self._authorize_account()
+        self._run_command(
+            ['create-bucket', 'my-bucket', 'allPrivate'],
+            'bucket_0\n',
+            '',
+            0,
+        )
+
+        # Authorizing with the key will fail because the ConsoleTool needs
+        # to be able to look up the name of the bucket.
+        self._run_command(
+            ['create-key', 'my-key', 'listFiles'],
+            'appKeyId0 appKey0\n',
+            '',
+            0,
+        )
+
+        # Authorize with the key, which should result in an error.
         self._run_command(
             ['authorize-account', 'appKeyId0', 'appKey0'],
             'Using http://production.example.com\n',
@@ -2397,6 +3049,100 @@ class TestConsoleTool(BaseConsoleToolTest):
             )
             assert parallel_strategy.max_streams == params['--max-download-streams-per-file']
 
+    def _run_batch(self, lines, *options):
+        with TempDir() as temp_dir:
+            commands_file = os.path.join(temp_dir, 'commands')
+            with open(commands_file, 'w') as f:
+                f.write('\n'.join(lines))
+            stdout, stderr = self._get_stdouterr()
+            status = ConsoleTool(self.b2_api, stdout,
+                                 stderr).run_command(['b2', 'batch', *options, commands_file])
+        self.assertEqual('', stderr.getvalue())
+        return status, [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_batch(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        self.b2_api.get_bucket_by_name('my-bucket').upload(UploadSourceBytes(b''), 'a b')
+
+        status, results = self._run_batch(
+            [
+                '# comment',
+                'hide-file my-bucket "a b"',
+                '',
+                '["ls", "--versions", "my-bucket"]',
+            ]
+        )
+
+        self.assertEqual(0, status)
+        self.assertEqual(
+            [
+                (2, ['hide-file', 'my-bucket', 'a b'], 0, ''),
+                (4, ['ls', '--versions', 'my-bucket'], 0, ''),
+            ],
+            [(r['line'], r['command'], r['status'], r['stderr']) for r in results],
+        )
+        self.assertEqual('a b\na b\n', results[1]['stdout'])
+
+    def test_batch_threads(self):
+        self._authorize_account()
+        self._create_my_bucket()
+        lines = [f'hide-file my-bucket file{i}' for i in range(20)]
+
+        status, results = self._run_batch(lines, '--threads', '4')
+
+        self.assertEqual(0, status)
+        self.assertEqual(list(range(1, 21)), [result['line'] for result in results])
+        self.assertEqual(
+            sorted(f'file{i}' for i in range(20)),
+            sorted(
+                file_version.file_name for file_version, _ in
+                self.b2_api.get_bucket_by_name('my-bucket').ls(latest_only=False)
+                if file_version.action == 'hide'
+            ),
+        )
+
+    def test_batch_errors(self):
+        self._authorize_account()
+        self._create_my_bucket()
+
+        status, results = self._run_batch(
+            [
+                'get-bucket no-such-bucket',
+                'no-such-command',
+                '["get-bucket", 1]',
+                'hide-file "my-bucket',
+                'authorize-account',
+                'get-bucket --profile other my-bucket',
+                'get-bucket my-bucket',
+            ]
+        )
+
+        self.assertEqual(1, status)
+        self.assertEqual(
+            [
+                (['get-bucket', 'no-such-bucket'], 1),
+                (['no-such-command'], 2),
+                (None, 1),
+                (None, 1),
+                (['authorize-account'], 1),
+                (['get-bucket', '--profile', 'other', 'my-bucket'], 1),
+                (['get-bucket', 'my-bucket'], 0),
+            ],
+            [(result['command'], result['status']) for result in results],
+        )
+        self.assertEqual(
+            [
+                'bucket not found: no-such-bucket\n',
+                'ERROR: JSON array of the command must contain only strings\n',
+                'ERROR: No closing quotation\n',
+                'ERROR: authorize-account cannot be run in a batch\n',
+                'ERROR: cannot change configuration on already initialized object\n',
+            ],
+            [results[i]['stderr'] for i in (0, 2, 3, 4, 5)],
+        )
+        self.assertIn("invalid choice: 'no-such-command'", results[1]['stderr'])
+
 
 @mock.patch.dict(REALM_URLS, {'production': 'http://production.example.com'})
 class TestConsoleToolWithV1(BaseConsoleToolTest):
@@ -2425,8 +3171,114 @@ class TestConsoleToolWithV1(BaseConsoleToolTest):
         9998 canceled
         '''
 
-        self._run_command(
-            ['cancel-all-unfinished-large-files', 'my-v1-bucket'], expected_stdout, '', 0
+        self._run_command(
+            ['cancel-all-unfinished-large-files', '--threads', '1', '--noProgress', 'my-v1-bucket'],
+            expected_stdout,
+            '',
+            0,
+        )
+
+    def test_cancel_all_large_file_filters(self):
+        for file_name in ['a/file1', 'a/file2', 'b/file3']:
+            self.v1_bucket.start_large_file(file_name, 'text/plain', {})
+
+        # the files were started long before (by the clock of the simulator)
+        command = ['cancel-all-unfinished-large-files', '--noProgress']
+        self._run_command([*command, '--newerThan', '1d', 'my-v1-bucket'], '', '', 0)
+        self._run_command(
+            [*command, '--olderThan', '1d', '--prefix', 'a/', 'my-v1-bucket'],
+            expected_part_of_stdout='9999 canceled\n',
+        )
+        self.assertEqual(
+            ['b/file3'],
+            [file.file_name for file in self.v1_bucket.list_unfinished_large_files()],
+        )
+
+    def test_cancel_all_large_file_failures(self):
+        self.v1_bucket.start_large_file('file1', 'text/plain', {})
+        self.v1_bucket.start_large_file('file2', 'text/plain', {})
+        with mock.patch.object(
+            self.b2_api.raw_api, 'cancel_large_file', side_effect=Conflict()
+        ) as cancel_large_file:
+            self._run_command(
+                [
+                    'cancel-all-unfinished-large-files', '--failFast', '--threads', '1',
+                    'my-v1-bucket'
+                ],
+                expected_part_of_stdout='Cancellation of file "file1" (9999) failed: ',
+                expected_status=1,
+            )
+        self.assertEqual(1, cancel_large_file.call_count)
+
+    def test_delete_bucket_purge(self):
+        self._upload_multiple_files(self.v1_bucket)
+        self._upload_multiple_files(self.v1_bucket)
+        self.v1_bucket.hide_file('a/test.csv')
+        self.v1_bucket.start_large_file('file1', 'text/plain', {})
+        bucket_simulator = self.raw_api.bucket_id_to_bucket[self.v1_bucket.id_]
+
+        self._run_command(['delete-bucket', '--purge', '--noProgress', 'my-v1-bucket'])
+        self._run_command(['list-buckets'], unexpected_part_of_stdout='my-v1-bucket')
+        # the unfinished large file was canceled, too
+        self.assertEqual({}, bucket_simulator.file_id_to_file)
+
+    def test_delete_bucket_purge_not_emptied(self):
+        self._upload_multiple_files(self.v1_bucket)
+        with mock.patch.object(DeleteBucket, '_is_empty', return_value=False) as is_empty:
+            self._run_command(
+                ['delete-bucket', '--purge', '--noProgress', 'my-v1-bucket'],
+                '',
+                'ERROR: bucket my-v1-bucket is not empty after 3 attempts to purge it, '
+                'so it was not deleted\n',
+                1,
+            )
+        self.assertEqual(3, is_empty.call_count)
+        self._run_command(['list-buckets'], expected_part_of_stdout='my-v1-bucket')
+
+    def test_delete_bucket_purge_list_threads(self):
+        self._upload_multiple_files(self.v1_bucket)
+        self._run_command(
+            ['delete-bucket', '--purge', '--noProgress', '--listThreads', '3', 'my-v1-bucket']
+        )
+        self._run_command(['list-buckets'], unexpected_part_of_stdout='my-v1-bucket')
+
+    def test_list_parts_ndjson(self):
+        bucket = self.b2_api.get_bucket_by_name('my-bucket')
+        file = self.v1_bucket.start_large_file('file', 'text/plain', {})
+        large_file_upload_state = mock.MagicMock()
+        large_file_upload_state.has_error.return_value = False
+        bucket.api.services.upload_manager._upload_part(
+            bucket.id_, file.file_id, UploadSourceBytes(b'hello world'), 1, large_file_upload_state,
+            None, None
+        )
+
+        self.assertEqual(
+            [
+                {
+                    'fileId': file.file_id,
+                    'partNumber': 1,
+                    'contentLength': 11,
+                    'contentSha1': '2aae6c35c94fcfb415dbe95f408b9ce91ee846ed',
+                }
+            ],
+            self._run_ndjson_command(['list-parts', '--ndjson', file.file_id]),
+        )
+
+    def test_list_unfinished_large_files_ndjson(self):
+        self.v1_bucket.start_large_file('file1', 'text/plain', {'color': 'blue'})
+
+        self.assertEqual(
+            [
+                {
+                    'fileId': '9999',
+                    'fileName': 'file1',
+                    'contentType': 'text/plain',
+                    'fileInfo': {
+                        'color': 'blue'
+                    },
+                }
+            ],
+            self._run_ndjson_command(['list-unfinished-large-files', '--ndjson', 'my-v1-bucket']),
         )
 
     def test_list_parts_with_none(self):
@@ -2481,7 +3333,7 @@ class TestRmConsoleTool(BaseConsoleToolTest):
     to ensure that it reports everything as fast as possible.
     """
 
-    class InstantReporter(ProgressReport):
+    class InstantReporter(RmProgressReport):
         UPDATE_INTERVAL = 0.0
 
     @classmethod
@@ -2570,6 +3422,37 @@ class TestRmConsoleTool(BaseConsoleToolTest):
         '''
         self._run_command(['ls', '--recursive', 'my-bucket'], expected_stdout)
 
+    def test_rm_list_threads(self):
+        self._run_command(
+            ['rm', '--recursive', '--listThreads', '3', '--noProgress', 'my-bucket', 'b'],
+        )
+
+        expected_stdout = '''
+        a/test.csv
+        a/test.tsv
+        c/test.csv
+        c/test.tsv
+        '''
+        self._run_command(['ls', '--recursive', 'my-bucket'], expected_stdout)
+
+    def test_rm_dry_run_ndjson(self):
+        records = self._run_ndjson_command(
+            ['rm', '--recursive', '--withWildcard', '--dryRun', '--ndjson', 'my-bucket', '*.csv']
+        )
+        self.assertEqual(
+            ['a/test.csv', 'b/b/test.csv', 'b/b1/test.csv', 'c/test.csv'],
+            [record['fileName'] for record in records],
+        )
+        self.assertEqual({'upload'}, {record['action'] for record in records})
+
+        self._run_command(
+            ['rm', '--recursive', '--ndjson', 'my-bucket'],
+            '',
+            'ERROR: --ndjson can only be used with --dryRun\n',
+            1,
+        )
+        self._run_command(['ls', '--recursive', 'my-bucket', 'a'], 'a/test.csv\na/test.tsv\n')
+
     def test_rm_exact_filename(self):
         self._run_command(
             ['rm', '--recursive', '--withWildcard', '--noProgress', 'my-bucket', 'b/b/test.csv'],
@@ -2586,6 +3469,351 @@ class TestRmConsoleTool(BaseConsoleToolTest):
         '''
         self._run_command(['ls', '--recursive', 'my-bucket'], expected_stdout)
 
+    def test_rm_many_patterns(self):
+        self._run_command(
+            [
+                'rm', '--recursive', '--withWildcard', '--noProgress', '--excludeRegex', 'c/',
+                'my-bucket', '*.csv', 'b/*.txt'
+            ],
+        )
+
+        expected_stdout = '''
+        a/test.tsv
+        b/b2/test.tsv
+        c/test.csv
+        c/test.tsv
+        '''
+        self._run_command(['ls', '--recursive', 'my-bucket'], expected_stdout)
+
+    def test_rm_max_results_and_start_after(self):
+        self._run_command(
+            ['rm', '--recursive', '--noProgress', '--maxResults', '3', 'my-bucket'],
+            '',
+            'To continue, run the command again with: --startAfter b/b/test.csv\n',
+        )
+        self._run_command(
+            ['rm', '--recursive', '--noProgress', '--startAfter', 'b/b2/test.tsv', 'my-bucket'],
+        )
+
+        expected_stdout = '''
+        b/b1/test.csv
+        b/b2/test.tsv
+        '''
+        self._run_command(['ls', '--recursive', 'my-bucket'], expected_stdout)
+
+    def test_rm_versions_continuation(self):
+        self._upload_multiple_files(self.bucket)
+
+        self._run_command(
+            ['rm', '--recursive', '--versions', '--noProgress', '--maxResults', '3', 'my-bucket'],
+            '',
+            'To continue, run the command again with: --startFileName a/test.tsv\n',
+        )
+        self._run_command(
+            [
+                'rm', '--recursive', '--versions', '--noProgress', '--startFileName', 'a/test.tsv',
+                '--maxResults', '4', 'my-bucket'
+            ],
+            '',
+            'To continue, run the command again with: --startFileName b/b1/test.csv\n',
+        )
+
+        expected_stdout = '''
+        b/b1/test.csv
+        b/b2/test.tsv
+        b/b2/test.tsv
+        b/test.txt
+        b/test.txt
+        '''
+        self._run_command(
+            ['ls', '--recursive', '--versions', 'my-bucket', 'b'],
+            expected_stdout,
+        )
+
+    def test_rm_interrupted_prints_continuation(self):
+        original_get = queue.Queue.get
+
+        def get_or_interrupt(messages_queue, *args, **kwargs):
+            entry = original_get(messages_queue, *args, **kwargs)
+            if entry is Rm.SubmitThread.END_MARKER:
+                raise KeyboardInterrupt()
+            return entry
+
+        expected_stderr = '''
+        To continue, run the command again with: --startAfter c/test.tsv
+
+        Interrupted.  Shutting down...
+
+        '''
+        with mock.patch.object(queue.Queue, 'get', get_or_interrupt):
+            self._run_command(
+                ['rm', '--recursive', '--noProgress', 'my-bucket'],
+                '',
+                expected_stderr,
+                1,
+            )
+
+    def test_rm_filters(self):
+        self.bucket.upload_bytes(b'big-test-data', 'b/test.txt')
+        self._run_command(
+            ['rm', '--recursive', '--versions', '--noProgress', '--maxSize', '9', 'my-bucket', 'b'],
+        )
+        self._run_command(['ls', '--recursive', '--versions', 'my-bucket', 'b'], 'b/test.txt\n')
+
+        self._run_command(['rm', '--recursive', '--noProgress', '--minSize', '1KB', 'my-bucket'])
+        self._run_command(['ls', '--recursive', 'my-bucket', 'a'], 'a/test.csv\na/test.tsv\n')
+        self._run_command(
+            ['rm', '--noProgress', '--minSize', '1KB', 'my-bucket'],
+            '',
+            'ERROR: --minSize, --maxSize, --olderThan, --newerThan, --action and '
+            '--contentType require --recursive\n',
+            1,
+        )
+
+    def test_rm_journal(self):
+        self._upload_multiple_files(self.bucket)
+        with TempDir() as temp_dir:
+            journal_path = os.path.join(temp_dir, 'rm.journal')
+            command = ['rm', '--recursive', '--noProgress', '--journal', journal_path, 'my-bucket']
+
+            self._run_command(
+                [*command, '--maxResults', '3'],
+                '',
+                'To continue, run the command again with: --startAfter b/b/test.csv\n',
+            )
+            self.assertTrue(os.path.exists(journal_path))
+            self._run_command(command)
+            self.assertFalse(os.path.exists(journal_path))
+
+        # the second run continued from the journal, so it did not remove
+        # the previous versions of the files removed by the first one
+        expected_stdout = '''
+        a/test.csv
+        a/test.tsv
+        b/b/test.csv
+        b/b1/test.csv
+        b/b2/test.tsv
+        b/test.txt
+        c/test.csv
+        c/test.tsv
+        '''
+        self._run_command(['ls', '--recursive', '--versions', 'my-bucket'], expected_stdout)
+
+    def test_rm_journal_of_another_command(self):
+        with TempDir() as temp_dir:
+            journal_path = os.path.join(temp_dir, 'rm.journal')
+            command = ['rm', '--recursive', '--noProgress', '--journal', journal_path]
+            self._run_command(
+                [*command, '--maxResults', '1', 'my-bucket'],
+                '',
+                'To continue, run the command again with: --startAfter a/test.csv\n',
+            )
+            self._run_command(
+                [*command, 'my-bucket', 'b'],
+                '',
+                f'ERROR: {journal_path} is a journal of another rm command\n',
+                1,
+            )
+            self._run_command(
+                [*command, '--minSize', '1', 'my-bucket'],
+                '',
+                f'ERROR: {journal_path} is a journal of another rm command\n',
+                1,
+            )
+            self._run_command(
+                [*command, '--dryRun', 'my-bucket'],
+                '',
+                'ERROR: --journal cannot be used with --dryRun\n',
+                1,
+            )
+
+    def test_rm_journal_keeps_ages_of_first_run(self):
+        self._upload_multiple_files(self.bucket)
+        latest = max(
+            file_version.upload_timestamp
+            for file_version, _ in self.bucket.ls(latest_only=False, recursive=True)
+        )
+        with TempDir() as temp_dir:
+            journal_path = os.path.join(temp_dir, 'rm.journal')
+            command = [
+                'rm', '--recursive', '--noProgress', '--newerThan', '1m', '--journal', journal_path,
+                'my-bucket'
+            ]
+            with mock.patch('b2.console_tool.current_time_millis', return_value=latest + 1):
+                self._run_command(
+                    [*command, '--maxResults', '3'],
+                    '',
+                    'To continue, run the command again with: --startAfter b/b/test.csv\n',
+                )
+            # an hour later, the files are no longer newer than a minute,
+            # but they were when the removal was started
+            with mock.patch(
+                'b2.console_tool.current_time_millis', return_value=latest + 3600 * 1000
+            ):
+                self._run_command(command)
+
+        # the latest versions of all files are removed, the previous ones are left
+        expected_stdout = '''
+        a/test.csv
+        a/test.tsv
+        b/b/test.csv
+        b/b1/test.csv
+        b/b2/test.tsv
+        b/test.txt
+        c/test.csv
+        c/test.tsv
+        '''
+        self._run_command(['ls', '--recursive', '--versions', 'my-bucket'], expected_stdout)
+
+    def test_prune_versions(self):
+        self._upload_multiple_files(self.bucket)
+        self._upload_multiple_files(self.bucket)
+        self.bucket.hide_file('c/test.tsv')
+
+        # of the three versions of every file, the two old ones are listed
+        expected_stdout = '''
+        a/test.csv
+        a/test.csv
+        b/b/test.csv
+        b/b/test.csv
+        b/b1/test.csv
+        b/b1/test.csv
+        '''
+        self._run_command(
+            ['prune-versions', '--dryRun', '--withWildcard', 'my-bucket', 'b/*.csv', 'a/test.csv'],
+            expected_stdout,
+        )
+        self._run_command(
+            ['prune-versions', '--keepVersions', '2', '--noProgress', '--purgeHidden', 'my-bucket'],
+        )
+
+        expected_stdout = '''
+        a/test.csv
+        a/test.csv
+        a/test.tsv
+        a/test.tsv
+        b/b/test.csv
+        b/b/test.csv
+        b/b1/test.csv
+        b/b1/test.csv
+        b/b2/test.tsv
+        b/b2/test.tsv
+        b/test.txt
+        b/test.txt
+        c/test.csv
+        c/test.csv
+        '''
+        self._run_command(['ls', '--recursive', '--versions', 'my-bucket'], expected_stdout)
+
+        self._run_command(['prune-versions', '--noProgress', '--maxSize', '9', 'my-bucket', 'a'])
+        self._run_command(
+            ['ls', '--recursive', '--versions', 'my-bucket', 'a'],
+            'a/test.csv\na/test.tsv\n',
+        )
+
+    def test_prune_versions_keeps_hide_marker_if_old_version_is_left(self):
+        self._upload_multiple_files(self.bucket)
+        hide_marker = self.bucket.hide_file('c/test.tsv')
+        # the oldest version of the hidden file cannot be removed
+        *_, old_version = self.bucket.list_file_versions('c/test.tsv')
+        original_delete_file_version = self.b2_api.raw_api.delete_file_version
+
+        def mocked_delete_file_version(this, account_auth_token, file_id, file_name):
+            if file_id == old_version.id_:
+                raise Conflict()
+            return original_delete_file_version(this, account_auth_token, file_id, file_name)
+
+        for threads in ['1', '4']:
+            with self.subTest(threads=threads), mock.patch.object(
+                self.b2_api.raw_api,
+                'delete_file_version',
+                side_effect=mocked_delete_file_version,
+            ):
+                self._run_command(
+                    ['prune-versions', '--purgeHidden', '--threads', threads, 'my-bucket', 'c'],
+                    expected_status=1,
+                    expected_part_of_stdout=(
+                        f'File "c/test.tsv" ({hide_marker.id_}) was kept, '
+                        f'as other versions of the file were not removed'
+                    ),
+                )
+                # the file is still hidden
+                self._run_command(['ls', '--recursive', 'my-bucket', 'c'], 'c/test.csv\n')
+                self._run_command(
+                    ['ls', '--recursive', '--versions', 'my-bucket', 'c'],
+                    'c/test.csv\nc/test.tsv\nc/test.tsv\n',
+                )
+
+    def test_prune_versions_errors(self):
+        self._run_command(
+            ['prune-versions', '--keepVersions', '0', 'my-bucket'],
+            '',
+            'ERROR: --keepVersions should be a positive number\n',
+            1,
+        )
+        self._run_command(
+            ['prune-versions', '--unordered', 'my-bucket'],
+            '',
+            'ERROR: --unordered cannot be used with prune-versions\n',
+            1,
+        )
+
+    def test_delete_file_versions(self):
+        file_versions = [
+            file_version for file_version, _ in self.bucket.ls('a', recursive=True)
+        ] + [file_version for file_version, _ in self.bucket.ls('c', recursive=True)]
+        with TempDir() as temp_dir:
+            manifest_path = os.path.join(temp_dir, 'manifest.csv')
+            with open(manifest_path, 'w') as manifest:
+                manifest.write('# versions to delete\n\n')
+                manifest.write(f'{file_versions[0].id_},{file_versions[0].file_name}\n')
+                # the name is looked up
+                manifest.write(f'{file_versions[1].id_}\n')
+                manifest.write(f'{file_versions[2].id_},{file_versions[2].file_name}\n')
+            self._run_command(['delete-file-versions', '--noProgress', manifest_path])
+
+        self._run_command(
+            ['ls', '--recursive', 'my-bucket'],
+            'b/b/test.csv\nb/b1/test.csv\nb/b2/test.tsv\nb/test.txt\nc/test.tsv\n',
+        )
+
+        with mock.patch('sys.stdin', StringIO(f'{file_versions[3].id_},c/test.tsv\n')):
+            self._run_command(['delete-file-versions', '--noProgress', '-'])
+        self._run_command(['ls', '--recursive', 'my-bucket', 'c'], '')
+
+    def test_delete_file_versions_of_unknown_name(self):
+        with TempDir() as temp_dir:
+            manifest_path = os.path.join(temp_dir, 'manifest.csv')
+            with open(manifest_path, 'w') as manifest:
+                manifest.write('9999\n')
+            # the name of the version cannot be looked up, so only its ID is printed
+            with mock.patch.object(
+                self.b2_api.raw_api, 'get_file_info_by_id', side_effect=Conflict()
+            ):
+                self._run_command(
+                    ['delete-file-versions', '--noProgress', manifest_path],
+                    expected_part_of_stdout='Deletion of file 9999 failed: Conflict',
+                    expected_status=1,
+                )
+
+    def test_delete_file_versions_errors(self):
+        with TempDir() as temp_dir:
+            manifest_path = os.path.join(temp_dir, 'manifest.csv')
+            self._run_command(
+                ['delete-file-versions', manifest_path],
+                '',
+                f'ERROR: cannot read {manifest_path}: No such file or directory\n',
+                1,
+            )
+            with open(manifest_path, 'w') as manifest:
+                manifest.write(',a/test.csv\n')
+            self._run_command(
+                ['delete-file-versions', '--noProgress', manifest_path],
+                '',
+                'ERROR: line 1 of the manifest has no file ID\n',
+                1,
+            )
+
     def test_rm_no_name_removes_everything(self):
         self._run_command(['rm', '--recursive', '--noProgress', 'my-bucket'])
         self._run_command(['ls', '--recursive', 'my-bucket'], '')
@@ -2601,6 +3829,21 @@ class TestRmConsoleTool(BaseConsoleToolTest):
         self._run_command(['rm', '--recursive', '--threads', '2', '--queueSize', '4', 'my-bucket'])
         self._run_command(['ls', '--recursive', 'my-bucket'], '')
 
+    def test_rm_prefetch_pages(self):
+        self._run_command(
+            ['rm', '--recursive', '--noProgress', '--prefetchPages', '0', 'my-bucket', 'a'],
+        )
+        self._run_command(
+            ['rm', '--recursive', '--noProgress', '--prefetchPages', '1', 'my-bucket', 'b'],
+        )
+        self._run_command(['ls', '--recursive', 'my-bucket'], 'c/test.csv\nc/test.tsv\n')
+        self._run_command(
+            ['rm', '--recursive', '--prefetchPages', '-1', 'my-bucket'],
+            '',
+            'ERROR: --prefetchPages cannot be negative\n',
+            1,
+        )
+
     def test_rm_progress(self):
         expected_in_stdout = ' count: 4/4 '
         self._run_command(
@@ -2616,6 +3859,31 @@ class TestRmConsoleTool(BaseConsoleToolTest):
         '''
         self._run_command(['ls', '--recursive', 'my-bucket'], expected_stdout)
 
+    def test_rm_adaptive_threads(self):
+        self._run_command(
+            ['rm', '--recursive', '--withWildcard', '--adaptiveThreads', 'my-bucket', '*.csv'],
+            expected_part_of_stdout=' threads: ',
+        )
+
+        original_delete_file_version = self.b2_api.raw_api.delete_file_version
+
+        def throttled_delete_file_version(this, account_auth_token, file_id, file_name):
+            if file_name == 'b/test.txt':
+                raise TooManyRequests(retry_after_seconds=None)
+            return original_delete_file_version(this, account_auth_token, file_id, file_name)
+
+        with mock.patch.object(
+            self.b2_api.raw_api,
+            'delete_file_version',
+            side_effect=throttled_delete_file_version,
+        ):
+            self._run_command(
+                ['rm', '--recursive', '--adaptiveThreads', '--threads', '4', 'my-bucket'],
+                expected_status=1,
+                expected_part_of_stdout='\nConcurrent removals: ',
+            )
+        self._run_command(['ls', '--recursive', 'my-bucket'], 'b/test.txt\n')
+
     def _run_problematic_removal(
         self,
         additional_parameters: Optional[List[str]] = None,
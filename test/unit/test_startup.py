@@ -0,0 +1,94 @@
+######################################################################
+#
+# File: test/unit/test_startup.py
+#
+# Copyright 2023 Backblaze Inc. All Rights Reserved.
+#
+# License https://www.backblaze.com/using_b2_code.html
+#
+######################################################################
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Modules which are only needed by some of the commands, so `b2 version` must not import them.
+LAZILY_IMPORTED_MODULES = [
+    'argcomplete',
+    'arrow',
+    'docutils',
+    'logging.config',
+    'piplicenses',
+    'prettytable',
+    'rst2ansi',
+    'tabulate',
+]
+
+RUN_VERSION_SCRIPT = """
+import json, sys
+from b2.console_tool import ConsoleTool
+ConsoleTool(None, sys.stdout, sys.stderr).run_command(['b2', 'version'])
+print(json.dumps(sorted(sys.modules)))
+"""
+
+RUN_HELP_SCRIPT = """
+import contextlib, io, sys
+from b2.console_tool import ConsoleTool
+with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):
+    ConsoleTool(None, sys.stdout, sys.stderr).run_command(['b2'] + sys.argv[1:])
+print('docutils' in sys.modules)
+"""
+
+
+@pytest.fixture
+def cli_env(tmp_path):
+    env = dict(os.environ)
+    env['B2_ACCOUNT_INFO'] = str(tmp_path / 'account_info')
+    env['B2_CACHE_DIR'] = str(tmp_path / 'cache')
+    env.pop('_ARGCOMPLETE', None)
+    return env
+
+
+def test_version_does_not_import_command_specific_modules(cli_env):
+    output = subprocess.check_output(
+        [sys.executable, '-c', RUN_VERSION_SCRIPT], env=cli_env, text=True
+    )
+    version_line, modules_line = output.splitlines()[-2:]
+    assert version_line.startswith('b2 command line tool, version')
+
+    imported = set(json.loads(modules_line))
+    assert [module for module in LAZILY_IMPORTED_MODULES if module in imported] == []
+
+
+def test_version_entry_point_does_not_import_command_specific_modules(cli_env):
+    # `-X importtime` reports every module imported by the process, so the real entry point
+    # is checked (wall-clock timings are not reliable next to other tests running in parallel)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'b2', 'version'],
+        env=cli_env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert result.stdout.startswith('b2 command line tool, version')
+
+    imported = {
+        line.rsplit('|', 1)[1].strip()
+        for line in result.stderr.splitlines() if line.startswith('import time:') and '|' in line
+    }
+    assert 'b2.console_tool' in imported
+    assert [module for module in LAZILY_IMPORTED_MODULES if module in imported] == []
+
+
+@pytest.mark.parametrize('argv', [['--help'], ['ls', '--help']])
+def test_cached_help_does_not_import_docutils(cli_env, argv):
+    def run_help():
+        return subprocess.check_output(
+            [sys.executable, '-c', RUN_HELP_SCRIPT, *argv], env=cli_env, text=True
+        ).strip()
+
+    assert run_help() == 'True'  # first run renders the help and caches it
+    assert run_help() == 'False'